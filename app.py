@@ -1,53 +1,302 @@
 from __future__ import annotations
 
 from datetime import datetime
+import gc
+from importlib import import_module
 import io
+import json
+import logging
+import os
 import random
-import zipfile
+import secrets
+import tempfile
+import threading
+import uuid
+from typing import TYPE_CHECKING, Iterator, Mapping
 
-from flask import Flask, flash, jsonify, redirect, render_template, request, send_file, url_for
+from flask import (
+    Flask,
+    Response,
+    current_app,
+    flash,
+    g,
+    jsonify,
+    redirect,
+    render_template,
+    request,
+    send_file,
+    stream_with_context,
+    url_for,
+)
 
-from music_generator.midi_export import arrangement_to_midi
+from music_generator.admission import AdmissionController, Rejected, estimate_cost
+from music_generator.archive import COMPRESSION_MODES, compression_mode, iter_zip
+from music_generator.batch import VariationJob, job_arrangement, plan_variations, render_variations
+from music_generator.cache import LRUCache, RenderCache
+from music_generator.corpus import CONTAINERS, corpus_archive_entries
+from music_generator.incremental import ArrangementState, StateSettings, build_state, update_state
+from music_generator.metrics import RequestTrace, current_trace, registry as metrics_registry
+from music_generator.preview import PREVIEW_MEDIA_TYPE, encode_preview, preview_json, preview_patch
 from music_generator.theory import BUILTIN_PROGRESSIONS, parse_progression
-from music_generator.voicings import STYLES, generate_arrangement
+from music_generator.voicings import STYLES
 
-app = Flask(__name__)
-app.secret_key = "change-me-in-production"
+if TYPE_CHECKING:
+    from music_generator.jobs import ExportJobQueue
+
+PROFILED_ENDPOINTS = ("preview", "generate")
+PROFILE_HEADER = "X-Profile"
+PREVIEW_STATE_HEADER = "X-Preview-State"
+EXTENSION = "midi_voicing_lab"
+WARM_UP_PROGRESSION = "Dm7 G7 Cmaj7 A7 | Fm7 Bb7 Ebmaj7 C7alt"
+# Binary previews and corpus records store seeds as int64.
+SEED_LIMIT = 2**63
+
+slow_request_log = logging.getLogger("music_generator.slow_requests")
+
+
+def load_config(environ: Mapping[str, str] = os.environ) -> dict:
+    return {
+        "SECRET_KEY": environ.get("SECRET_KEY") or secrets.token_hex(32),
+        "VARIATION_POOL_SIZE": int(environ.get("VARIATION_POOL_SIZE", "0")),
+        "VARIATION_POOL_MIN_JOBS": int(environ.get("VARIATION_POOL_MIN_JOBS", "4")),
+        "MAX_VARIATIONS": int(environ.get("MAX_VARIATIONS", "5000")),
+        "RENDER_CACHE_ENTRIES": int(environ.get("RENDER_CACHE_ENTRIES", "256")),
+        "MAX_BATCH_JOBS": int(environ.get("MAX_BATCH_JOBS", "1000")),
+        "JOB_SPOOL_DIR": environ.get("JOB_SPOOL_DIR", os.path.join(tempfile.gettempdir(), "midi-voicing-jobs")),
+        "JOB_WORKERS": int(environ.get("JOB_WORKERS", "2")),
+        "JOB_TTL": float(environ.get("JOB_TTL", "3600")),
+        "SLOW_REQUEST_SECONDS": float(environ.get("SLOW_REQUEST_SECONDS", "2.0")),
+        "PROFILE_REQUESTS": environ.get("PROFILE_REQUESTS", ""),
+        "PROFILE_HEADER_ENABLED": environ.get("PROFILE_HEADER_ENABLED", "0") == "1",
+        "PROFILE_DIR": environ.get("PROFILE_DIR", "profiles"),
+        "PREVIEW_STATES": int(environ.get("PREVIEW_STATES", "256")),
+        "AUDIO_CACHE_ENTRIES": int(environ.get("AUDIO_CACHE_ENTRIES", "32")),
+        "AUDIO_CACHE_BYTES": int(environ.get("AUDIO_CACHE_BYTES", str(256 * 1024 * 1024))),
+        "ADMISSION_PREVIEW_BUDGET": float(environ.get("ADMISSION_PREVIEW_BUDGET", "100000")),
+        "ADMISSION_BULK_BUDGET": float(environ.get("ADMISSION_BULK_BUDGET", "1000000")),
+        "WARM_UP": environ.get("WARM_UP", "0") == "1",
+        "WARM_UP_NUMPY": environ.get("WARM_UP_NUMPY", "0") == "1",
+    }
+
+
+class LabState:
+    def __init__(self, config: Mapping):
+        self.render_cache = RenderCache(max_entries=config["RENDER_CACHE_ENTRIES"])
+        self.preview_states: LRUCache[ArrangementState] = LRUCache(config["PREVIEW_STATES"])
+        self.audio_cache: LRUCache[bytes] = LRUCache(
+            config["AUDIO_CACHE_ENTRIES"], max_weight=config["AUDIO_CACHE_BYTES"], weigh=len
+        )
+        self.admission = AdmissionController(
+            {"preview": config["ADMISSION_PREVIEW_BUDGET"], "bulk": config["ADMISSION_BULK_BUDGET"]}
+        )
+        self.job_queue: ExportJobQueue | None = None
+        self.job_queue_lock = threading.Lock()
+
+
+def create_app(config: Mapping | None = None) -> Flask:
+    app = Flask(__name__)
+    app.config.update(load_config())
+    if config:
+        app.config.update(config)
+    app.extensions[EXTENSION] = LabState(app.config)
+
+    app.before_request(start_trace)
+    app.before_request(start_profile)
+    app.after_request(tag_profile)
+    app.teardown_request(finish_profile)
+    app.teardown_request(finish_trace)
+    app.teardown_request(release_admission)
+    app.register_error_handler(Rejected, reject_request)
+    for rule, view, methods in ROUTES:
+        app.add_url_rule(rule, view_func=view, methods=methods)
+
+    if app.config["WARM_UP"]:
+        warm_up_app(app, freeze=True)
+    return app
+
+
+def lab() -> LabState:
+    return current_app.extensions[EXTENSION]
+
+
+def get_job_queue() -> ExportJobQueue:
+    state = lab()
+    config = current_app.config
+    with state.job_queue_lock:
+        if state.job_queue is None:
+            from music_generator.jobs import ExportJobQueue
+
+            state.job_queue = ExportJobQueue(
+                config["JOB_SPOOL_DIR"],
+                workers=config["JOB_WORKERS"],
+                ttl=config["JOB_TTL"],
+                pool_size=config["VARIATION_POOL_SIZE"],
+                min_parallel_jobs=config["VARIATION_POOL_MIN_JOBS"],
+                cache=state.render_cache,
+            )
+        return state.job_queue
+
+
+def start_trace():
+    if request.endpoint not in (None, "static", "metrics"):
+        current_trace.set(RequestTrace(request.endpoint))
+
+
+def start_profile():
+    if request.endpoint not in PROFILED_ENDPOINTS:
+        return None
+
+    modes = current_app.config["PROFILE_REQUESTS"]
+    if current_app.config["PROFILE_HEADER_ENABLED"] and PROFILE_HEADER in request.headers:
+        modes = request.headers[PROFILE_HEADER]
+    if not modes:
+        return None
+
+    from music_generator.profiling import ProfileSession, parse_profile_modes
+
+    try:
+        session = ProfileSession(parse_profile_modes(modes), current_app.config["PROFILE_DIR"], tag=request.endpoint)
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    if session.start():
+        g.profile_session = session
+    return None
+
+
+def tag_profile(response):
+    session = g.get("profile_session")
+    if session is not None:
+        response.headers["X-Profile-Id"] = session.stem
+    return response
+
+
+def finish_profile(exc: BaseException | None = None):
+    session = g.pop("profile_session", None)
+    if session is not None:
+        session.stop(g.get("request_settings"), endpoint=request.endpoint)
+
+
+def finish_trace(exc: BaseException | None = None):
+    trace = current_trace.get()
+    if trace is None:
+        return
+    current_trace.set(None)
+
+    seconds = trace.elapsed()
+    metrics_registry.observe_request(trace.endpoint, seconds)
+    threshold = current_app.config["SLOW_REQUEST_SECONDS"]
+    if threshold > 0 and seconds >= threshold:
+        from music_generator.profiling import settings_record
+
+        slow_request_log.warning(
+            "Langsamer Request %s",
+            json.dumps(
+                {
+                    "endpoint": trace.endpoint,
+                    "seconds": round(seconds, 6),
+                    "settings": settings_record(g.request_settings) if "request_settings" in g else None,
+                    "stages": {stage: round(value, 6) for stage, value in trace.stages.items()},
+                }
+            ),
+        )
+
+
+def admit(budget: str, cost: float) -> None:
+    g.admission = lab().admission.admit(budget, cost)
+
+
+def release_admission(exc: BaseException | None = None):
+    ticket = g.pop("admission", None)
+    if ticket is not None:
+        seconds = lab().admission.release(ticket)
+        metrics_registry.observe_cost(request.endpoint, ticket.cost, ticket.estimated_seconds, seconds)
+
+
+def reject_request(exc: Rejected):
+    metrics_registry.count_rejection(exc.budget)
+    response = jsonify(
+        {
+            "error": f"Server ausgelastet, bitte in {exc.retry_after} s erneut versuchen.",
+            "budget": exc.budget,
+            "retry_after": exc.retry_after,
+        }
+    )
+    response.status_code = exc.status
+    response.headers["Retry-After"] = str(exc.retry_after)
+    return response
+
+
+def note_request(settings: dict) -> None:
+    metrics_registry.count_request(request.endpoint, settings["requested_style"], settings["variations"])
+    g.setdefault("request_settings", settings)
+
+
+def resolve_seed(settings: dict) -> int:
+    if settings["seed"] is None:
+        settings["seed"] = random.randint(1, 1_000_000_000)
+    return settings["seed"]
 
 
-@app.get("/")
 def index():
     return render_template(
         "index.html",
         styles=STYLES,
         samples=BUILTIN_PROGRESSIONS,
+        max_variations=current_app.config["MAX_VARIATIONS"],
+        compression_modes=COMPRESSION_MODES,
+        preview_media_type=PREVIEW_MEDIA_TYPE,
     )
 
 
 def parse_form_settings() -> dict:
-    progression_text = request.form.get("progression", "")
-    requested_style = request.form.get("style", "jazz")
+    return parse_settings(request.form)
+
+
+def text_field(values: Mapping, name: str, default: str) -> str:
+    value = values.get(name, default)
+    if not isinstance(value, str):
+        raise ValueError(f"Feld '{name}' muss ein Text sein.")
+    return value
+
 
-    tempo = int(request.form.get("tempo", "98"))
+def parse_settings(values: Mapping, chord_cache: dict | None = None) -> dict:
+    progression_text = text_field(values, "progression", "")
+    requested_style = text_field(values, "style", "jazz")
+
+    tempo = int(values.get("tempo", "98"))
     tempo = max(40, min(220, tempo))
 
-    complexity = float(request.form.get("complexity", "65")) / 100.0
+    complexity = float(values.get("complexity", "65")) / 100.0
     complexity = max(0.0, min(1.0, complexity))
 
-    beats_per_chord = float(request.form.get("beats_per_chord", "4"))
+    beats_per_chord = float(values.get("beats_per_chord", "4"))
     beats_per_chord = 2.0 if beats_per_chord <= 2 else 4.0
 
-    variations = int(request.form.get("variations", "1"))
-    variations = max(1, min(12, variations))
+    variations = int(values.get("variations", "1"))
+    variations = max(1, min(current_app.config["MAX_VARIATIONS"], variations))
+
+    compression = text_field(values, "compression", "deflated")
+    compression_mode(compression)
 
-    humanize = request.form.get("humanize") == "on"
-    humanize_amount = float(request.form.get("humanize_amount", "30")) / 100.0
+    container = text_field(values, "container", "midi")
+    if container not in CONTAINERS:
+        raise ValueError(f"Unbekanntes Ausgabeformat: {container}")
+
+    humanize = values.get("humanize") in (True, "on")
+    humanize_amount = float(values.get("humanize_amount", "30")) / 100.0
     humanize_amount = max(0.0, min(1.0, humanize_amount))
 
-    seed_raw = request.form.get("seed", "")
-    seed = int(seed_raw) if seed_raw.strip() else None
+    seed_raw = values.get("seed")
+    seed = int(seed_raw) if seed_raw is not None and str(seed_raw).strip() else None
+    if seed is not None and not -SEED_LIMIT <= seed <= SEED_LIMIT - variations:
+        raise ValueError(f"Seed außerhalb des gültigen Bereichs: {seed}")
 
-    chords = parse_progression(progression_text)
+    if chord_cache is None:
+        chords = parse_progression(progression_text)
+    elif progression_text in chord_cache:
+        chords = chord_cache[progression_text]
+    else:
+        chords = chord_cache[progression_text] = parse_progression(progression_text)
     if requested_style != "random" and requested_style not in STYLES:
         raise ValueError(f"Style nicht gefunden: {requested_style}")
 
@@ -57,6 +306,8 @@ def parse_form_settings() -> dict:
         "complexity": complexity,
         "beats_per_chord": beats_per_chord,
         "variations": variations,
+        "compression": compression,
+        "container": container,
         "humanize": humanize,
         "humanize_amount": humanize_amount,
         "seed": seed,
@@ -64,40 +315,38 @@ def parse_form_settings() -> dict:
     }
 
 
-def resolve_style(requested_style: str, style_rng: random.Random) -> str:
-    if requested_style == "random":
-        return style_rng.choice(list(STYLES.keys()))
-    return requested_style
-
-
-@app.post("/generate")
 def generate():
     try:
         settings = parse_form_settings()
+        note_request(settings)
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        outputs: list[tuple[str, bytes]] = []
-
-        base_seed = settings["seed"] if settings["seed"] is not None else random.randint(1, 1_000_000_000)
-        style_rng = random.Random(base_seed + 17)
-
-        for index in range(settings["variations"]):
-            style = resolve_style(settings["requested_style"], style_rng)
-            current_seed = base_seed + index
-            arrangement = generate_arrangement(
-                chords=settings["chords"],
-                style=style,
-                complexity=settings["complexity"],
-                beats_per_chord=settings["beats_per_chord"],
-                tempo=settings["tempo"],
-                seed=current_seed,
-                humanize=settings["humanize"],
-                humanize_amount=settings["humanize_amount"],
+
+        base_seed = resolve_seed(settings)
+        jobs = plan_variations(settings, base_seed)
+        archived = len(jobs) > 1 or settings["container"] == "corpus"
+        admit("bulk", estimate_cost(jobs, settings["container"], settings["compression"] if archived else None))
+        outputs = render_variations(
+            jobs,
+            pool_size=current_app.config["VARIATION_POOL_SIZE"],
+            min_parallel_jobs=current_app.config["VARIATION_POOL_MIN_JOBS"],
+            cache=lab().render_cache,
+        )
+
+        if settings["container"] == "corpus":
+            name = f"voicings_corpus_{timestamp}"
+            return Response(
+                stream_with_context(
+                    iter_zip(
+                        corpus_archive_entries(jobs, outputs, name),
+                        compression=compression_mode(settings["compression"]),
+                    )
+                ),
+                mimetype="application/zip",
+                headers={"Content-Disposition": f"attachment; filename={name}.zip"},
             )
-            midi_bytes = arrangement_to_midi(arrangement, tempo=settings["tempo"])
-            outputs.append((f"voicings_{style}_{index + 1:02d}.mid", midi_bytes))
 
-        if len(outputs) == 1:
-            filename, midi_bytes = outputs[0]
+        if len(jobs) == 1:
+            filename, midi_bytes = next(outputs)
             return send_file(
                 io.BytesIO(midi_bytes),
                 mimetype="audio/midi",
@@ -106,62 +355,288 @@ def generate():
             )
 
         archive_name = f"voicings_batch_{timestamp}.zip"
-        archive_buffer = io.BytesIO()
-        with zipfile.ZipFile(archive_buffer, "w", compression=zipfile.ZIP_DEFLATED) as archive:
-            for filename, payload in outputs:
-                archive.writestr(filename, payload)
-        archive_buffer.seek(0)
-
-        return send_file(
-            archive_buffer,
+        return Response(
+            stream_with_context(iter_zip(outputs, compression=compression_mode(settings["compression"]))),
             mimetype="application/zip",
-            as_attachment=True,
-            download_name=archive_name,
+            headers={"Content-Disposition": f"attachment; filename={archive_name}"},
         )
     except ValueError as exc:
         flash(str(exc), "error")
         return redirect(url_for("index"))
 
 
-@app.post("/preview")
+def wants_binary_preview() -> bool:
+    if request.args.get("format") == "binary":
+        return True
+    # JSON first: ties such as */* or a missing Accept header keep the JSON response.
+    return request.accept_mimetypes.best_match(["application/json", PREVIEW_MEDIA_TYPE]) == PREVIEW_MEDIA_TYPE
+
+
 def preview():
     try:
-        settings = parse_form_settings()
-        base_seed = settings["seed"] if settings["seed"] is not None else random.randint(1, 1_000_000_000)
-        style = resolve_style(settings["requested_style"], random.Random(base_seed + 17))
-
-        arrangement = generate_arrangement(
-            chords=settings["chords"],
-            style=style,
-            complexity=settings["complexity"],
-            beats_per_chord=settings["beats_per_chord"],
-            tempo=settings["tempo"],
-            seed=base_seed,
-            humanize=settings["humanize"],
-            humanize_amount=settings["humanize_amount"],
+        settings = dict(parse_form_settings(), variations=1)
+        note_request(settings)
+        base_seed = resolve_seed(settings)
+        job = plan_variations(settings, base_seed)[0]
+        admit("preview", estimate_cost([job], "preview"))
+        if "state" in request.form:
+            return stateful_preview(job, request.form["state"])
+        arrangement = job_arrangement(job, cache=lab().render_cache)
+        if wants_binary_preview():
+            return Response(encode_preview(arrangement, base_seed, settings["tempo"]), mimetype=PREVIEW_MEDIA_TYPE)
+        return jsonify(preview_json(arrangement, base_seed, settings["tempo"]))
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+
+
+def stateful_preview(job: VariationJob, base_token: str) -> Response:
+    settings = StateSettings(
+        style=job.style,
+        complexity=job.complexity,
+        beats_per_chord=job.beats_per_chord,
+        seed=job.seed,
+        humanize=job.humanize,
+        humanize_amount=job.humanize_amount,
+    )
+    base = lab().preview_states.get(base_token) if base_token else None
+    if base is not None and base.settings == settings and len(base.chords) == len(job.chords):
+        state, changed = update_state(base, job.chords)
+        response = jsonify(
+            preview_patch(state.arrangement, job.seed, job.tempo, state.event_indices(changed), base_token)
         )
-        serialized_events = [
-            {
-                "start_beat": event.start_beat,
-                "duration": event.duration,
-                "velocity": event.velocity,
-                "left_hand": event.left_hand,
-                "right_hand": event.right_hand,
-            }
-            for event in arrangement.events
+    else:
+        state = build_state(job.chords, settings)
+        if wants_binary_preview():
+            response = Response(encode_preview(state.arrangement, job.seed, job.tempo), mimetype=PREVIEW_MEDIA_TYPE)
+        else:
+            response = jsonify(preview_json(state.arrangement, job.seed, job.tempo))
+
+    token = uuid.uuid4().hex
+    lab().preview_states.put(token, state)
+    response.headers[PREVIEW_STATE_HEADER] = token
+    return response
+
+
+def audio():
+    from music_generator.audio import DEFAULT_SAMPLE_RATE, iter_wav, wav_size
+
+    try:
+        settings = dict(parse_settings(request.values), variations=1)
+        sample_rate = int(request.values.get("sample_rate", DEFAULT_SAMPLE_RATE))
+        note_request(settings)
+        base_seed = resolve_seed(settings)
+        job = plan_variations(settings, base_seed)[0]
+        key = (job.key, sample_rate)
+        cached = lab().audio_cache.get(key)
+        if cached is not None:
+            body, size = cached, len(cached)
+        else:
+            admit("preview", estimate_cost([job], "audio"))
+            chunks = iter_wav(job_arrangement(job, cache=lab().render_cache), job.tempo, sample_rate)
+            header = next(chunks)
+            body = stream_with_context(cache_audio(lab().audio_cache, key, header, chunks))
+            size = wav_size(header)
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+
+    return Response(
+        body,
+        mimetype="audio/wav",
+        headers={
+            "Content-Length": str(size),
+            "Content-Disposition": f"inline; filename=voicings_{job.style}_{base_seed}.wav",
+            "X-Seed": str(base_seed),
+        },
+    )
+
+
+def cache_audio(cache: LRUCache[bytes], key: tuple, header: bytes, chunks: Iterator[bytes]) -> Iterator[bytes]:
+    parts = [header]
+    yield header
+    for chunk in chunks:
+        parts.append(chunk)
+        yield chunk
+    cache.put(key, b"".join(parts))
+
+
+def parse_batch_request(payload) -> tuple[list[list[VariationJob]], str, str]:
+    if not isinstance(payload, dict) or not isinstance(payload.get("jobs"), list):
+        raise ValueError("Erwartet wird ein JSON-Objekt mit einer Liste 'jobs'.")
+    jobs = payload["jobs"]
+    if not jobs:
+        raise ValueError("Die Liste 'jobs' ist leer.")
+    if len(jobs) > current_app.config["MAX_BATCH_JOBS"]:
+        raise ValueError(f"Zu viele Jobs: höchstens {current_app.config['MAX_BATCH_JOBS']} pro Anfrage.")
+
+    output_format = text_field(payload, "format", "zip")
+    if output_format not in ("zip", "json"):
+        raise ValueError(f"Unbekanntes Ausgabeformat: {output_format}")
+    compression = text_field(payload, "compression", "deflated")
+    compression_mode(compression)
+
+    chord_cache: dict = {}
+    planned = []
+    total_variations = 0
+    for number, values in enumerate(jobs, start=1):
+        if not isinstance(values, dict):
+            raise ValueError(f"Job {number}: Erwartet wird ein JSON-Objekt.")
+        try:
+            settings = parse_settings(values, chord_cache)
+        except (TypeError, ValueError) as exc:
+            raise ValueError(f"Job {number}: {exc}") from exc
+        note_request(settings)
+        base_seed = resolve_seed(settings)
+        planned.append(plan_variations(settings, base_seed))
+        total_variations += settings["variations"]
+
+    if total_variations > current_app.config["MAX_VARIATIONS"]:
+        raise ValueError(f"Zu viele Varianten: höchstens {current_app.config['MAX_VARIATIONS']} pro Anfrage.")
+    return planned, output_format, compression
+
+
+def batch_generate():
+    try:
+        planned, output_format, compression = parse_batch_request(request.get_json(silent=True))
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+
+    jobs = [job for batch in planned for job in batch]
+    if output_format == "json":
+        admit("bulk", estimate_cost(jobs, "preview"))
+        results = [
+            dict(preview_json(job_arrangement(job, cache=lab().render_cache), job.seed, job.tempo), job=number)
+            for number, jobs in enumerate(planned, start=1)
+            for job in jobs
         ]
+        return jsonify({"results": results})
+
+    admit("bulk", estimate_cost(jobs, "midi", compression))
+    numbers = [number for number, batch in enumerate(planned, start=1) for _ in batch]
+    outputs = render_variations(
+        jobs,
+        pool_size=current_app.config["VARIATION_POOL_SIZE"],
+        min_parallel_jobs=current_app.config["VARIATION_POOL_MIN_JOBS"],
+        cache=lab().render_cache,
+    )
+    entries = (
+        (f"job_{number:03d}/{filename}", midi_bytes) for number, (filename, midi_bytes) in zip(numbers, outputs)
+    )
+    archive_name = f"voicings_api_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+    return Response(
+        stream_with_context(iter_zip(entries, compression=compression_mode(compression))),
+        mimetype="application/zip",
+        headers={"Content-Disposition": f"attachment; filename={archive_name}"},
+    )
 
-        return jsonify(
+
+def submit_job():
+    try:
+        settings = parse_form_settings()
+        note_request(settings)
+        base_seed = resolve_seed(settings)
+        jobs = plan_variations(settings, base_seed)
+        cost = estimate_cost(jobs, "midi", settings["compression"] if len(jobs) > 1 else None)
+        metrics_registry.observe_cost(request.endpoint, cost, cost * lab().admission.seconds_per_unit)
+        job_id = get_job_queue().submit(jobs, settings["compression"], settings["container"])
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+
+    return (
+        jsonify(
             {
+                "id": job_id,
                 "seed": base_seed,
-                "style": arrangement.style,
-                "tempo": settings["tempo"],
-                "events": serialized_events,
-                "total_beats": arrangement.total_beats,
+                "status_url": url_for("job_status", job_id=job_id),
+                "download_url": url_for("job_download", job_id=job_id),
             }
-        )
-    except ValueError as exc:
-        return jsonify({"error": str(exc)}), 400
+        ),
+        202,
+    )
+
+
+def job_status(job_id: str):
+    status = get_job_queue().status(job_id)
+    if status is None:
+        return jsonify({"error": "Job nicht gefunden."}), 404
+    return jsonify(status)
+
+
+def job_download(job_id: str):
+    queue = get_job_queue()
+    status = queue.status(job_id)
+    if status is None:
+        return jsonify({"error": "Job nicht gefunden."}), 404
+    if status["state"] != "done":
+        return jsonify({"error": f"Job ist noch nicht fertig ({status['state']})."}), 409
+
+    return send_file(
+        queue.artifact_path(job_id),
+        mimetype="application/zip" if status["filename"].endswith(".zip") else "audio/midi",
+        as_attachment=True,
+        download_name=status["filename"],
+    )
+
+
+def metrics():
+    return Response(metrics_registry.render(), mimetype="text/plain; version=0.0.4")
+
+
+def cache_stats():
+    state = lab()
+    return jsonify(dict(state.render_cache.stats(), audio=state.audio_cache.stats()))
+
+
+def admission_stats():
+    return jsonify(lab().admission.stats())
+
+
+ROUTES = (
+    ("/", index, ("GET",)),
+    ("/generate", generate, ("POST",)),
+    ("/preview", preview, ("POST",)),
+    ("/api/batch", batch_generate, ("POST",)),
+    ("/jobs", submit_job, ("POST",)),
+    ("/jobs/<job_id>", job_status, ("GET",)),
+    ("/jobs/<job_id>/download", job_download, ("GET",)),
+    ("/metrics", metrics, ("GET",)),
+    ("/cache/stats", cache_stats, ("GET",)),
+    ("/admission/stats", admission_stats, ("GET",)),
+    ("/audio", audio, ("GET", "POST")),
+)
+
+
+# With freeze, surviving objects leave the GC's reach so collections in workers don't copy shared pages.
+def warm_up_app(app: Flask, freeze: bool = False) -> dict:
+    from music_generator import warm_up
+    from music_generator.midi_export import arrangement_to_midi
+    from music_generator.voicings import generate_arrangement
+
+    for module in ("music_generator.jobs", "music_generator.profiling"):
+        import_module(module)
+    with app.app_context():
+        app.jinja_env.get_template("index.html")
+    report = warm_up(numpy=app.config["WARM_UP_NUMPY"])
+
+    chords = parse_progression(WARM_UP_PROGRESSION)
+    for style in STYLES:
+        arrangement = generate_arrangement(chords, style, 0.65, 4.0, 98, seed=1, humanize=True, humanize_amount=0.3)
+        encode_preview(arrangement, 1, 98)
+        arrangement_to_midi(arrangement, 98)
+    if app.config["WARM_UP_NUMPY"]:
+        from music_generator.audio import DEFAULT_SAMPLE_RATE, HANDS, wavetable_slopes
+
+        for wave_type, _ in HANDS:
+            for pitch in range(21, 109):
+                wavetable_slopes(wave_type, pitch, DEFAULT_SAMPLE_RATE)
+
+    if freeze:
+        gc.collect()
+        gc.freeze()
+    report["frozen"] = gc.get_freeze_count()
+    return report
+
+
+app = create_app()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import argparse
+from dataclasses import dataclass
+import json
+from pathlib import Path
+import subprocess
+import sys
+
+ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_RUNS = 5
+
+PROBE = """
+import json, sys, time
+before = set(sys.modules)
+started = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - started
+print(json.dumps({{"seconds": seconds, "loaded": sorted(set(sys.modules) - before)}}))
+"""
+
+
+@dataclass(frozen=True)
+class ImportBudget:
+    module: str
+    seconds: float
+    forbidden: tuple[str, ...] = ()
+
+
+BUDGETS = (
+    ImportBudget("music_generator", 0.01, ("music_generator.theory", "music_generator.midi_export", "numpy")),
+    ImportBudget("music_generator.theory", 0.06, ("music_generator.voicings", "music_generator.midi_export", "numpy")),
+    ImportBudget("music_generator.voicings", 0.1, ("music_generator.midi_export", "numpy", "zipfile")),
+    ImportBudget("music_generator.midi_export", 0.12, ("numpy", "zipfile", "flask")),
+    ImportBudget("app", 0.6, ("numpy", "music_generator.jobs", "music_generator.profiling", "cProfile")),
+)
+
+
+def measure_import(module: str, runs: int = DEFAULT_RUNS) -> dict:
+    samples = []
+    loaded: list[str] = []
+    for _ in range(runs):
+        completed = subprocess.run(
+            [sys.executable, "-c", PROBE.format(module=module)],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        result = json.loads(completed.stdout.strip().splitlines()[-1])
+        samples.append(result["seconds"])
+        loaded = result["loaded"]
+    return {"best": min(samples), "runs": runs, "loaded": loaded}
+
+
+def check_budgets(budgets: tuple[ImportBudget, ...] = BUDGETS, runs: int = DEFAULT_RUNS, scale: float = 1.0) -> list[dict]:
+    results = []
+    for budget in budgets:
+        measured = measure_import(budget.module, runs)
+        leaked = [name for name in budget.forbidden if name in measured["loaded"]]
+        results.append(
+            {
+                "module": budget.module,
+                "best": measured["best"],
+                "budget": budget.seconds * scale,
+                "over_budget": measured["best"] > budget.seconds * scale,
+                "leaked": leaked,
+            }
+        )
+    return results
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Prüft Importzeiten und ungewollt geladene Module.")
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS, help="frische Interpreter pro Modul")
+    parser.add_argument("--scale", type=float, default=1.0, help="Faktor für alle Budgets (z. B. 2.0 auf langsamer CI)")
+    parser.add_argument("--output", "-o", help="JSON-Datei für die Ergebnisse")
+    args = parser.parse_args(argv)
+
+    results = check_budgets(runs=args.runs, scale=args.scale)
+    failed = False
+    for result in results:
+        status = "OK"
+        if result["leaked"]:
+            status = f"LÄDT {', '.join(result['leaked'])}"
+        elif result["over_budget"]:
+            status = "ÜBER BUDGET"
+        failed = failed or status != "OK"
+        print(
+            f"{result['module']:<32} {result['best'] * 1000:8.2f} ms / {result['budget'] * 1000:8.2f} ms  {status}",
+            file=sys.stderr,
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(results, handle, indent=2)
+            handle.write("\n")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,247 @@
+from __future__ import annotations
+
+import argparse
+from dataclasses import dataclass
+from datetime import datetime, timezone
+import json
+import platform
+import statistics
+import sys
+import time
+from typing import Callable
+
+from music_generator.audio import render_wav
+from music_generator.incremental import StateSettings, build_state, update_state
+from music_generator.midi_export import arrangement_to_midi
+from music_generator.preview import decode_preview, encode_preview, preview_json
+from music_generator.sweep import sweep_arrangements
+from music_generator.theory import BUILTIN_PROGRESSIONS, parse_progression
+from music_generator.voicings import STYLES, analyze_cadences, generate_arrangement
+
+DEFAULT_SIZES = (4, 64, 1000, 10_000)
+QUICK_SIZES = (4, 64)
+COMPLEXITIES = (0.3, 0.65, 0.9)
+DEFAULT_THRESHOLD = 0.15
+SWEEP_SEEDS = 100
+
+
+@dataclass(frozen=True)
+class Case:
+    name: str
+    run: Callable[[], object]
+    group: str
+
+
+def progression_text(chord_count: int) -> str:
+    tokens = " ".join(BUILTIN_PROGRESSIONS).split()
+    return " ".join(tokens[i % len(tokens)] for i in range(chord_count))
+
+
+def measure(run: Callable[[], object], min_time: float, max_runs: int) -> dict:
+    run()
+    samples: list[float] = []
+    started = time.perf_counter()
+    while len(samples) < max_runs:
+        begin = time.perf_counter()
+        run()
+        samples.append(time.perf_counter() - begin)
+        if time.perf_counter() - started >= min_time and len(samples) >= 3:
+            break
+
+    return {
+        "runs": len(samples),
+        "best": min(samples),
+        "median": statistics.median(samples),
+        "mean": statistics.fmean(samples),
+    }
+
+
+def build_cases(sizes: tuple[int, ...], include_http: bool = True) -> list[Case]:
+    cases: list[Case] = []
+
+    for size in sizes:
+        text = progression_text(size)
+        chords = parse_progression(text)
+        cases.append(Case(f"parse_progression[{size}]", lambda text=text: parse_progression(text), "theory"))
+        cases.append(Case(f"analyze_cadences[{size}]", lambda chords=chords: analyze_cadences(chords), "theory"))
+
+        for style in STYLES:
+            for complexity in COMPLEXITIES:
+                cases.append(
+                    Case(
+                        f"generate_arrangement[{style},{complexity},{size}]",
+                        lambda chords=chords, style=style, complexity=complexity: generate_arrangement(
+                            chords, style, complexity, 4, 100, seed=1, humanize=True, humanize_amount=0.3
+                        ),
+                        "generate",
+                    )
+                )
+
+        state = build_state(chords, StateSettings("jazz", 0.65, 4.0, 1, True, 0.3))
+        edited = list(chords)
+        edited[size // 2] = parse_progression("Ab7")[0]
+        cases.append(
+            Case(
+                f"incremental_update[{size}]",
+                lambda state=state, edited=edited: update_state(state, edited),
+                "incremental",
+            )
+        )
+
+        if size <= 64:
+            seeds = range(SWEEP_SEEDS)
+            cases.append(
+                Case(
+                    f"seed_loop[{SWEEP_SEEDS},{size}]",
+                    lambda chords=chords, seeds=seeds: [
+                        generate_arrangement(chords, "jazz", 0.65, 4, 100, seed=seed) for seed in seeds
+                    ],
+                    "sweep",
+                )
+            )
+            cases.append(
+                Case(
+                    f"seed_sweep[{SWEEP_SEEDS},{size}]",
+                    lambda chords=chords, seeds=seeds: sweep_arrangements(chords, "jazz", 0.65, 4, 100, seeds),
+                    "sweep",
+                )
+            )
+
+        arrangement = generate_arrangement(chords, "soul", 0.65, 4, 100, seed=1, humanize=True, humanize_amount=0.3)
+        cases.append(
+            Case(f"arrangement_to_midi[{size}]", lambda arrangement=arrangement: arrangement_to_midi(arrangement, 100), "export")
+        )
+
+        if size <= 64:
+            cases.append(
+                Case(f"render_wav[{size}]", lambda arrangement=arrangement: render_wav(arrangement, 100), "audio")
+            )
+
+        json_payload = json.dumps(preview_json(arrangement, 1, 100))
+        binary_payload = encode_preview(arrangement, 1, 100)
+        cases.append(Case(f"preview_json_decode[{size}]", lambda payload=json_payload: json.loads(payload), "preview"))
+        cases.append(
+            Case(f"preview_binary_decode[{size}]", lambda payload=binary_payload: decode_preview(payload), "preview")
+        )
+
+    if include_http:
+        cases.extend(http_cases(sizes))
+    return cases
+
+
+def http_cases(sizes: tuple[int, ...]) -> list[Case]:
+    from app import EXTENSION, create_app
+
+    app = create_app()
+    render_cache = app.extensions[EXTENSION].render_cache
+    client = app.test_client()
+    cases: list[Case] = []
+
+    for size in sizes:
+        form = {
+            "progression": progression_text(size),
+            "style": "jazz",
+            "tempo": "100",
+            "complexity": "65",
+            "humanize": "on",
+            "humanize_amount": "30",
+            "seed": "1234",
+        }
+
+        def post(path: str, data: dict) -> None:
+            render_cache.clear()
+            response = client.post(path, data=data)
+            response.get_data()
+            if response.status_code != 200:
+                raise RuntimeError(f"{path} antwortete mit {response.status_code}")
+
+        cases.append(Case(f"http_preview[{size}]", lambda form=form: post("/preview", form), "http"))
+        for variations in (1, 12):
+            data = dict(form, variations=str(variations))
+            cases.append(Case(f"http_generate[{variations},{size}]", lambda data=data: post("/generate", data), "http"))
+    return cases
+
+
+def payload_sizes(sizes: tuple[int, ...]) -> dict:
+    sizes_by_name = {}
+    for size in sizes:
+        arrangement = generate_arrangement(
+            parse_progression(progression_text(size)), "soul", 0.65, 4, 100, seed=1, humanize=True, humanize_amount=0.3
+        )
+        json_bytes = len(json.dumps(preview_json(arrangement, 1, 100)).encode("utf-8"))
+        binary_bytes = len(encode_preview(arrangement, 1, 100))
+        sizes_by_name[f"preview[{size}]"] = {"json": json_bytes, "binary": binary_bytes, "ratio": binary_bytes / json_bytes}
+        print(f"{f'preview_payload[{size}]':<56} {json_bytes:>10} B JSON {binary_bytes:>10} B binär", file=sys.stderr)
+    return sizes_by_name
+
+
+def run_suite(cases: list[Case], min_time: float, max_runs: int, selected: str | None = None) -> dict:
+    results = {}
+    for case in cases:
+        if selected and selected not in case.name:
+            continue
+        results[case.name] = dict(measure(case.run, min_time, max_runs), group=case.group)
+        print(f"{case.name:<56} {results[case.name]['best'] * 1000:10.3f} ms", file=sys.stderr)
+
+    return {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+
+
+def compare_results(current: dict, baseline: dict, threshold: float = DEFAULT_THRESHOLD) -> list[dict]:
+    regressions = []
+    for name, result in current["results"].items():
+        reference = baseline["results"].get(name)
+        if reference is None or reference["best"] <= 0:
+            continue
+        ratio = result["best"] / reference["best"]
+        if ratio > 1.0 + threshold:
+            regressions.append({"name": name, "baseline": reference["best"], "current": result["best"], "ratio": ratio})
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks für Parser, Generator, MIDI-Export und HTTP-Endpunkte.")
+    parser.add_argument("--output", "-o", help="JSON-Datei für die Ergebnisse (Standard: stdout)")
+    parser.add_argument("--compare", help="Baseline-JSON, gegen die Regressionen geprüft werden")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="erlaubte Verlangsamung (0.15 = 15 %%)")
+    parser.add_argument("--sizes", help="Progressionslängen, kommagetrennt (Standard: 4,64,1000,10000)")
+    parser.add_argument("--quick", action="store_true", help="nur kurze Progressionen messen")
+    parser.add_argument("--no-http", action="store_true", help="Flask-Endpunkte auslassen")
+    parser.add_argument("--filter", help="nur Cases, deren Name diesen Text enthält")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Mindestmesszeit pro Case in Sekunden")
+    parser.add_argument("--max-runs", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    if args.sizes:
+        sizes = tuple(int(size) for size in args.sizes.split(","))
+    else:
+        sizes = QUICK_SIZES if args.quick else DEFAULT_SIZES
+
+    report = run_suite(build_cases(sizes, include_http=not args.no_http), args.min_time, args.max_runs, args.filter)
+    report["payloads"] = payload_sizes(sizes)
+    payload = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            handle.write(payload + "\n")
+    else:
+        print(payload)
+
+    if not args.compare:
+        return 0
+
+    with open(args.compare, encoding="utf-8") as handle:
+        baseline = json.load(handle)
+    regressions = compare_results(report, baseline, args.threshold)
+    for regression in regressions:
+        print(
+            f"REGRESSION {regression['name']}: {regression['baseline'] * 1000:.3f} ms -> "
+            f"{regression['current'] * 1000:.3f} ms ({regression['ratio']:.2f}x)",
+            file=sys.stderr,
+        )
+    return 1 if regressions else 0
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+from .imports import ROOT
+
+DEFAULT_BUDGET = 0.02
+
+PROBE = """
+import json, time
+from app import create_app
+from music_generator.catalog import voicing_catalog
+
+started = time.perf_counter()
+app = create_app({{"WARM_UP": {warm}}})
+startup = time.perf_counter() - started
+client = app.test_client()
+misses = voicing_catalog.cache_info().misses
+samples = []
+for style, seed in (("jazz", "1"), ("soul", "2")):
+    form = {{"progression": "Dm7 G7 Cmaj7 A7 | Em7 A7 Dm7 G7", "style": style, "seed": seed, "humanize": "on"}}
+    started = time.perf_counter()
+    response = client.post("/preview", data=form)
+    response.get_data()
+    samples.append(time.perf_counter() - started)
+    if response.status_code != 200:
+        raise SystemExit(f"/preview antwortete mit {{response.status_code}}")
+print(json.dumps({{
+    "startup": startup,
+    "first": samples[0],
+    "second": samples[1],
+    "catalog_misses": voicing_catalog.cache_info().misses - misses,
+}}))
+"""
+
+
+def measure_first_request(warm: bool) -> dict:
+    completed = subprocess.run(
+        [sys.executable, "-c", PROBE.format(warm=warm)],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+        env=dict(os.environ, WARM_UP="0"),
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def check_first_request(budget: float = DEFAULT_BUDGET, scale: float = 1.0) -> dict:
+    result = measure_first_request(warm=True)
+    result["budget"] = budget * scale
+    result["over_budget"] = result["first"] > budget * scale
+    return result
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Misst den ersten Request eines frischen Workers mit und ohne Warm-up.")
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET, help="Budget für den ersten Request in Sekunden")
+    parser.add_argument("--scale", type=float, default=1.0, help="Faktor für das Budget (z. B. 2.0 auf langsamer CI)")
+    args = parser.parse_args(argv)
+
+    cold = measure_first_request(warm=False)
+    warm = check_first_request(args.budget, args.scale)
+    for label, result in (("kalt", cold), ("Warm-up", warm)):
+        print(
+            f"{label:<8} Start {result['startup'] * 1000:8.2f} ms  erster Request {result['first'] * 1000:8.2f} ms  "
+            f"zweiter {result['second'] * 1000:8.2f} ms  Katalog-Misses {result['catalog_misses']}",
+            file=sys.stderr,
+        )
+    failed = warm["over_budget"] or warm["catalog_misses"] > 0
+    if failed:
+        print(f"Erster Request nach Warm-up über Budget ({warm['budget'] * 1000:.2f} ms)", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
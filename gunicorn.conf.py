@@ -0,0 +1,32 @@
+"""Gunicorn-Konfiguration für den Produktivbetrieb: `gunicorn -c gunicorn.conf.py`."""
+
+import multiprocessing
+import os
+
+# Generierung ist CPU-gebunden: ein Prozess pro Kern, wenige Threads pro Prozess für
+# gestreamte Downloads und Status-Abfragen, die den Generator kaum beanspruchen.
+MIN_WORKERS = 2
+DEFAULT_THREADS = 2
+
+
+def worker_count(environ=os.environ, cpus=None) -> int:
+    if environ.get("WEB_CONCURRENCY"):
+        return max(1, int(environ["WEB_CONCURRENCY"]))
+    return max(MIN_WORKERS, cpus or multiprocessing.cpu_count())
+
+
+def thread_count(environ=os.environ) -> int:
+    return max(1, int(environ.get("GUNICORN_THREADS", DEFAULT_THREADS)))
+
+
+# Der Master importiert `app` vor dem Fork; `WARM_UP` füllt dabei alle Tabellen und friert sie
+# für die Garbage Collection ein, damit die Worker sie copy-on-write teilen.
+os.environ.setdefault("WARM_UP", "1")
+wsgi_app = "app:app"
+preload_app = True
+
+workers = worker_count()
+threads = thread_count()
+worker_class = "gthread" if threads > 1 else "sync"
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = 30
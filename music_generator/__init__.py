@@ -1,15 +1,45 @@
 """MIDI voicing generator package."""
 
-from .theory import ChordSymbol, parse_progression
-from .voicings import STYLES, Arrangement, VoicedChord, generate_arrangement
-from .midi_export import arrangement_to_midi
-
-__all__ = [
-    "ChordSymbol",
-    "parse_progression",
-    "STYLES",
-    "Arrangement",
-    "VoicedChord",
-    "generate_arrangement",
-    "arrangement_to_midi",
-]
+from __future__ import annotations
+
+from importlib import import_module
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from .midi_export import MidiStreamWriter, arrangement_to_midi, write_midi_stream
+    from .theory import ChordSymbol, parse_progression, parse_progressions
+    from .sweep import sweep_arrangements
+    from .voicings import STYLES, Arrangement, VoicedChord, Voicing, generate_arrangement, iter_arrangement
+    from .warmup import warm_up
+
+_EXPORTS = {
+    "ChordSymbol": "theory",
+    "parse_progression": "theory",
+    "parse_progressions": "theory",
+    "STYLES": "voicings",
+    "Arrangement": "voicings",
+    "VoicedChord": "voicings",
+    "Voicing": "voicings",
+    "generate_arrangement": "voicings",
+    "iter_arrangement": "voicings",
+    "sweep_arrangements": "sweep",
+    "arrangement_to_midi": "midi_export",
+    "MidiStreamWriter": "midi_export",
+    "write_midi_stream": "midi_export",
+    "warm_up": "warmup",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(f".{module_name}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+import math
+import threading
+from time import perf_counter
+from typing import TYPE_CHECKING, Iterable, Mapping
+
+from .voicings import STYLES, chord_hits
+
+if TYPE_CHECKING:
+    from .batch import VariationJob
+
+BUDGETS = ("preview", "bulk")
+REJECT_STATUS = {"preview": 429, "bulk": 503}
+
+# One cost unit is generating one chord hit (about 20-40 µs); exports are weighted per hit.
+GENERATE_WEIGHT = 1.0
+EXPORT_WEIGHTS = {"preview": 0.05, "midi": 1.0, "corpus": 1.0, "audio": 150.0}
+DEFLATE_WEIGHT = 0.1
+DEFAULT_SECONDS_PER_UNIT = 25e-6
+CALIBRATION_RATE = 0.1
+CALIBRATION_MIN_COST = 1000.0
+
+
+def estimate_cost(jobs: Iterable[VariationJob], export: str, compression: str | None = None) -> float:
+    if export not in EXPORT_WEIGHTS:
+        raise ValueError(f"Unbekannter Export für die Kostenschätzung: {export}")
+    hits_per_chord: dict[tuple[str, float], int] = {}
+    hits = 0
+    for job in jobs:
+        key = (job.style, job.beats_per_chord)
+        if key not in hits_per_chord:
+            hits_per_chord[key] = len(chord_hits(STYLES[job.style], job.beats_per_chord))
+        hits += len(job.chords) * hits_per_chord[key]
+
+    weight = GENERATE_WEIGHT + EXPORT_WEIGHTS[export]
+    if compression == "deflated":
+        weight += DEFLATE_WEIGHT
+    return hits * weight
+
+
+class Rejected(Exception):
+    def __init__(self, budget: str, retry_after: int):
+        super().__init__(f"Budget {budget} ausgeschöpft")
+        self.budget = budget
+        self.status = REJECT_STATUS[budget]
+        self.retry_after = retry_after
+
+
+@dataclass
+class Ticket:
+    budget: str
+    cost: float
+    estimated_seconds: float
+    started: float = field(default_factory=perf_counter)
+
+
+# A request larger than its whole budget only runs while that budget is idle.
+class AdmissionController:
+    def __init__(self, capacities: Mapping[str, float], seconds_per_unit: float = DEFAULT_SECONDS_PER_UNIT):
+        self.capacities = dict(capacities)
+        self.seconds_per_unit = seconds_per_unit
+        self.in_use = {budget: 0.0 for budget in self.capacities}
+        self.rejected = {budget: 0 for budget in self.capacities}
+        self._active: dict[str, list[Ticket]] = {budget: [] for budget in self.capacities}
+        self._lock = threading.Lock()
+
+    def admit(self, budget: str, cost: float) -> Ticket:
+        with self._lock:
+            capacity = self.capacities[budget]
+            if capacity > 0 and self._active[budget] and self.in_use[budget] + cost > capacity:
+                self.rejected[budget] += 1
+                raise Rejected(budget, self._retry_after(budget))
+            ticket = Ticket(budget, cost, cost * self.seconds_per_unit)
+            self.in_use[budget] += cost
+            self._active[budget].append(ticket)
+            return ticket
+
+    def release(self, ticket: Ticket) -> float:
+        seconds = perf_counter() - ticket.started
+        with self._lock:
+            active = self._active[ticket.budget]
+            if ticket in active:
+                active.remove(ticket)
+                self.in_use[ticket.budget] = max(0.0, self.in_use[ticket.budget] - ticket.cost) if active else 0.0
+            if ticket.cost >= CALIBRATION_MIN_COST:
+                self.seconds_per_unit += CALIBRATION_RATE * (seconds / ticket.cost - self.seconds_per_unit)
+        return seconds
+
+    def _retry_after(self, budget: str) -> int:
+        now = perf_counter()
+        remaining = min(ticket.estimated_seconds - (now - ticket.started) for ticket in self._active[budget])
+        return max(1, math.ceil(remaining))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "seconds_per_unit": self.seconds_per_unit,
+                "budgets": {
+                    budget: {
+                        "capacity": capacity,
+                        "in_use": self.in_use[budget],
+                        "active": len(self._active[budget]),
+                        "rejected": self.rejected[budget],
+                    }
+                    for budget, capacity in self.capacities.items()
+                },
+            }
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+from time import perf_counter
+from typing import Iterable, Iterator
+import zipfile
+
+from .metrics import record_stage
+
+COMPRESSION_MODES = {
+    "deflated": zipfile.ZIP_DEFLATED,
+    "stored": zipfile.ZIP_STORED,
+}
+
+
+class _ChunkSink:
+    def __init__(self) -> None:
+        self.chunks: list[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def compression_mode(name: str) -> int:
+    if name not in COMPRESSION_MODES:
+        raise ValueError(f"Unbekannte Kompression: {name}")
+    return COMPRESSION_MODES[name]
+
+
+def iter_zip(
+    entries: Iterable[tuple[str, bytes | Iterable[bytes]]], compression: int = zipfile.ZIP_DEFLATED
+) -> Iterator[bytes]:
+    sink = _ChunkSink()
+    elapsed = 0.0
+    try:
+        with zipfile.ZipFile(sink, "w", compression=compression) as archive:
+            for filename, payload in entries:
+                if isinstance(payload, (bytes, bytearray, memoryview)):
+                    started = perf_counter()
+                    archive.writestr(filename, payload)
+                    data = sink.drain()
+                    elapsed += perf_counter() - started
+                    yield data
+                    continue
+
+                with archive.open(filename, "w", force_zip64=True) as handle:
+                    for chunk in payload:
+                        started = perf_counter()
+                        handle.write(chunk)
+                        data = sink.drain()
+                        elapsed += perf_counter() - started
+                        yield data
+                    started = perf_counter()
+                data = sink.drain()
+                elapsed += perf_counter() - started
+                yield data
+            started = perf_counter()
+        data = sink.drain()
+        elapsed += perf_counter() - started
+        yield data
+    finally:
+        record_stage("zip", elapsed)
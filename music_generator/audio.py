@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+from functools import lru_cache
+import struct
+from time import perf_counter
+from typing import Iterator
+
+import numpy as np
+
+from .metrics import record_stage
+from .voicings import Arrangement
+
+SAMPLE_RATES = (22050, 44100, 48000)
+DEFAULT_SAMPLE_RATE = 44100
+CHUNK_SECONDS = 1.0
+TABLE_SIZE = 2048
+MAX_HARMONICS = 64
+
+# Mirrors scheduleHand() in templates/index.html.
+LEAD_IN = 0.04
+ATTACK = 0.012
+RELEASE_MAX = 0.18
+RELEASE_SHARE = 0.45
+SUSTAIN_LEVEL = 0.72
+TAIL = 0.03
+STOP = 0.06
+FLOOR = 0.0001
+MIN_DURATION = 0.06
+PEAK_LIMIT = 0.25
+HANDS = (("triangle", 0.14), ("sawtooth", 0.11))
+
+WAV_HEADER = struct.Struct("<4sI4s4sIHHIIHH4sI")
+
+
+# One band-limited cycle of the WebAudio oscillator shape, harmonics up to Nyquist.
+@lru_cache(maxsize=None)
+def wavetable(wave: str, pitch: int, sample_rate: int) -> np.ndarray:
+    frequency = midi_frequency(pitch)
+    harmonics = np.arange(1, max(1, min(MAX_HARMONICS, int(sample_rate / 2 / frequency))) + 1)
+    if wave == "triangle":
+        harmonics = harmonics[harmonics % 2 == 1]
+        weights = 8 / np.pi**2 * (-1.0) ** ((harmonics - 1) // 2) / harmonics**2
+    elif wave == "sawtooth":
+        weights = 2 / np.pi * (-1.0) ** (harmonics + 1) / harmonics
+    else:
+        raise ValueError(f"Unbekannte Wellenform: {wave}")
+
+    phase = np.arange(TABLE_SIZE + 1) * (2 * np.pi / TABLE_SIZE)
+    return (weights @ np.sin(np.outer(harmonics, phase))).astype(np.float32)
+
+
+@lru_cache(maxsize=None)
+def wavetable_slopes(wave: str, pitch: int, sample_rate: int) -> np.ndarray:
+    table = wavetable(wave, pitch, sample_rate)
+    return table[1:] - table[:-1]
+
+
+def midi_frequency(pitch: int) -> float:
+    return 440.0 * 2 ** ((pitch - 69) / 12)
+
+
+def note_events(arrangement: Arrangement, tempo: int) -> dict[str, np.ndarray]:
+    seconds_per_beat = 60.0 / tempo
+    starts, durations, peaks, pitches, hands = [], [], [], [], []
+    for start_beat, duration, velocity, voicing in arrangement.hits():
+        start = LEAD_IN + start_beat * seconds_per_beat
+        length = max(MIN_DURATION, duration * seconds_per_beat)
+        for hand, notes in enumerate((voicing.left_hand, voicing.right_hand)):
+            peak = min(PEAK_LIMIT, velocity / 127 * HANDS[hand][1])
+            starts += [start] * len(notes)
+            durations += [length] * len(notes)
+            peaks += [peak] * len(notes)
+            pitches += notes
+            hands += [hand] * len(notes)
+
+    order = np.argsort(np.asarray(starts, dtype=np.float64), kind="stable")
+    return {
+        "start": np.asarray(starts, dtype=np.float64)[order],
+        "duration": np.asarray(durations, dtype=np.float64)[order],
+        "peak": np.asarray(peaks, dtype=np.float64)[order],
+        "pitch": np.asarray(pitches, dtype=np.int64)[order],
+        "hand": np.asarray(hands, dtype=np.int64)[order],
+    }
+
+
+def total_samples(events: dict[str, np.ndarray], sample_rate: int) -> int:
+    if not len(events["start"]):
+        return 0
+    return int(np.ceil((events["start"] + events["duration"] + STOP).max() * sample_rate))
+
+
+# Notes are synthesized per chunk from the cached wavetable, so memory stays bounded by the chunk size.
+def iter_pcm(
+    arrangement: Arrangement,
+    tempo: int,
+    sample_rate: int = DEFAULT_SAMPLE_RATE,
+    chunk_seconds: float = CHUNK_SECONDS,
+) -> Iterator[np.ndarray]:
+    events = note_events(arrangement, tempo)
+    samples = total_samples(events, sample_rate)
+    if not samples:
+        return
+    chunk_size = max(1, int(chunk_seconds * sample_rate))
+    offsets = np.rint(events["start"] * sample_rate).astype(np.int64)
+    lengths = np.ceil((events["duration"] + STOP) * sample_rate).astype(np.int64)
+    release = np.minimum(RELEASE_MAX, events["duration"] * RELEASE_SHARE)
+    sustains = np.maximum(ATTACK + 0.02, events["duration"] - release)
+    ends = events["duration"] + TAIL
+
+    active: list[int] = []
+    note = 0
+    for chunk_start in range(0, samples, chunk_size):
+        started = perf_counter()
+        chunk_end = min(samples, chunk_start + chunk_size)
+        while note < len(offsets) and offsets[note] < chunk_end:
+            active.append(note)
+            note += 1
+
+        chunk = np.zeros(chunk_end - chunk_start, dtype=np.float32)
+        for index in active:
+            offset = int(offsets[index])
+            first = max(0, chunk_start - offset)
+            last = min(int(lengths[index]), chunk_end - offset)
+            if first >= last:
+                continue
+            pitch = int(events["pitch"][index])
+            wave = HANDS[int(events["hand"][index])][0]
+            table = wavetable(wave, pitch, sample_rate)
+            slopes = wavetable_slopes(wave, pitch, sample_rate)
+            clock = np.arange(first, last) / sample_rate
+            position = clock * midi_frequency(pitch)
+            position -= np.floor(position)  # equals % 1.0 for non-negative phases, without the slow float modulo
+            position *= TABLE_SIZE
+            sample = position.astype(np.int64)
+            voice = table[sample] + slopes[sample] * (position - sample)
+            peak = events["peak"][index]
+            gain = np.interp(
+                clock,
+                (0.0, ATTACK, sustains[index], ends[index]),
+                (FLOOR, peak, peak * SUSTAIN_LEVEL, FLOOR),
+            )
+            chunk[offset + first - chunk_start:offset + last - chunk_start] += voice * gain
+        active = [index for index in active if offsets[index] + lengths[index] > chunk_end]
+        record_stage("audio", perf_counter() - started)
+        yield chunk
+
+
+def wav_header(samples: int, sample_rate: int) -> bytes:
+    data_size = samples * 2
+    return WAV_HEADER.pack(
+        b"RIFF", 36 + data_size, b"WAVE", b"fmt ", 16, 1, 1, sample_rate, sample_rate * 2, 2, 16, b"data", data_size
+    )
+
+
+def wav_size(header: bytes) -> int:
+    return WAV_HEADER.unpack(header)[1] + 8
+
+
+def to_pcm16(chunk: np.ndarray) -> bytes:
+    pcm = (np.clip(chunk, -1.0, 1.0) * 32767).astype("<i2")
+    return pcm.tobytes()
+
+
+def iter_wav(
+    arrangement: Arrangement,
+    tempo: int,
+    sample_rate: int = DEFAULT_SAMPLE_RATE,
+    chunk_seconds: float = CHUNK_SECONDS,
+) -> Iterator[bytes]:
+    if sample_rate not in SAMPLE_RATES:
+        raise ValueError(f"Nicht unterstützte Samplerate: {sample_rate}")
+    yield wav_header(total_samples(note_events(arrangement, tempo), sample_rate), sample_rate)
+    for chunk in iter_pcm(arrangement, tempo, sample_rate, chunk_seconds):
+        yield to_pcm16(chunk)
+
+
+def render_wav(arrangement: Arrangement, tempo: int, sample_rate: int = DEFAULT_SAMPLE_RATE) -> bytes:
+    return b"".join(iter_wav(arrangement, tempo, sample_rate))
@@ -0,0 +1,211 @@
+from __future__ import annotations
+
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+import multiprocessing
+import random
+import threading
+from typing import Iterator
+
+from .cache import RenderCache
+from .midi_export import arrangement_to_midi
+from .theory import ChordSymbol
+from .sweep import sweep_arrangements
+from .voicings import STYLES, Arrangement, generate_arrangement
+
+SWEEP_CHUNK_SIZE = 64
+_pools: dict[int, ProcessPoolExecutor] = {}
+_pools_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class VariationJob:
+    index: int
+    style: str
+    seed: int
+    chords: tuple[ChordSymbol, ...]
+    complexity: float
+    beats_per_chord: float
+    tempo: int
+    humanize: bool
+    humanize_amount: float
+
+    @property
+    def filename(self) -> str:
+        return f"voicings_{self.style}_{self.index + 1:02d}.mid"
+
+    @property
+    def sweep_key(self) -> tuple:
+        return (
+            self.chords,
+            self.style,
+            self.complexity,
+            self.beats_per_chord,
+            self.tempo,
+            self.humanize,
+            self.humanize_amount,
+        )
+
+    @property
+    def key(self) -> tuple:
+        return (
+            self.chords,
+            self.style,
+            self.complexity,
+            self.beats_per_chord,
+            self.tempo,
+            self.seed,
+            self.humanize,
+            self.humanize_amount,
+        )
+
+
+def resolve_style(requested_style: str, style_rng: random.Random) -> str:
+    if requested_style == "random":
+        return style_rng.choice(list(STYLES.keys()))
+    return requested_style
+
+
+def plan_variations(settings: dict, base_seed: int) -> list[VariationJob]:
+    style_rng = random.Random(base_seed + 17)
+    chords = tuple(settings["chords"])
+    return [
+        VariationJob(
+            index=index,
+            style=resolve_style(settings["requested_style"], style_rng),
+            seed=base_seed + index,
+            chords=chords,
+            complexity=settings["complexity"],
+            beats_per_chord=settings["beats_per_chord"],
+            tempo=settings["tempo"],
+            humanize=settings["humanize"],
+            humanize_amount=settings["humanize_amount"],
+        )
+        for index in range(settings["variations"])
+    ]
+
+
+def job_arrangement(job: VariationJob, cache: RenderCache | None = None) -> Arrangement:
+    def build() -> Arrangement:
+        return generate_arrangement(
+            chords=list(job.chords),
+            style=job.style,
+            complexity=job.complexity,
+            beats_per_chord=job.beats_per_chord,
+            tempo=job.tempo,
+            seed=job.seed,
+            humanize=job.humanize,
+            humanize_amount=job.humanize_amount,
+        )
+
+    if cache is None:
+        return build()
+    return cache.arrangements.get_or_create(job.key, build)
+
+
+def sweep_job_arrangements(jobs: list[VariationJob], cache: RenderCache | None = None) -> list[Arrangement]:
+    arrangements: list[Arrangement | None] = [None] * len(jobs)
+    groups: dict[tuple, list[int]] = {}
+    for position, job in enumerate(jobs):
+        cached = cache.arrangements.get(job.key) if cache is not None else None
+        if cached is not None:
+            arrangements[position] = cached
+        else:
+            groups.setdefault(job.sweep_key, []).append(position)
+
+    for positions in groups.values():
+        first = jobs[positions[0]]
+        swept = sweep_arrangements(
+            chords=list(first.chords),
+            style=first.style,
+            complexity=first.complexity,
+            beats_per_chord=first.beats_per_chord,
+            tempo=first.tempo,
+            seeds=[jobs[position].seed for position in positions],
+            humanize=first.humanize,
+            humanize_amount=first.humanize_amount,
+        )
+        for position, arrangement in zip(positions, swept):
+            arrangements[position] = arrangement
+            if cache is not None:
+                cache.arrangements.put(jobs[position].key, arrangement)
+    return arrangements
+
+
+def render_variation(job: VariationJob, cache: RenderCache | None = None) -> tuple[str, bytes]:
+    if cache is None:
+        return job.filename, arrangement_to_midi(job_arrangement(job), tempo=job.tempo)
+
+    midi_bytes = cache.midi.get_or_create(
+        job.key,
+        lambda: arrangement_to_midi(job_arrangement(job, cache), tempo=job.tempo),
+    )
+    return job.filename, midi_bytes
+
+
+def render_variations(
+    jobs: list[VariationJob],
+    pool_size: int = 0,
+    min_parallel_jobs: int = 4,
+    cache: RenderCache | None = None,
+) -> Iterator[tuple[str, bytes]]:
+    if pool_size <= 1 or len(jobs) < min_parallel_jobs:
+        for start in range(0, len(jobs), SWEEP_CHUNK_SIZE):
+            yield from render_sweep_chunk(jobs[start:start + SWEEP_CHUNK_SIZE], cache)
+        return
+
+    executor = get_pool(pool_size)
+    window = pool_size * 2
+    pending: deque[tuple[VariationJob, Future | tuple[str, bytes]]] = deque()
+
+    def finish(job: VariationJob, outcome: Future | tuple[str, bytes]) -> tuple[str, bytes]:
+        if not isinstance(outcome, Future):
+            return outcome
+        filename, midi_bytes = outcome.result()
+        if cache is not None:
+            cache.midi.put(job.key, midi_bytes)
+        return filename, midi_bytes
+
+    for job in jobs:
+        cached = cache.midi.get(job.key) if cache is not None else None
+        outcome = (job.filename, cached) if cached is not None else executor.submit(render_variation, job)
+        pending.append((job, outcome))
+        if len(pending) >= window:
+            yield finish(*pending.popleft())
+    while pending:
+        yield finish(*pending.popleft())
+
+
+def render_sweep_chunk(jobs: list[VariationJob], cache: RenderCache | None = None) -> Iterator[tuple[str, bytes]]:
+    outputs: list[bytes | None] = [cache.midi.get(job.key) if cache is not None else None for job in jobs]
+    missing = [position for position, midi_bytes in enumerate(outputs) if midi_bytes is None]
+    arrangements = sweep_job_arrangements([jobs[position] for position in missing], cache)
+    for position, arrangement in zip(missing, arrangements):
+        job = jobs[position]
+        outputs[position] = arrangement_to_midi(arrangement, tempo=job.tempo)
+        if cache is not None:
+            cache.midi.put(job.key, outputs[position])
+    for job, midi_bytes in zip(jobs, outputs):
+        yield job.filename, midi_bytes
+
+
+def get_pool(pool_size: int) -> ProcessPoolExecutor:
+    with _pools_lock:
+        pool = _pools.get(pool_size)
+        if pool is None:
+            pool = _pools[pool_size] = ProcessPoolExecutor(max_workers=pool_size, mp_context=pool_context())
+        return pool
+
+
+def pool_context() -> multiprocessing.context.BaseContext:
+    # The pool starts lazily inside threaded servers; forked workers could inherit locks held by other threads.
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return multiprocessing.get_context(method)
+
+
+def shutdown_pools() -> None:
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.shutdown(wait=True, cancel_futures=True)
+        _pools.clear()
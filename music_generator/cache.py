@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+import threading
+from typing import Callable, Generic, Hashable, TypeVar
+
+V = TypeVar("V")
+
+
+class LRUCache(Generic[V]):
+    def __init__(
+        self,
+        max_entries: int = 256,
+        max_weight: int | None = None,
+        weigh: Callable[[V], int] | None = None,
+    ):
+        self.max_entries = max_entries
+        self.max_weight = max_weight
+        self.weigh = weigh or (lambda value: 1)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.weight = 0
+        self._entries: OrderedDict[Hashable, tuple[V, int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> V | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value: V) -> None:
+        if self.max_entries <= 0:
+            return
+
+        weight = self.weigh(value)
+        if self.max_weight is not None and weight > self.max_weight:
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.weight -= previous[1]
+            self._entries[key] = (value, weight)
+            self.weight += weight
+
+            while len(self._entries) > self.max_entries or (
+                self.max_weight is not None and self.weight > self.max_weight
+            ):
+                _, (_, evicted_weight) = self._entries.popitem(last=False)
+                self.weight -= evicted_weight
+                self.evictions += 1
+
+    def get_or_create(self, key: Hashable, factory: Callable[[], V]) -> V:
+        value = self.get(key)
+        if value is None:
+            value = factory()
+            self.put(key, value)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.weight = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "weight": self.weight,
+                "max_weight": self.max_weight,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            }
+
+
+class RenderCache:
+    def __init__(
+        self,
+        max_entries: int = 256,
+        max_events: int = 200_000,
+        max_midi_bytes: int = 64 * 1024 * 1024,
+    ):
+        self.arrangements = LRUCache(max_entries, max_events, weigh=len)
+        self.midi = LRUCache(max_entries, max_midi_bytes, weigh=len)
+
+    def clear(self) -> None:
+        self.arrangements.clear()
+        self.midi.clear()
+
+    def stats(self) -> dict:
+        return {"arrangements": self.arrangements.stats(), "midi": self.midi.stats()}
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+from functools import lru_cache
+from operator import sub
+from typing import Iterable, Sequence
+
+MIN_SPACING = 3
+NEAREST_CACHE_SIZE = 8192
+
+
+class VoicingCatalog:
+    __slots__ = ("low", "high", "note_count", "buckets", "size", "_nearest")
+
+    def __init__(self, low: int, high: int, note_count: int):
+        if note_count < 1 or high - low < 0:
+            raise ValueError("Ungültiger Katalogbereich.")
+
+        self.low = low
+        self.high = high
+        self.note_count = note_count
+        self.buckets: dict[int, bytes] = {}
+        self.size = 0
+        self._nearest = lru_cache(maxsize=NEAREST_CACHE_SIZE)(self._scan_nearest)
+        self._build()
+
+    def _build(self) -> None:
+        buckets: dict[int, bytearray] = {}
+        notes = [0] * self.note_count
+        last = self.note_count - 1
+
+        def extend(position: int, lowest: int, mask: int) -> None:
+            remaining = last - position
+            for note in range(lowest, self.high - remaining * MIN_SPACING + 1):
+                notes[position] = note
+                note_mask = mask | (1 << (note % 12))
+                if position == last:
+                    bucket = buckets.get(note_mask)
+                    if bucket is None:
+                        bucket = buckets[note_mask] = bytearray()
+                    bucket.extend(notes)
+                else:
+                    extend(position + 1, note + MIN_SPACING, note_mask)
+
+        extend(0, self.low, 0)
+        self.buckets = {mask: bytes(bucket) for mask, bucket in buckets.items()}
+        self.size = sum(len(bucket) for bucket in self.buckets.values()) // self.note_count
+
+    def __len__(self) -> int:
+        return self.size
+
+    @property
+    def nbytes(self) -> int:
+        return sum(len(bucket) for bucket in self.buckets.values())
+
+    def voicings(self, mask: int) -> list[tuple[int, ...]]:
+        bucket = self.buckets.get(mask, b"")
+        n = self.note_count
+        return [tuple(bucket[offset:offset + n]) for offset in range(0, len(bucket), n)]
+
+    def nearest(self, pitch_classes: Iterable[int], anchor: Sequence[int]) -> list[int] | None:
+        n = self.note_count
+        padded = tuple(anchor[min(i, len(anchor) - 1)] for i in range(n))
+        found = self._nearest(pitch_class_mask(pitch_classes), padded)
+        return list(found) if found is not None else None
+
+    def _scan_nearest(self, mask: int, anchor: tuple[int, ...]) -> bytes | None:
+        bucket = self.buckets.get(mask)
+        if not bucket:
+            return None
+
+        n = self.note_count
+        best_offset = 0
+        best_cost = None
+        for offset in range(0, len(bucket), n):
+            cost = sum(map(abs, map(sub, bucket[offset:offset + n], anchor)))
+            if best_cost is None or cost < best_cost:
+                best_cost = cost
+                best_offset = offset
+        return bucket[best_offset:best_offset + n]
+
+
+def pitch_class_mask(pitch_classes: Iterable[int]) -> int:
+    mask = 0
+    for pc in pitch_classes:
+        mask |= 1 << (pc % 12)
+    return mask
+
+
+@lru_cache(maxsize=None)
+def voicing_catalog(low: int, high: int, note_count: int) -> VoicingCatalog:
+    return VoicingCatalog(low, high, note_count)
@@ -0,0 +1,271 @@
+from __future__ import annotations
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+import itertools
+import os
+from pathlib import Path
+import sys
+import time
+from typing import Iterable, Iterator, TextIO
+
+from .corpus import CorpusReader, CorpusWriter, corpus_paths, settings_hash
+from .midi_export import arrangement_to_midi
+from .theory import parse_progression
+from .voicings import STYLES, generate_arrangement
+
+DEFAULT_CHUNK_SIZE = 64
+PROGRESS_INTERVAL = 2.0
+
+
+@dataclass(frozen=True)
+class FileTask:
+    progression: str
+    style: str
+    complexity: float
+    seed: int
+    beats_per_chord: float
+    tempo: int
+    humanize_amount: float
+    path: str
+
+
+def read_progressions(source: TextIO) -> list[str]:
+    progressions = []
+    for line in source:
+        line = line.strip()
+        if line and not line.startswith("#"):
+            progressions.append(line)
+    return progressions
+
+
+def parse_seeds(value: str) -> list[int]:
+    seeds: list[int] = []
+    for part in value.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        first, separator, last = part.partition("-")
+        if separator and first:
+            seeds.extend(range(int(first), int(last) + 1))
+        else:
+            seeds.append(int(part))
+    if not seeds:
+        raise ValueError("Es wurden keine Seeds angegeben.")
+    return seeds
+
+
+def parse_styles(value: str) -> list[str]:
+    if value == "all":
+        return list(STYLES)
+    styles = [style.strip() for style in value.split(",") if style.strip()]
+    unknown = [style for style in styles if style not in STYLES]
+    if unknown:
+        raise ValueError(f"Style nicht gefunden: {', '.join(unknown)}")
+    return styles
+
+
+def parse_complexities(value: str) -> list[float]:
+    complexities = [float(item) for item in value.split(",") if item.strip()]
+    if any(not 0.0 <= complexity <= 1.0 for complexity in complexities):
+        raise ValueError("Komplexität muss zwischen 0 und 1 liegen.")
+    return complexities
+
+
+def output_path(root: Path, index: int, style: str, complexity: float, seed: int) -> Path:
+    return root / f"{index + 1:04d}" / style / f"c{round(complexity * 100):03d}" / f"seed_{seed}.mid"
+
+
+def plan_files(
+    progressions: list[str],
+    styles: list[str],
+    complexities: list[float],
+    seeds: list[int],
+    root: Path,
+    beats_per_chord: float = 4.0,
+    tempo: int = 98,
+    humanize_amount: float = 0.0,
+) -> Iterator[FileTask]:
+    for (index, progression), style, complexity, seed in itertools.product(
+        enumerate(progressions), styles, complexities, seeds
+    ):
+        yield FileTask(
+            progression=progression,
+            style=style,
+            complexity=complexity,
+            seed=seed,
+            beats_per_chord=beats_per_chord,
+            tempo=tempo,
+            humanize_amount=humanize_amount,
+            path=str(output_path(root, index, style, complexity, seed)),
+        )
+
+
+@lru_cache(maxsize=1024)
+def canonical_progression(progression: str) -> str:
+    return " ".join(chord.symbol for chord in parse_progression(progression))
+
+
+def task_settings_hash(task: FileTask) -> bytes:
+    return settings_hash(
+        canonical_progression(task.progression), task.complexity, task.beats_per_chord, task.tempo, task.humanize_amount
+    )
+
+
+def render_payload(task: FileTask) -> bytes:
+    arrangement = generate_arrangement(
+        chords=parse_progression(task.progression),
+        style=task.style,
+        complexity=task.complexity,
+        beats_per_chord=task.beats_per_chord,
+        tempo=task.tempo,
+        seed=task.seed,
+        humanize=task.humanize_amount > 0,
+        humanize_amount=task.humanize_amount,
+    )
+    return arrangement_to_midi(arrangement, tempo=task.tempo)
+
+
+def render_file(task: FileTask) -> int:
+    midi_bytes = render_payload(task)
+    path = Path(task.path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_name(path.name + ".part")
+    partial.write_bytes(midi_bytes)
+    os.replace(partial, path)
+    return len(midi_bytes)
+
+
+def run_tasks(
+    tasks: Iterable[FileTask],
+    workers: int = 0,
+    resume: bool = True,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    progress: TextIO | None = None,
+    corpus: Path | None = None,
+) -> dict:
+    started = time.perf_counter()
+    existing = CorpusReader(corpus) if corpus is not None and resume and corpus_paths(corpus)[1].exists() else None
+    pending = []
+    skipped = 0
+    try:
+        for task in tasks:
+            if not resume:
+                done = False
+            elif corpus is None:
+                done = os.path.exists(task.path)
+            else:
+                done = existing is not None and existing.find(task_settings_hash(task), task.style, task.seed) is not None
+            if done:
+                skipped += 1
+            else:
+                pending.append(task)
+    finally:
+        if existing is not None:
+            existing.close()
+
+    written = 0
+    written_bytes = 0
+    last_report = started
+    render = render_file if corpus is None else render_payload
+    if workers > 1 and len(pending) > 1:
+        executor = ProcessPoolExecutor(max_workers=workers)
+        results = executor.map(render, pending, chunksize=max(1, chunk_size))
+    else:
+        executor = None
+        results = map(render, pending)
+    writer = CorpusWriter.open(corpus) if corpus is not None else None
+
+    try:
+        for task, result in zip(pending, results):
+            if writer is not None:
+                writer.append(result, task_settings_hash(task), task.style, task.seed)
+                result = len(result)
+            written += 1
+            written_bytes += result
+            now = time.perf_counter()
+            if progress is not None and now - last_report >= PROGRESS_INTERVAL:
+                last_report = now
+                print(f"{written}/{len(pending)} Dateien, {written / (now - started):.1f} Dateien/s", file=progress)
+            if writer is not None and written % max(1, chunk_size) == 0:
+                writer.flush()
+    finally:
+        if writer is not None:
+            writer.close()
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    seconds = time.perf_counter() - started
+    return {
+        "written": written,
+        "skipped": skipped,
+        "bytes": written_bytes,
+        "seconds": seconds,
+        "files_per_second": written / seconds if seconds > 0 else 0.0,
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m music_generator",
+        description="Erzeugt MIDI-Dateien für ein Raster aus Progressionen, Styles, Komplexitäten und Seeds.",
+    )
+    parser.add_argument("progressions", help="Datei mit einer Progression pro Zeile oder '-' für stdin")
+    parser.add_argument("--output", "-o", default="midi_output", help="Zielverzeichnis (Standard: midi_output)")
+    parser.add_argument("--styles", default="all", help="kommagetrennte Styles oder 'all'")
+    parser.add_argument("--complexity", default="0.65", help="kommagetrennte Komplexitäten zwischen 0 und 1")
+    parser.add_argument("--seeds", default="1", help="Seeds, z. B. '1-100' oder '1,5,9'")
+    parser.add_argument("--tempo", type=int, default=98)
+    parser.add_argument("--beats-per-chord", type=float, default=4.0, choices=(2.0, 4.0))
+    parser.add_argument("--humanize", type=float, default=0.0, help="Humanize-Stärke zwischen 0 und 1 (0 = aus)")
+    parser.add_argument("--workers", "-j", type=int, default=os.cpu_count() or 1, help="Prozesse (0/1 = ohne Pool)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Dateien pro Pool-Auftrag")
+    parser.add_argument(
+        "--corpus", action="store_true", help="alles in einen Korpus <ausgabe>/corpus.dat/.idx statt einzelner .mid-Dateien"
+    )
+    parser.add_argument("--overwrite", action="store_true", help="vorhandene Dateien neu erzeugen statt überspringen")
+    parser.add_argument("--quiet", "-q", action="store_true", help="keine Fortschrittsmeldungen")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.progressions == "-":
+            progressions = read_progressions(sys.stdin)
+        else:
+            with open(args.progressions, encoding="utf-8") as handle:
+                progressions = read_progressions(handle)
+        if not progressions:
+            raise ValueError("Es wurden keine Progressionen gefunden.")
+        for progression in progressions:
+            parse_progression(progression)
+        styles = parse_styles(args.styles)
+        complexities = parse_complexities(args.complexity)
+        seeds = parse_seeds(args.seeds)
+    except (OSError, ValueError) as exc:
+        parser.error(str(exc))
+
+    tasks = plan_files(
+        progressions,
+        styles,
+        complexities,
+        seeds,
+        Path(args.output),
+        beats_per_chord=args.beats_per_chord,
+        tempo=max(40, min(220, args.tempo)),
+        humanize_amount=min(max(args.humanize, 0.0), 1.0),
+    )
+    summary = run_tasks(
+        tasks,
+        workers=args.workers,
+        resume=not args.overwrite,
+        chunk_size=args.chunk_size,
+        progress=None if args.quiet else sys.stderr,
+        corpus=Path(args.output) / "corpus" if args.corpus else None,
+    )
+    print(
+        f"{summary['written']} Dateien geschrieben, {summary['skipped']} übersprungen, "
+        f"{summary['seconds']:.2f} s, {summary['files_per_second']:.1f} Dateien/s",
+        file=sys.stderr,
+    )
+    return 0
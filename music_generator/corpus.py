@@ -0,0 +1,234 @@
+from __future__ import annotations
+
+import hashlib
+import io
+import json
+import mmap
+import os
+from pathlib import Path
+import struct
+from typing import TYPE_CHECKING, BinaryIO, Iterable, Iterator, NamedTuple
+
+from .archive import _ChunkSink
+
+if TYPE_CHECKING:
+    from .batch import VariationJob
+
+CONTAINERS = ("midi", "corpus")
+CORPUS_MAGIC = b"MVC1"
+CORPUS_VERSION = 1
+DATA_SUFFIX = ".dat"
+INDEX_SUFFIX = ".idx"
+STYLE_WIDTH = 16
+
+# magic, version, record size
+INDEX_HEADER = struct.Struct("<4sHH")
+# settings hash, style, seed, offset, length
+RECORD = struct.Struct(f"<16s{STYLE_WIDTH}sqQI4x")
+
+
+class CorpusEntry(NamedTuple):
+    settings_hash: bytes
+    style: str
+    seed: int
+    offset: int
+    length: int
+
+
+def corpus_paths(path: str | os.PathLike) -> tuple[Path, Path]:
+    base = Path(path)
+    return base.with_name(base.name + DATA_SUFFIX), base.with_name(base.name + INDEX_SUFFIX)
+
+
+def settings_hash(
+    progression: str,
+    complexity: float,
+    beats_per_chord: float,
+    tempo: int,
+    humanize_amount: float,
+) -> bytes:
+    canonical = json.dumps(
+        [progression, float(complexity), float(beats_per_chord), int(tempo), float(humanize_amount)],
+        separators=(",", ":"),
+    )
+    return hashlib.blake2b(canonical.encode("utf-8"), digest_size=16).digest()
+
+
+def job_settings_hash(job: VariationJob) -> bytes:
+    return settings_hash(
+        " ".join(chord.symbol for chord in job.chords),
+        job.complexity,
+        job.beats_per_chord,
+        job.tempo,
+        job.humanize_amount if job.humanize else 0.0,
+    )
+
+
+def encode_style(style: str) -> bytes:
+    encoded = style.encode("utf-8")
+    if len(encoded) > STYLE_WIDTH:
+        raise ValueError(f"Style-Name zu lang für den Korpus: {style}")
+    return encoded.ljust(STYLE_WIDTH, b"\0")
+
+
+def read_index_header(header: bytes) -> None:
+    if len(header) < INDEX_HEADER.size:
+        raise ValueError("Korpus-Index ist unvollständig.")
+    magic, version, record_size = INDEX_HEADER.unpack_from(header)
+    if magic != CORPUS_MAGIC or version != CORPUS_VERSION or record_size != RECORD.size:
+        raise ValueError("Unbekanntes Korpus-Format.")
+
+
+# flush() writes the data before the buffered index records, so the index never points past the data.
+class CorpusWriter:
+    def __init__(self, data: BinaryIO, index: BinaryIO, offset: int = 0, count: int = 0, owned: bool = False):
+        self._data = data
+        self._index = index
+        self._pending: list[bytes] = []
+        self._owned = owned
+        self.offset = offset
+        self.count = count
+        if count == 0 and offset == 0 and index.tell() == 0:
+            index.write(INDEX_HEADER.pack(CORPUS_MAGIC, CORPUS_VERSION, RECORD.size))
+
+    @classmethod
+    def open(cls, path: str | os.PathLike) -> CorpusWriter:
+        data_path, index_path = corpus_paths(path)
+        data_path.parent.mkdir(parents=True, exist_ok=True)
+        index = open(index_path, "a+b")
+        try:
+            index.seek(0)
+            header = index.read(INDEX_HEADER.size)
+            if header:
+                read_index_header(header)
+                size = index.seek(0, os.SEEK_END)
+                count = (size - INDEX_HEADER.size) // RECORD.size
+                index.truncate(INDEX_HEADER.size + count * RECORD.size)
+            else:
+                count = 0
+            data = open(data_path, "ab")
+        except BaseException:
+            index.close()
+            raise
+
+        offset = os.fstat(data.fileno()).st_size
+        if header:
+            return cls(data, index, offset=offset, count=count, owned=True)
+        if offset:
+            data.truncate(0)
+        return cls(data, index, owned=True)
+
+    def __enter__(self) -> CorpusWriter:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def append(self, payload: bytes, settings_hash: bytes, style: str, seed: int) -> int:
+        self._data.write(payload)
+        self._pending.append(RECORD.pack(settings_hash, encode_style(style), seed, self.offset, len(payload)))
+        self.offset += len(payload)
+        self.count += 1
+        return self.count - 1
+
+    def append_job(self, job: VariationJob, payload: bytes) -> int:
+        return self.append(payload, job_settings_hash(job), job.style, job.seed)
+
+    def flush(self) -> None:
+        self._data.flush()
+        if self._pending:
+            self._index.write(b"".join(self._pending))
+            self._pending.clear()
+        self._index.flush()
+
+    def close(self) -> None:
+        self.flush()
+        if self._owned:
+            self._data.close()
+            self._index.close()
+
+
+# Payloads are memoryviews into the mapping; release them before close().
+class CorpusReader:
+    def __init__(self, path: str | os.PathLike):
+        data_path, index_path = corpus_paths(path)
+        self._maps: list[mmap.mmap] = []
+        with open(index_path, "rb") as handle:
+            index = self._map(handle)
+        read_index_header(index)
+        count = (len(index) - INDEX_HEADER.size) // RECORD.size
+        self._records = index[INDEX_HEADER.size:INDEX_HEADER.size + count * RECORD.size]
+        with open(data_path, "rb") as handle:
+            self._data = self._map(handle)
+        self._lookup: dict[tuple[bytes, bytes, int], int] | None = None
+
+    def _map(self, handle: BinaryIO) -> memoryview:
+        if os.fstat(handle.fileno()).st_size == 0:
+            return memoryview(b"")
+        mapping = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps.append(mapping)
+        return memoryview(mapping)
+
+    def __enter__(self) -> CorpusReader:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._records) // RECORD.size
+
+    def __getitem__(self, index: int) -> memoryview:
+        _, _, _, offset, length = self.record(index)
+        return self._data[offset:offset + length]
+
+    def __iter__(self) -> Iterator[memoryview]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def record(self, index: int) -> tuple[bytes, bytes, int, int, int]:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("Korpus-Index außerhalb des Bereichs.")
+        return RECORD.unpack_from(self._records, index * RECORD.size)
+
+    def entry(self, index: int) -> CorpusEntry:
+        digest, style, seed, offset, length = self.record(index)
+        return CorpusEntry(digest, style.rstrip(b"\0").decode("utf-8"), seed, offset, length)
+
+    def find(self, settings_hash: bytes, style: str, seed: int) -> int | None:
+        if self._lookup is None:
+            self._lookup = {
+                (digest, style_bytes, record_seed): index
+                for index, (digest, style_bytes, record_seed, _, _) in enumerate(RECORD.iter_unpack(self._records))
+            }
+        return self._lookup.get((settings_hash, encode_style(style), seed))
+
+    def get(self, settings_hash: bytes, style: str, seed: int) -> memoryview | None:
+        index = self.find(settings_hash, style, seed)
+        return None if index is None else self[index]
+
+    def close(self) -> None:
+        self._records.release()
+        self._data.release()
+        for mapping in self._maps:
+            mapping.close()
+        self._maps.clear()
+
+
+def corpus_archive_entries(
+    jobs: Iterable[VariationJob], outputs: Iterable[tuple[str, bytes]], name: str
+) -> Iterator[tuple[str, bytes | Iterator[bytes]]]:
+    # The data entry streams while rendering; only the fixed-width index records are kept.
+    data, index = _ChunkSink(), io.BytesIO()
+    writer = CorpusWriter(data, index)
+
+    def payloads() -> Iterator[bytes]:
+        for job, (_, payload) in zip(jobs, outputs):
+            writer.append_job(job, payload)
+            yield data.drain()
+        writer.flush()
+
+    yield name + DATA_SUFFIX, payloads()
+    yield name + INDEX_SUFFIX, index.getvalue()
@@ -0,0 +1,342 @@
+from __future__ import annotations
+
+import argparse
+from bisect import bisect_right
+import itertools
+import json
+import os
+from pathlib import Path
+import struct
+import sys
+from typing import Iterable, Iterator, Sequence
+import zipfile
+
+import numpy as np
+
+from .voicings import Arrangement
+
+STEPS_PER_BEAT = 4
+DEFAULT_SHARD_SIZE = 256
+MANIFEST_NAME = "dataset.json"
+
+NOTE_COLUMNS = ("step", "hand", "pitch", "duration", "velocity")
+PITCHES = 128
+MAX_SHIFT = 64
+MAX_DURATION = 64
+VELOCITY_BINS = 32
+
+PAD, BOS, EOS = 0, 1, 2
+SHIFT_BASE = 3
+NOTE_BASE = SHIFT_BASE + MAX_SHIFT
+DURATION_BASE = NOTE_BASE + 2 * PITCHES
+VELOCITY_BASE = DURATION_BASE + MAX_DURATION
+VOCAB_SIZE = VELOCITY_BASE + VELOCITY_BINS
+
+ZIP_LOCAL_HEADER = struct.Struct("<4s5H3L2H")
+
+
+def note_table(arrangement: Arrangement, steps_per_beat: int = STEPS_PER_BEAT) -> np.ndarray:
+    pitches: list[int] = []
+    hands: list[int] = []
+    counts = np.empty(len(arrangement.voicings), dtype=np.int64)
+    for index, voicing in enumerate(arrangement.voicings):
+        pitches += voicing.left_hand
+        pitches += voicing.right_hand
+        hands += [0] * len(voicing.left_hand)
+        hands += [1] * len(voicing.right_hand)
+        counts[index] = len(voicing.left_hand) + len(voicing.right_hand)
+    firsts = np.cumsum(counts) - counts
+
+    voicing_ids = np.frombuffer(arrangement.voicing_ids, dtype=np.dtype(arrangement.voicing_ids.typecode))
+    starts = np.frombuffer(arrangement.starts, dtype=np.float64)
+    durations = np.frombuffer(arrangement.durations, dtype=np.float64)
+    velocities = np.frombuffer(arrangement.velocities, dtype=np.uint8)
+
+    start_steps = np.rint(starts * steps_per_beat).astype(np.int64)
+    end_steps = np.maximum(start_steps + 1, np.rint((starts + durations) * steps_per_beat).astype(np.int64))
+
+    per_hit = counts[voicing_ids]
+    hit_index = np.repeat(np.arange(len(voicing_ids)), per_hit)
+    within = np.arange(len(hit_index)) - np.repeat(np.cumsum(per_hit) - per_hit, per_hit)
+    note_index = firsts[voicing_ids][hit_index] + within
+
+    table = np.column_stack(
+        (
+            start_steps[hit_index],
+            np.asarray(hands, dtype=np.int64)[note_index],
+            np.asarray(pitches, dtype=np.int64)[note_index],
+            (end_steps - start_steps)[hit_index],
+            velocities[hit_index],
+        )
+    )
+    order = np.lexsort((table[:, 2], table[:, 1], table[:, 0]))
+    return table[order].astype(np.int32)
+
+
+def roll_length(table: np.ndarray, total_beats: float, steps_per_beat: int = STEPS_PER_BEAT) -> int:
+    steps = int(np.ceil(total_beats * steps_per_beat))
+    if len(table):
+        steps = max(steps, int((table[:, 0] + table[:, 3]).max()))
+    return steps
+
+
+def render_roll(table: np.ndarray, steps: int) -> np.ndarray:
+    roll = np.zeros((2, steps, PITCHES), dtype=np.uint8)
+    lengths = table[:, 3].astype(np.int64)
+    note = np.repeat(np.arange(len(table)), lengths)
+    step = table[note, 0] + np.arange(len(note)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    np.maximum.at(roll, (table[note, 1], step, table[note, 2]), table[note, 4].astype(np.uint8))
+    return roll
+
+
+# Shape (hand, step, pitch); hand 0 is the left hand.
+def piano_roll(arrangement: Arrangement, steps_per_beat: int = STEPS_PER_BEAT) -> np.ndarray:
+    table = note_table(arrangement, steps_per_beat)
+    return render_roll(table, roll_length(table, arrangement.total_beats, steps_per_beat))
+
+
+# BOS, then per note [SHIFT...] VELOCITY NOTE DURATION, then EOS.
+def notes_to_tokens(table: np.ndarray) -> np.ndarray:
+    delta = np.diff(table[:, 0].astype(np.int64), prepend=0)
+    shifts = -(-delta // MAX_SHIFT)
+    ends = np.cumsum(shifts + 3) + 1
+    positions = ends - 3
+
+    tokens = np.full(int(ends[-1]) + 1 if len(ends) else 2, SHIFT_BASE + MAX_SHIFT - 1, dtype=np.int16)
+    tokens[0] = BOS
+    tokens[-1] = EOS
+    shifted = shifts > 0
+    tokens[positions[shifted] - 1] = SHIFT_BASE + delta[shifted] - (shifts[shifted] - 1) * MAX_SHIFT - 1
+    tokens[positions] = VELOCITY_BASE + table[:, 4] * VELOCITY_BINS // PITCHES
+    tokens[positions + 1] = NOTE_BASE + table[:, 1] * PITCHES + table[:, 2]
+    tokens[positions + 2] = DURATION_BASE + np.minimum(table[:, 3], MAX_DURATION) - 1
+    return tokens
+
+
+def tokens_to_notes(tokens: np.ndarray) -> np.ndarray:
+    tokens = np.asarray(tokens, dtype=np.int64)
+    is_shift = (tokens >= SHIFT_BASE) & (tokens < NOTE_BASE)
+    clock = np.cumsum(np.where(is_shift, tokens - SHIFT_BASE + 1, 0))
+    positions = np.flatnonzero((tokens >= NOTE_BASE) & (tokens < DURATION_BASE))
+    note = tokens[positions] - NOTE_BASE
+    velocity_bin = tokens[positions - 1] - VELOCITY_BASE
+    return np.column_stack(
+        (
+            clock[positions],
+            note // PITCHES,
+            note % PITCHES,
+            tokens[positions + 1] - DURATION_BASE + 1,
+            velocity_bin * PITCHES // VELOCITY_BINS,
+        )
+    ).astype(np.int32)
+
+
+def event_tokens(arrangement: Arrangement, steps_per_beat: int = STEPS_PER_BEAT) -> np.ndarray:
+    return notes_to_tokens(note_table(arrangement, steps_per_beat))
+
+
+def offsets_for(lengths: Sequence[int]) -> np.ndarray:
+    return np.concatenate(([0], np.cumsum(lengths, dtype=np.int64)))
+
+
+def shard_arrays(
+    arrangements: Sequence[Arrangement],
+    seeds: Sequence[int],
+    steps_per_beat: int = STEPS_PER_BEAT,
+) -> dict[str, np.ndarray]:
+    tables = [note_table(arrangement, steps_per_beat) for arrangement in arrangements]
+    tokens = [notes_to_tokens(table) for table in tables]
+    steps = [roll_length(table, a.total_beats, steps_per_beat) for table, a in zip(tables, arrangements)]
+
+    note_offsets = offsets_for([len(table) for table in tables])
+    roll_offsets = offsets_for(steps)
+    notes = np.concatenate(tables) if tables else np.empty((0, len(NOTE_COLUMNS)), dtype=np.int32)
+    shifted = notes.copy()
+    shifted[:, 0] += np.repeat(roll_offsets[:-1], np.diff(note_offsets)).astype(np.int32)
+
+    return {
+        "roll": render_roll(shifted, int(roll_offsets[-1])),
+        "roll_offsets": roll_offsets,
+        "tokens": np.concatenate(tokens) if tokens else np.empty(0, dtype=np.int16),
+        "token_offsets": offsets_for([len(sequence) for sequence in tokens]),
+        "notes": notes,
+        "note_offsets": note_offsets,
+        "styles": np.array([arrangement.style for arrangement in arrangements], dtype="U16"),
+        "seeds": np.asarray(seeds, dtype=np.int64),
+        "total_beats": np.array([arrangement.total_beats for arrangement in arrangements], dtype=np.float64),
+    }
+
+
+def export_dataset(
+    arrangements: Iterable[Arrangement],
+    directory: str | os.PathLike,
+    seeds: Iterable[int] | None = None,
+    shard_size: int = DEFAULT_SHARD_SIZE,
+    steps_per_beat: int = STEPS_PER_BEAT,
+) -> dict:
+    root = Path(directory)
+    root.mkdir(parents=True, exist_ok=True)
+    seeds = itertools.repeat(-1) if seeds is None else iter(seeds)
+    pairs = zip(arrangements, seeds)
+    shards = []
+    while True:
+        chunk = list(itertools.islice(pairs, max(1, shard_size)))
+        if not chunk:
+            break
+        filename = f"shard_{len(shards):05d}.npz"
+        batch, batch_seeds = zip(*chunk)
+        np.savez(root / filename, **shard_arrays(batch, batch_seeds, steps_per_beat))
+        shards.append({"file": filename, "count": len(chunk)})
+
+    manifest = {
+        "steps_per_beat": steps_per_beat,
+        "vocab_size": VOCAB_SIZE,
+        "note_columns": list(NOTE_COLUMNS),
+        "count": sum(shard["count"] for shard in shards),
+        "shards": shards,
+    }
+    (root / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2) + "\n", encoding="utf-8")
+    return manifest
+
+
+def load_shard(path: str | os.PathLike) -> dict[str, np.ndarray]:
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, "rb") as handle:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"Komprimierte Arrays lassen sich nicht mappen: {info.filename}")
+            handle.seek(info.header_offset)
+            header = ZIP_LOCAL_HEADER.unpack(handle.read(ZIP_LOCAL_HEADER.size))
+            handle.seek(header[-2] + header[-1], os.SEEK_CUR)
+            if np.lib.format.read_magic(handle) == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(handle)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(handle)
+            name = info.filename.removesuffix(".npy")
+            if not np.prod(shape):
+                arrays[name] = np.empty(shape, dtype=dtype)
+                continue
+            arrays[name] = np.memmap(
+                path, dtype=dtype, mode="r", offset=handle.tell(), shape=shape, order="F" if fortran_order else "C"
+            )
+    return arrays
+
+
+class DatasetReader:
+    def __init__(self, directory: str | os.PathLike):
+        root = Path(directory)
+        self.manifest = json.loads((root / MANIFEST_NAME).read_text(encoding="utf-8"))
+        self.shards = [load_shard(root / shard["file"]) for shard in self.manifest["shards"]]
+        self._starts = list(itertools.accumulate((shard["count"] for shard in self.manifest["shards"]), initial=0))
+
+    def __len__(self) -> int:
+        return self._starts[-1]
+
+    def locate(self, index: int) -> tuple[dict[str, np.ndarray], int]:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("Datensatz-Index außerhalb des Bereichs.")
+        shard = bisect_right(self._starts, index) - 1
+        return self.shards[shard], index - self._starts[shard]
+
+    def piano_roll(self, index: int) -> np.ndarray:
+        shard, position = self.locate(index)
+        offsets = shard["roll_offsets"]
+        return shard["roll"][:, offsets[position]:offsets[position + 1]]
+
+    def tokens(self, index: int) -> np.ndarray:
+        shard, position = self.locate(index)
+        offsets = shard["token_offsets"]
+        return shard["tokens"][offsets[position]:offsets[position + 1]]
+
+    def notes(self, index: int) -> np.ndarray:
+        shard, position = self.locate(index)
+        offsets = shard["note_offsets"]
+        return shard["notes"][offsets[position]:offsets[position + 1]]
+
+    def meta(self, index: int) -> dict:
+        shard, position = self.locate(index)
+        return {
+            "style": str(shard["styles"][position]),
+            "seed": int(shard["seeds"][position]),
+            "total_beats": float(shard["total_beats"][position]),
+        }
+
+    def __iter__(self) -> Iterator[np.ndarray]:
+        for index in range(len(self)):
+            yield self.tokens(index)
+
+
+def iter_grid(
+    progressions: list[str],
+    styles: list[str],
+    complexities: list[float],
+    seeds: list[int],
+    beats_per_chord: float,
+    humanize_amount: float,
+) -> Iterator[tuple[Arrangement, int]]:
+    from .sweep import sweep_arrangements
+    from .theory import parse_progression
+
+    for progression, style, complexity in itertools.product(progressions, styles, complexities):
+        arrangements = sweep_arrangements(
+            parse_progression(progression),
+            style,
+            complexity,
+            beats_per_chord,
+            98,
+            seeds,
+            humanize=humanize_amount > 0,
+            humanize_amount=humanize_amount,
+        )
+        yield from zip(arrangements, seeds)
+
+
+def main(argv: list[str] | None = None) -> int:
+    from .cli import parse_complexities, parse_seeds, parse_styles, read_progressions
+
+    parser = argparse.ArgumentParser(
+        prog="python -m music_generator.dataset",
+        description="Exportiert Piano-Rolls, Noten und Tokens als gemappte .npz-Shards für Trainingsdaten.",
+    )
+    parser.add_argument("progressions", help="Datei mit einer Progression pro Zeile oder '-' für stdin")
+    parser.add_argument("--output", "-o", default="dataset", help="Zielverzeichnis (Standard: dataset)")
+    parser.add_argument("--styles", default="all", help="kommagetrennte Styles oder 'all'")
+    parser.add_argument("--complexity", default="0.65", help="kommagetrennte Komplexitäten zwischen 0 und 1")
+    parser.add_argument("--seeds", default="1", help="Seeds, z. B. '1-100' oder '1,5,9'")
+    parser.add_argument("--beats-per-chord", type=float, default=4.0, choices=(2.0, 4.0))
+    parser.add_argument("--humanize", type=float, default=0.0, help="Humanize-Stärke zwischen 0 und 1 (0 = aus)")
+    parser.add_argument("--steps-per-beat", type=int, default=STEPS_PER_BEAT, help="Rasterauflösung der Piano-Roll")
+    parser.add_argument("--shard-size", type=int, default=DEFAULT_SHARD_SIZE, help="Arrangements pro .npz-Datei")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.progressions == "-":
+            progressions = read_progressions(sys.stdin)
+        else:
+            with open(args.progressions, encoding="utf-8") as handle:
+                progressions = read_progressions(handle)
+        if not progressions:
+            raise ValueError("Es wurden keine Progressionen gefunden.")
+        styles = parse_styles(args.styles)
+        complexities = parse_complexities(args.complexity)
+        seeds = parse_seeds(args.seeds)
+    except (OSError, ValueError) as exc:
+        parser.error(str(exc))
+
+    grid = iter_grid(progressions, styles, complexities, seeds, args.beats_per_chord, min(max(args.humanize, 0.0), 1.0))
+    arrangements, arrangement_seeds = itertools.tee(grid)
+    manifest = export_dataset(
+        (arrangement for arrangement, _ in arrangements),
+        args.output,
+        seeds=(seed for _, seed in arrangement_seeds),
+        shard_size=args.shard_size,
+        steps_per_beat=args.steps_per_beat,
+    )
+    print(f"{manifest['count']} Arrangements in {len(manifest['shards'])} Shards geschrieben", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
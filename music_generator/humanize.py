@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+from array import array
+import random
+from typing import Sequence
+
+import numpy as np
+
+from .voicings import Arrangement, humanize_limits
+
+HUMANIZE_ENGINES = ("random", "numpy")
+
+
+def humanize_arrangements(
+    arrangements: Sequence[Arrangement],
+    amount: float,
+    seeds: Sequence[int],
+    engine: str = "numpy",
+) -> None:
+    if engine not in HUMANIZE_ENGINES:
+        raise ValueError(f"Unbekannte Humanize-Engine: {engine}")
+    if len(arrangements) != len(seeds):
+        raise ValueError("Für jedes Arrangement wird genau ein Seed benötigt.")
+    if not arrangements:
+        return
+
+    max_timing_shift, max_duration_shift, max_velocity_shift = humanize_limits(amount)
+    counts = np.asarray([len(arrangement) for arrangement in arrangements])
+    offsets = np.concatenate(([0], np.cumsum(counts)))
+
+    start_shift = np.empty(offsets[-1])
+    duration_shift = np.empty(offsets[-1])
+    velocity_shift = np.empty(offsets[-1], dtype=np.int64)
+    for index, seed in enumerate(seeds):
+        window = slice(offsets[index], offsets[index + 1])
+        draw = draw_random if engine == "random" else draw_numpy
+        start_shift[window], duration_shift[window], velocity_shift[window] = draw(
+            counts[index], seed, max_timing_shift, max_duration_shift, max_velocity_shift
+        )
+
+    starts = np.concatenate([np.frombuffer(arrangement.starts, dtype=np.float64) for arrangement in arrangements])
+    durations = np.concatenate([np.frombuffer(arrangement.durations, dtype=np.float64) for arrangement in arrangements])
+    velocities = np.concatenate([np.frombuffer(arrangement.velocities, dtype=np.uint8) for arrangement in arrangements])
+    total_beats = np.repeat([arrangement.total_beats for arrangement in arrangements], counts)
+
+    new_starts = np.clip(starts + start_shift, 0.0, np.maximum(0.0, total_beats - 0.1))
+    new_durations = np.maximum(0.12, durations + duration_shift)
+    new_durations = np.minimum(np.maximum(0.12, total_beats - new_starts), new_durations)
+    new_velocities = np.clip(velocities + velocity_shift, 38, 120).astype(np.uint8)
+
+    segments = np.repeat(np.arange(len(arrangements)), counts)
+    order = np.lexsort((new_starts, segments))
+
+    for index, arrangement in enumerate(arrangements):
+        window = order[offsets[index]:offsets[index + 1]]
+        ids = np.frombuffer(arrangement.voicing_ids, dtype=np.dtype(arrangement.voicing_ids.typecode)).copy()
+        arrangement.starts[:] = array("d", new_starts[window].tobytes())
+        arrangement.durations[:] = array("d", new_durations[window].tobytes())
+        arrangement.velocities[:] = array("B", new_velocities[window].tobytes())
+        arrangement.voicing_ids[:] = array(arrangement.voicing_ids.typecode, ids[window - offsets[index]].tobytes())
+
+
+def draw_numpy(
+    count: int,
+    seed: int,
+    max_timing_shift: float,
+    max_duration_shift: float,
+    max_velocity_shift: int,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    generator = np.random.default_rng(seed)
+    return (
+        generator.uniform(-max_timing_shift, max_timing_shift, count),
+        generator.uniform(-max_duration_shift, max_duration_shift, count),
+        generator.integers(-max_velocity_shift, max_velocity_shift, count, endpoint=True),
+    )
+
+
+def draw_random(
+    count: int,
+    seed: int,
+    max_timing_shift: float,
+    max_duration_shift: float,
+    max_velocity_shift: int,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    rng = random.Random(seed)
+    draws = np.empty((count, 3))
+    for i in range(count):
+        draws[i, 0] = rng.uniform(-max_timing_shift, max_timing_shift)
+        draws[i, 1] = rng.uniform(-max_duration_shift, max_duration_shift)
+        draws[i, 2] = rng.randint(-max_velocity_shift, max_velocity_shift)
+    return draws[:, 0], draws[:, 1], draws[:, 2].astype(np.int64)
@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+from array import array
+from dataclasses import dataclass
+import random
+from typing import Sequence
+
+from .metrics import timed
+from .theory import ChordSymbol
+from .voicings import (
+    ALTERED_TENSIONS,
+    STYLES,
+    Arrangement,
+    Voicing,
+    add_chord_hits,
+    analyze_cadences,
+    build_pitch_class_palette,
+    can_alter,
+    choose_pitch_classes,
+    chord_hits,
+    humanize_arrangement,
+    place_voice,
+    split_voice_hands,
+    voice_note_count,
+)
+
+CHECKPOINT_INTERVAL = 32
+
+
+@dataclass(frozen=True)
+class StateSettings:
+    style: str
+    complexity: float
+    beats_per_chord: float
+    seed: int
+    humanize: bool = False
+    humanize_amount: float = 0.0
+    humanize_engine: str = "random"
+
+
+class ArrangementState:
+    __slots__ = (
+        "settings",
+        "chords",
+        "roles",
+        "mode_colors",
+        "chosen",
+        "palette_sizes",
+        "checkpoints",
+        "arrangement",
+        "chord_events",
+    )
+
+    def __init__(
+        self,
+        settings: StateSettings,
+        chords: list[ChordSymbol],
+        roles: list[str],
+        mode_colors: list[str],
+        chosen: list[list[int]],
+        palette_sizes: list[int],
+        checkpoints: list[array],
+        arrangement: Arrangement,
+        chord_events: list[list[int]],
+    ):
+        self.settings = settings
+        self.chords = chords
+        self.roles = roles
+        self.mode_colors = mode_colors
+        self.chosen = chosen
+        self.palette_sizes = palette_sizes
+        self.checkpoints = checkpoints
+        self.arrangement = arrangement
+        self.chord_events = chord_events
+
+    def event_indices(self, chord_indices: Sequence[int]) -> list[int]:
+        return sorted(index for chord_index in chord_indices for index in self.chord_events[chord_index])
+
+
+def save_rng(rng: random.Random) -> array:
+    return array("I", rng.getstate()[1])
+
+
+def load_rng(saved: array) -> random.Random:
+    rng = random.Random()
+    rng.setstate((3, tuple(saved), None))
+    return rng
+
+
+def has_draws(complexity: float) -> bool:
+    return complexity > 0.65
+
+
+def skip_draws(rng: random.Random, chord: ChordSymbol, complexity: float, palette_size: int) -> None:
+    if can_alter(chord, complexity) and rng.random() < 0.6:
+        rng.choice(ALTERED_TENSIONS)
+    if complexity > 0.75:
+        rng.shuffle([0] * max(palette_size - 2, 0))
+
+
+def build_state(chords: Sequence[ChordSymbol], settings: StateSettings) -> ArrangementState:
+    if settings.style not in STYLES:
+        raise ValueError(f"Style nicht gefunden: {settings.style}")
+    profile = STYLES[settings.style]
+    if profile.voice_leading != "greedy":
+        raise ValueError("Inkrementelle Previews unterstützen nur greedy Voice-Leading.")
+
+    chords = list(chords)
+    complexity = settings.complexity
+    note_count = voice_note_count(profile, complexity)
+    rng = random.Random(settings.seed)
+    mode_colors = [rng.choice(profile.modal_colors) for _ in chords]
+    roles = analyze_cadences(chords)
+
+    chosen: list[list[int]] = []
+    palette_sizes: list[int] = []
+    checkpoints: list[array] = []
+    voicings: list[Voicing] = []
+    previous: list[int] | None = None
+    with timed("voice"):
+        for index, chord in enumerate(chords):
+            if has_draws(complexity) and index % CHECKPOINT_INTERVAL == 0:
+                checkpoints.append(save_rng(rng))
+            pitch_classes = build_pitch_class_palette(chord, profile, complexity, mode_colors[index], roles[index], rng)
+            chosen.append(choose_pitch_classes(chord, pitch_classes, note_count, roles[index], complexity, rng))
+            palette_sizes.append(len(pitch_classes))
+            voice = place_voice(list(chosen[-1]), previous, profile, complexity, roles[index])
+            voicings.append(Voicing(chord, voice, *split_voice_hands(chord, voice, complexity)))
+            previous = voice
+
+    arrangement = Arrangement(style=settings.style)
+    add_chord_hits(arrangement, voicings, chord_hits(profile, settings.beats_per_chord), settings.beats_per_chord)
+    if settings.humanize and settings.humanize_amount > 0:
+        humanize_arrangement(arrangement, settings.humanize_amount, settings.seed + 7919, settings.humanize_engine)
+
+    chord_events: list[list[int]] = [[] for _ in chords]
+    for index, voicing_id in enumerate(arrangement.voicing_ids):
+        chord_events[voicing_id].append(index)
+
+    return ArrangementState(
+        settings, chords, roles, mode_colors, chosen, palette_sizes, checkpoints, arrangement, chord_events
+    )
+
+
+# Resumes the random stream at the nearest checkpoint; voice leading stops once a voice matches again.
+def update_state(state: ArrangementState, chords: Sequence[ChordSymbol]) -> tuple[ArrangementState, list[int]]:
+    chords = list(chords)
+    if len(chords) != len(state.chords):
+        return build_state(chords, state.settings), list(range(len(chords)))
+
+    edited = [index for index, (old, new) in enumerate(zip(state.chords, chords)) if old != new]
+    if not edited:
+        return state, []
+
+    roles = analyze_cadences(chords)
+    touched = set(edited)
+    touched.update(index for index, (old, new) in enumerate(zip(state.roles, roles)) if old != new)
+    first, last = min(touched), max(touched)
+
+    settings = state.settings
+    profile = STYLES[settings.style]
+    complexity = settings.complexity
+    note_count = voice_note_count(profile, complexity)
+    drawing = has_draws(complexity)
+    chosen = list(state.chosen)
+    palette_sizes = list(state.palette_sizes)
+    checkpoints = list(state.checkpoints)
+    voicings = list(state.arrangement.voicings)
+
+    rng = random.Random()
+    if drawing:
+        block_start = first - first % CHECKPOINT_INTERVAL
+        rng = load_rng(checkpoints[block_start // CHECKPOINT_INTERVAL])
+        for index in range(block_start, first):
+            skip_draws(rng, chords[index], complexity, palette_sizes[index])
+
+    changed: list[int] = []
+    synced = True
+    previous_changed = False
+    with timed("voice"):
+        for index in range(first, len(chords)):
+            chord = chords[index]
+            if drawing and not synced and index % CHECKPOINT_INTERVAL == 0:
+                checkpoints[index // CHECKPOINT_INTERVAL] = save_rng(rng)
+
+            chosen_changed = False
+            if index in touched or not synced:
+                pitch_classes = build_pitch_class_palette(
+                    chord, profile, complexity, state.mode_colors[index], roles[index], rng
+                )
+                picked = choose_pitch_classes(chord, pitch_classes, note_count, roles[index], complexity, rng)
+                if synced and drawing:
+                    synced = can_alter(chord, complexity) == can_alter(state.chords[index], complexity) and (
+                        complexity <= 0.75 or len(pitch_classes) == palette_sizes[index]
+                    )
+                chosen_changed = picked != chosen[index]
+                chosen[index] = picked
+                palette_sizes[index] = len(pitch_classes)
+            elif drawing:
+                skip_draws(rng, chord, complexity, palette_sizes[index])
+
+            old = voicings[index]
+            if chosen_changed or previous_changed or index in touched:
+                previous = voicings[index - 1].notes if index else None
+                voice = place_voice(list(chosen[index]), previous, profile, complexity, roles[index])
+                voicing = Voicing(chord, voice, *split_voice_hands(chord, voice, complexity))
+                if voicing != old:
+                    voicings[index] = voicing
+                    changed.append(index)
+                previous_changed = voicing.notes != old.notes
+            else:
+                previous_changed = False
+
+            if synced and index >= last and not previous_changed:
+                break
+
+    source = state.arrangement
+    arrangement = Arrangement(style=source.style, total_beats=source.total_beats)
+    arrangement.voicings = voicings
+    for name in ("starts", "durations", "velocities", "voicing_ids"):
+        setattr(arrangement, name, getattr(source, name)[:])
+
+    updated = ArrangementState(
+        settings, chords, roles, state.mode_colors, chosen, palette_sizes, checkpoints, arrangement, state.chord_events
+    )
+    return updated, changed
@@ -0,0 +1,264 @@
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+import json
+import os
+from pathlib import Path
+import re
+import shutil
+import threading
+import time
+import uuid
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process claims, run the app with a single worker process
+    fcntl = None
+
+from .archive import compression_mode, iter_zip
+from .batch import VariationJob, render_variations
+from .cache import RenderCache
+from .corpus import CONTAINERS, corpus_archive_entries
+from .theory import parse_chord
+
+JOB_STATES = ("queued", "running", "done", "failed")
+JOB_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+MANIFEST_NAME = "job.json"
+CLAIM_NAME = "job.lock"
+PROGRESS_INTERVAL = 0.5
+
+
+def job_to_dict(job: VariationJob) -> dict:
+    data = asdict(job)
+    data["chords"] = [chord.symbol for chord in job.chords]
+    return data
+
+
+def job_from_dict(data: dict) -> VariationJob:
+    return VariationJob(**dict(data, chords=tuple(parse_chord(symbol) for symbol in data["chords"])))
+
+
+class ExportJobQueue:
+    def __init__(
+        self,
+        spool_dir: str | os.PathLike,
+        workers: int = 2,
+        ttl: float = 3600.0,
+        pool_size: int = 0,
+        min_parallel_jobs: int = 4,
+        cache: RenderCache | None = None,
+    ):
+        self.spool_dir = Path(spool_dir)
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.pool_size = pool_size
+        self.min_parallel_jobs = min_parallel_jobs
+        self.cache = cache
+        self._records: dict[str, dict] = {}
+        self._claims: dict[str, object] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="export-job")
+        self.reload()
+
+    def submit(self, jobs: list[VariationJob], compression: str = "deflated", container: str = "midi") -> str:
+        if not jobs:
+            raise ValueError("Ein Export-Job braucht mindestens eine Variante.")
+        compression_mode(compression)
+        if container not in CONTAINERS:
+            raise ValueError(f"Unbekanntes Ausgabeformat: {container}")
+        self.cleanup()
+
+        job_id = uuid.uuid4().hex
+        if container == "corpus":
+            filename = f"voicings_corpus_{job_id[:8]}.zip"
+        elif len(jobs) == 1:
+            filename = jobs[0].filename
+        else:
+            filename = f"voicings_batch_{job_id[:8]}.zip"
+        record = {
+            "id": job_id,
+            "state": "queued",
+            "created": time.time(),
+            "started": None,
+            "finished": None,
+            "done": 0,
+            "total": len(jobs),
+            "compression": compression,
+            "container": container,
+            "filename": filename,
+            "error": None,
+            "jobs": [job_to_dict(job) for job in jobs],
+        }
+        self.job_dir(job_id).mkdir()
+        self._claim(job_id)
+        with self._lock:
+            self._records[job_id] = record
+            self._write_manifest(record)
+        self._executor.submit(self._run, job_id)
+        return job_id
+
+    def status(self, job_id: str) -> dict | None:
+        if not JOB_ID_RE.match(job_id):
+            return None
+        with self._lock:
+            record = self._records.get(job_id)
+            if record is not None:
+                record = dict(record)
+        if record is None:
+            # Submitted to another worker process sharing the spool directory.
+            record = self._read_manifest(self.job_dir(job_id) / MANIFEST_NAME)
+            if record is None:
+                return None
+        status = {key: value for key, value in record.items() if key != "jobs"}
+
+        end = status["finished"] or time.time()
+        status["elapsed"] = end - status["started"] if status["started"] else 0.0
+        return status
+
+    def artifact_path(self, job_id: str) -> Path | None:
+        status = self.status(job_id)
+        if status is None or status["state"] != "done":
+            return None
+        return self.job_dir(job_id) / status["filename"]
+
+    def job_dir(self, job_id: str) -> Path:
+        return self.spool_dir / job_id
+
+    def cleanup(self, now: float | None = None) -> int:
+        now = time.time() if now is None else now
+        # Jobs of other worker processes or earlier runs are only known from their manifests.
+        finished = {}
+        for manifest in self.spool_dir.glob(f"*/{MANIFEST_NAME}"):
+            record = self._read_manifest(manifest) if JOB_ID_RE.match(manifest.parent.name) else None
+            if record is not None:
+                finished[manifest.parent.name] = record.get("finished")
+        with self._lock:
+            for job_id, record in self._records.items():
+                finished.setdefault(job_id, record["finished"])
+            expired = [job_id for job_id, at in finished.items() if at is not None and now - at > self.ttl]
+            for job_id in expired:
+                self._records.pop(job_id, None)
+        for job_id in expired:
+            shutil.rmtree(self.job_dir(job_id), ignore_errors=True)
+        return len(expired)
+
+    def reload(self) -> list[str]:
+        resumed = []
+        for manifest in sorted(self.spool_dir.glob(f"*/{MANIFEST_NAME}")):
+            job_id = manifest.parent.name
+            if not JOB_ID_RE.match(job_id) or job_id in self._records:
+                continue
+            record = self._read_manifest(manifest)
+            if record is None:
+                continue
+
+            if record["state"] in ("queued", "running"):
+                if not self._claim(job_id):
+                    continue
+                record.update(state="queued", started=None, done=0)
+                resumed.append(job_id)
+            with self._lock:
+                self._records[job_id] = record
+
+        self.cleanup()
+        for job_id in resumed:
+            self._executor.submit(self._run, job_id)
+        return resumed
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
+        with self._lock:
+            claims, self._claims = self._claims, {}
+        for handle in claims.values():
+            handle.close()
+
+    def _run(self, job_id: str) -> None:
+        try:
+            self._render(job_id)
+        finally:
+            self._release(job_id)
+
+    def _render(self, job_id: str) -> None:
+        with self._lock:
+            record = self._records.get(job_id)
+            if record is None:
+                return
+            record.update(state="running", started=time.time(), done=0)
+            self._write_manifest(record)
+
+        try:
+            jobs = [job_from_dict(data) for data in record["jobs"]]
+            target = self.job_dir(job_id) / record["filename"]
+            partial = target.with_name(target.name + ".part")
+            outputs = self._count(
+                job_id,
+                render_variations(jobs, self.pool_size, self.min_parallel_jobs, cache=self.cache),
+            )
+
+            with open(partial, "wb") as handle:
+                if record.get("container", "midi") == "corpus":
+                    entries = corpus_archive_entries(jobs, outputs, target.stem)
+                elif len(jobs) == 1:
+                    entries = None
+                    handle.write(next(outputs)[1])
+                else:
+                    entries = outputs
+                if entries is not None:
+                    for data in iter_zip(entries, compression=compression_mode(record["compression"])):
+                        handle.write(data)
+            os.replace(partial, target)
+        except Exception as exc:
+            with self._lock:
+                record.update(state="failed", finished=time.time(), error=str(exc))
+                self._write_manifest(record)
+            return
+
+        with self._lock:
+            record.update(state="done", finished=time.time())
+            self._write_manifest(record)
+
+    def _count(self, job_id: str, outputs):
+        record = self._records[job_id]
+        written = time.monotonic()
+        for output in outputs:
+            with self._lock:
+                record["done"] += 1
+                if time.monotonic() - written >= PROGRESS_INTERVAL:
+                    written = time.monotonic()
+                    self._write_manifest(record)
+            yield output
+
+    def _claim(self, job_id: str) -> bool:
+        handle = open(self.job_dir(job_id) / CLAIM_NAME, "ab")
+        if fcntl is not None:
+            try:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                handle.close()
+                return False
+        with self._lock:
+            self._claims[job_id] = handle
+        return True
+
+    def _release(self, job_id: str) -> None:
+        with self._lock:
+            handle = self._claims.pop(job_id, None)
+        if handle is not None:
+            handle.close()
+
+    @staticmethod
+    def _read_manifest(manifest: Path) -> dict | None:
+        try:
+            record = json.loads(manifest.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if not isinstance(record, dict) or record.get("state") not in JOB_STATES:
+            return None
+        return record
+
+    def _write_manifest(self, record: dict) -> None:
+        manifest = self.job_dir(record["id"]) / MANIFEST_NAME
+        partial = manifest.with_name(MANIFEST_NAME + ".part")
+        partial.write_text(json.dumps(record), encoding="utf-8")
+        os.replace(partial, manifest)
@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+import threading
+from time import perf_counter
+from typing import Iterator
+
+STAGES = ("parse", "cadences", "palette", "voice", "hands", "humanize", "midi", "zip", "audio")
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COST_BUCKETS = (10.0, 100.0, 1000.0, 10_000.0, 100_000.0, 1_000_000.0, 10_000_000.0)
+VARIATION_BUCKETS = ((1, "1"), (10, "2-10"), (100, "11-100"), (1000, "101-1000"))
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> Iterator[tuple[str, int]]:
+        total = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            yield ("+Inf" if bound == float("inf") else repr(bound)), total
+
+
+class RequestTrace:
+    __slots__ = ("endpoint", "started", "stages")
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.started = perf_counter()
+        self.stages: dict[str, float] = {}
+
+    def elapsed(self) -> float:
+        return perf_counter() - self.started
+
+
+current_trace: ContextVar[RequestTrace | None] = ContextVar("current_trace", default=None)
+
+
+def variation_bucket(variations: int) -> str:
+    for limit, label in VARIATION_BUCKETS:
+        if variations <= limit:
+            return label
+    return f">{VARIATION_BUCKETS[-1][0]}"
+
+
+class MetricsRegistry:
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.stages: dict[str, Histogram] = {}
+        self.requests: dict[str, Histogram] = {}
+        self.request_counts: Counter[tuple[str, str, str]] = Counter()
+        self.costs: dict[str, Histogram] = {}
+        self.cost_seconds: dict[tuple[str, str], Histogram] = {}
+        self.rejections: Counter[str] = Counter()
+        self._lock = threading.Lock()
+
+    def observe_stage(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            histogram = self.stages.get(stage)
+            if histogram is None:
+                histogram = self.stages[stage] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def observe_request(self, endpoint: str, seconds: float) -> None:
+        with self._lock:
+            histogram = self.requests.get(endpoint)
+            if histogram is None:
+                histogram = self.requests[endpoint] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def count_request(self, endpoint: str, style: str, variations: int) -> None:
+        with self._lock:
+            self.request_counts[endpoint, style, variation_bucket(variations)] += 1
+
+    def observe_cost(
+        self, endpoint: str, units: float, estimated_seconds: float, actual_seconds: float | None = None
+    ) -> None:
+        with self._lock:
+            histogram = self.costs.get(endpoint)
+            if histogram is None:
+                histogram = self.costs[endpoint] = Histogram(COST_BUCKETS)
+            histogram.observe(units)
+            observed = [("estimated", estimated_seconds)]
+            if actual_seconds is not None:
+                observed.append(("actual", actual_seconds))
+            for kind, seconds in observed:
+                histogram = self.cost_seconds.get((endpoint, kind))
+                if histogram is None:
+                    histogram = self.cost_seconds[endpoint, kind] = Histogram(self.buckets)
+                histogram.observe(seconds)
+
+    def count_rejection(self, budget: str) -> None:
+        with self._lock:
+            self.rejections[budget] += 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self.stages.clear()
+            self.requests.clear()
+            self.request_counts.clear()
+            self.costs.clear()
+            self.cost_seconds.clear()
+            self.rejections.clear()
+
+    def render(self) -> str:
+        with self._lock:
+            lines = [
+                "# HELP voicing_stage_seconds Laufzeit einer Verarbeitungsstufe pro Aufruf.",
+                "# TYPE voicing_stage_seconds histogram",
+            ]
+            for stage in sorted(self.stages):
+                lines.extend(histogram_lines("voicing_stage_seconds", f'stage="{stage}"', self.stages[stage]))
+
+            lines += [
+                "# HELP voicing_request_seconds Gesamtlaufzeit pro HTTP-Request.",
+                "# TYPE voicing_request_seconds histogram",
+            ]
+            for endpoint in sorted(self.requests):
+                lines.extend(histogram_lines("voicing_request_seconds", f'endpoint="{endpoint}"', self.requests[endpoint]))
+
+            lines += [
+                "# HELP voicing_requests_total Generierungs-Requests nach Style und Variantenzahl.",
+                "# TYPE voicing_requests_total counter",
+            ]
+            for (endpoint, style, variations), count in sorted(self.request_counts.items()):
+                labels = f'endpoint="{endpoint}",style="{escape_label(style)}",variations="{variations}"'
+                lines.append(f"voicing_requests_total{{{labels}}} {count}")
+
+            lines += [
+                "# HELP voicing_request_cost_units Geschätzte Kosten pro Request in Akkord-Hits.",
+                "# TYPE voicing_request_cost_units histogram",
+            ]
+            for endpoint in sorted(self.costs):
+                lines.extend(histogram_lines("voicing_request_cost_units", f'endpoint="{endpoint}"', self.costs[endpoint]))
+
+            lines += [
+                "# HELP voicing_request_cost_seconds Geschätzte und tatsächliche Laufzeit zugelassener Requests.",
+                "# TYPE voicing_request_cost_seconds histogram",
+            ]
+            for endpoint, kind in sorted(self.cost_seconds):
+                labels = f'endpoint="{endpoint}",kind="{kind}"'
+                lines.extend(histogram_lines("voicing_request_cost_seconds", labels, self.cost_seconds[endpoint, kind]))
+
+            lines += [
+                "# HELP voicing_admission_rejected_total Wegen ausgeschöpftem Budget abgewiesene Requests.",
+                "# TYPE voicing_admission_rejected_total counter",
+            ]
+            for budget, count in sorted(self.rejections.items()):
+                lines.append(f'voicing_admission_rejected_total{{budget="{budget}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+
+def histogram_lines(name: str, labels: str, histogram: Histogram) -> list[str]:
+    lines = [f'{name}_bucket{{{labels},le="{bound}"}} {count}' for bound, count in histogram.cumulative()]
+    lines.append(f"{name}_sum{{{labels}}} {histogram.sum!r}")
+    lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+    return lines
+
+
+def escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+registry = MetricsRegistry()
+
+
+def record_stage(stage: str, seconds: float) -> None:
+    registry.observe_stage(stage, seconds)
+    trace = current_trace.get()
+    if trace is not None:
+        trace.stages[stage] = trace.stages.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    started = perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, perf_counter() - started)
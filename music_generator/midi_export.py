@@ -1,86 +1,335 @@
 from __future__ import annotations
 
-import io
+import heapq
+from operator import itemgetter
+import shutil
+import tempfile
+from typing import BinaryIO, Iterable, Iterator
 
-import mido
+from .metrics import timed
+from .voicings import Arrangement, VoicedChord
 
-from .voicings import Arrangement
+TICKS_PER_BEAT = 480
 
+NOTE_OFF = 0x80
+NOTE_ON = 0x90
 
-def arrangement_to_midi(arrangement: Arrangement, tempo: int) -> bytes:
-    ticks_per_beat = 480
-    midi = mido.MidiFile(type=1, ticks_per_beat=ticks_per_beat)
+META_TRACK_NAME = 0x03
+META_END_OF_TRACK = 0x2F
+META_SET_TEMPO = 0x51
+META_TIME_SIGNATURE = 0x58
 
-    meta_track = mido.MidiTrack()
-    midi.tracks.append(meta_track)
-    meta_track.append(mido.MetaMessage("set_tempo", tempo=mido.bpm2tempo(tempo), time=0))
-    meta_track.append(mido.MetaMessage("time_signature", numerator=4, denominator=4, time=0))
-    meta_track.append(mido.MetaMessage("track_name", name=f"Voicings ({arrangement.style})", time=0))
+SPOOL_MEMORY_LIMIT = 1024 * 1024
+STREAM_FLUSH_BYTES = 64 * 1024
 
-    left_track = mido.MidiTrack()
-    midi.tracks.append(left_track)
-    left_track.append(mido.MetaMessage("track_name", name="Piano LH", time=0))
+NoteEvent = tuple[int, int, int, int]
 
-    right_track = mido.MidiTrack()
-    midi.tracks.append(right_track)
-    right_track.append(mido.MetaMessage("track_name", name="Piano RH", time=0))
 
-    left_timeline: list[tuple[int, int, mido.Message]] = []
-    right_timeline: list[tuple[int, int, mido.Message]] = []
+def arrangement_to_midi(
+    arrangement: Arrangement,
+    tempo: int,
+    midi_type: int = 1,
+    compact: bool = False,
+) -> bytes:
+    if midi_type not in (0, 1):
+        raise ValueError(f"Nicht unterstützter MIDI-Typ: {midi_type}")
 
-    for event in arrangement.events:
-        start_tick = int(round(event.start_beat * ticks_per_beat))
-        end_tick = int(round((event.start_beat + event.duration) * ticks_per_beat))
+    with timed("midi"):
+        return encode_arrangement(arrangement, tempo, midi_type, compact)
 
-        for note in event.left_hand:
-            left_timeline.append(
-                (
-                    start_tick,
-                    1,
-                    mido.Message("note_on", note=note, velocity=max(40, event.velocity - 8), channel=0, time=0),
-                )
-            )
-            left_timeline.append(
-                (
-                    end_tick,
-                    0,
-                    mido.Message("note_off", note=note, velocity=0, channel=0, time=0),
-                )
-            )
 
-        notes_for_right = event.right_hand if event.right_hand else event.notes
-        for note in notes_for_right:
-            right_timeline.append(
-                (
-                    start_tick,
-                    1,
-                    mido.Message("note_on", note=note, velocity=event.velocity, channel=0, time=0),
-                )
-            )
-            right_timeline.append(
-                (
-                    end_tick,
-                    0,
-                    mido.Message("note_off", note=note, velocity=0, channel=0, time=0),
-                )
+def encode_arrangement(arrangement: Arrangement, tempo: int, midi_type: int, compact: bool) -> bytes:
+    header = meta_header(arrangement.style, tempo)
+    note_off = NOTE_ON if compact else NOTE_OFF
+
+    if midi_type == 0:
+        notes = heapq.merge(
+            hand_note_stream(arrangement, "left", channel=0, note_off=note_off),
+            hand_note_stream(arrangement, "right", channel=1, note_off=note_off),
+            key=itemgetter(0),
+        )
+        tracks = [encode_track(header, notes, end_delta=1)]
+    else:
+        tracks = [
+            encode_track(header, (), end_delta=0),
+            encode_track(
+                [meta_event(META_TRACK_NAME, b"Piano LH")],
+                hand_note_stream(arrangement, "left", channel=0, note_off=note_off),
+                end_delta=1,
+            ),
+            encode_track(
+                [meta_event(META_TRACK_NAME, b"Piano RH")],
+                hand_note_stream(arrangement, "right", channel=0, note_off=note_off),
+                end_delta=1,
+            ),
+        ]
+
+    data = bytearray(file_header(midi_type, len(tracks)))
+    for track in tracks:
+        data += chunk(b"MTrk", track)
+    return bytes(data)
+
+
+def file_header(midi_type: int, track_count: int) -> bytes:
+    body = midi_type.to_bytes(2, "big") + track_count.to_bytes(2, "big") + TICKS_PER_BEAT.to_bytes(2, "big")
+    return chunk(b"MThd", body)
+
+
+def chunk(kind: bytes, body: bytes | bytearray) -> bytes:
+    return kind + len(body).to_bytes(4, "big") + bytes(body)
+
+
+def meta_header(style: str, tempo: int) -> list[bytes]:
+    return [
+        meta_event(META_SET_TEMPO, bpm_to_tempo(tempo).to_bytes(3, "big")),
+        meta_event(META_TIME_SIGNATURE, bytes((4, 2, 24, 8))),
+        meta_event(META_TRACK_NAME, f"Voicings ({style})".encode("latin-1", errors="replace")),
+    ]
+
+
+def meta_event(meta_type: int, payload: bytes) -> bytes:
+    return bytes((0xFF, meta_type)) + encode_variable_int(len(payload)) + payload
+
+
+def bpm_to_tempo(bpm: float) -> int:
+    return int(round(60_000_000 / bpm))
+
+
+def encode_variable_int(value: int) -> bytes:
+    if value < 0:
+        raise ValueError("Variable-Length-Werte müssen positiv sein.")
+
+    buffer = [value & 0x7F]
+    value >>= 7
+    while value:
+        buffer.append((value & 0x7F) | 0x80)
+        value >>= 7
+    return bytes(reversed(buffer))
+
+
+def encode_track(meta_events: Iterable[bytes], notes: Iterable[NoteEvent], end_delta: int) -> bytearray:
+    encoder = TrackEncoder(meta_events)
+    encoder.add(notes)
+    return encoder.finish(end_delta)
+
+
+class TrackEncoder:
+    __slots__ = ("data", "running_status", "previous_tick")
+
+    def __init__(self, meta_events: Iterable[bytes] = ()):
+        self.data = bytearray()
+        self.running_status = -1
+        self.previous_tick = 0
+        for event in meta_events:
+            self.data.append(0)
+            self.data += event
+
+    def add(self, notes: Iterable[NoteEvent]) -> None:
+        data = self.data
+        running_status = self.running_status
+        previous_tick = self.previous_tick
+        for tick, status, note, velocity in notes:
+            data += encode_variable_int(tick - previous_tick)
+            previous_tick = tick
+            if status != running_status:
+                data.append(status)
+                running_status = status
+            data.append(note)
+            data.append(velocity)
+        self.running_status = running_status
+        self.previous_tick = previous_tick
+
+    def take(self) -> bytes:
+        data = bytes(self.data)
+        self.data.clear()
+        return data
+
+    def finish(self, end_delta: int) -> bytearray:
+        self.data += encode_variable_int(end_delta)
+        self.data += meta_event(META_END_OF_TRACK, b"")
+        return self.data
+
+
+class NoteScheduler:
+    __slots__ = ("on_status", "off_status", "pending", "sequence")
+
+    def __init__(self, channel: int = 0, note_off: int = NOTE_OFF):
+        self.on_status = NOTE_ON | channel
+        self.off_status = note_off | channel
+        self.pending: list[tuple[int, int, int]] = []
+        self.sequence = 0
+
+    def hit(self, start_tick: int, end_tick: int, notes: list[int], velocity: int) -> list[NoteEvent]:
+        pending = self.pending
+        events: list[NoteEvent] = []
+        while pending and pending[0][0] <= start_tick:
+            tick, _, note = heapq.heappop(pending)
+            events.append((tick, self.off_status, note, 0))
+        for note in notes:
+            events.append((start_tick, self.on_status, note, velocity))
+            heapq.heappush(pending, (end_tick, self.sequence, note))
+            self.sequence += 1
+        return events
+
+    def drain(self) -> list[NoteEvent]:
+        events: list[NoteEvent] = []
+        while self.pending:
+            tick, _, note = heapq.heappop(self.pending)
+            events.append((tick, self.off_status, note, 0))
+        return events
+
+
+def hit_ticks(start_beat: float, duration: float) -> tuple[int, int]:
+    return int(round(start_beat * TICKS_PER_BEAT)), int(round((start_beat + duration) * TICKS_PER_BEAT))
+
+
+def hand_hits(arrangement: Arrangement, hand: str) -> Iterator[tuple[int, int, list[int], int]]:
+    for start_beat, duration, velocity, voicing in arrangement.hits():
+        start_tick, end_tick = hit_ticks(start_beat, duration)
+        if hand == "left":
+            yield start_tick, end_tick, voicing.left_hand, max(40, velocity - 8)
+        else:
+            yield start_tick, end_tick, voicing.right_hand if voicing.right_hand else voicing.notes, velocity
+
+
+def hand_note_stream(
+    arrangement: Arrangement,
+    hand: str,
+    channel: int = 0,
+    note_off: int = NOTE_OFF,
+) -> Iterator[NoteEvent]:
+    hits = list(hand_hits(arrangement, hand))
+    if any(hits[i][0] > hits[i + 1][0] for i in range(len(hits) - 1)):
+        hits.sort(key=itemgetter(0))
+
+    scheduler = NoteScheduler(channel, note_off)
+    for start_tick, end_tick, notes, velocity in hits:
+        yield from scheduler.hit(start_tick, end_tick, notes, velocity)
+    yield from scheduler.drain()
+
+
+class _TrackOutput:
+    def __init__(self, output: BinaryIO, direct: bool):
+        self.output = output
+        self.direct = direct
+        self.length = 0
+        if direct:
+            output.write(b"MTrk")
+            self.length_position = output.tell()
+            output.write(bytes(4))
+        else:
+            self.spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY_LIMIT)
+
+    def write(self, data: bytes | bytearray) -> None:
+        if not data:
+            return
+        self.length += len(data)
+        if self.direct:
+            self.output.write(data)
+        else:
+            self.spool.write(data)
+
+    def close(self) -> None:
+        if self.direct:
+            end_position = self.output.tell()
+            self.output.seek(self.length_position)
+            self.output.write(self.length.to_bytes(4, "big"))
+            self.output.seek(end_position)
+            return
+
+        self.output.write(b"MTrk" + self.length.to_bytes(4, "big"))
+        self.spool.seek(0)
+        shutil.copyfileobj(self.spool, self.output)
+        self.spool.close()
+
+
+class MidiStreamWriter:
+    def __init__(
+        self,
+        output: BinaryIO,
+        style: str,
+        tempo: int,
+        midi_type: int = 1,
+        compact: bool = False,
+    ):
+        if midi_type not in (0, 1):
+            raise ValueError(f"Nicht unterstützter MIDI-Typ: {midi_type}")
+
+        self.output = output
+        self.midi_type = midi_type
+        self.closed = False
+        note_off = NOTE_ON if compact else NOTE_OFF
+        header = meta_header(style, tempo)
+        direct = is_seekable(output)
+
+        if midi_type == 0:
+            output.write(file_header(0, 1))
+            self.schedulers = (NoteScheduler(0, note_off), NoteScheduler(1, note_off))
+            self.encoders = (TrackEncoder(header),)
+        else:
+            output.write(file_header(1, 3))
+            output.write(chunk(b"MTrk", encode_track(header, (), end_delta=0)))
+            self.schedulers = (NoteScheduler(0, note_off), NoteScheduler(0, note_off))
+            self.encoders = (
+                TrackEncoder([meta_event(META_TRACK_NAME, b"Piano LH")]),
+                TrackEncoder([meta_event(META_TRACK_NAME, b"Piano RH")]),
             )
+        self.tracks = [_TrackOutput(output, direct=direct and index == 0) for index in range(len(self.encoders))]
+
+    def __enter__(self) -> MidiStreamWriter:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def add(self, event: VoicedChord) -> None:
+        start_tick, end_tick = hit_ticks(event.start_beat, event.duration)
+        left_scheduler, right_scheduler = self.schedulers
+        left = left_scheduler.hit(start_tick, end_tick, event.left_hand, max(40, event.velocity - 8))
+        right = right_scheduler.hit(
+            start_tick, end_tick, event.right_hand if event.right_hand else event.notes, event.velocity
+        )
+        self._emit(left, right)
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        left_scheduler, right_scheduler = self.schedulers
+        self._emit(left_scheduler.drain(), right_scheduler.drain())
+
+        for encoder, track in zip(self.encoders, self.tracks):
+            encoder.finish(end_delta=1)
+            track.write(encoder.take())
+            track.close()
 
-    append_timeline(left_track, left_timeline)
-    append_timeline(right_track, right_timeline)
+    def _emit(self, left: list[NoteEvent], right: list[NoteEvent]) -> None:
+        if self.midi_type == 0:
+            self.encoders[0].add(heapq.merge(left, right, key=itemgetter(0)))
+        else:
+            self.encoders[0].add(left)
+            self.encoders[1].add(right)
 
-    buffer = io.BytesIO()
-    midi.save(file=buffer)
-    return buffer.getvalue()
+        for encoder, track in zip(self.encoders, self.tracks):
+            if len(encoder.data) >= STREAM_FLUSH_BYTES:
+                track.write(encoder.take())
 
 
-def append_timeline(track: mido.MidiTrack, timeline: list[tuple[int, int, mido.Message]]) -> None:
-    timeline.sort(key=lambda item: (item[0], item[1]))
+def write_midi_stream(
+    events: Iterable[VoicedChord],
+    output: BinaryIO,
+    style: str,
+    tempo: int,
+    midi_type: int = 1,
+    compact: bool = False,
+) -> None:
+    with MidiStreamWriter(output, style, tempo, midi_type=midi_type, compact=compact) as writer:
+        for event in events:
+            writer.add(event)
 
-    previous_tick = 0
-    for tick, _, message in timeline:
-        delta = tick - previous_tick
-        message.time = max(0, delta)
-        track.append(message)
-        previous_tick = tick
 
-    track.append(mido.MetaMessage("end_of_track", time=1))
+def is_seekable(output: BinaryIO) -> bool:
+    try:
+        return output.seekable()
+    except AttributeError:
+        return False
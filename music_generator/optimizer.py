@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+from typing import Callable, Sequence
+
+import numpy as np
+
+from .catalog import pitch_class_mask, voicing_catalog
+
+DEFAULT_BEAM_WIDTH = 32
+
+
+def candidate_matrix(
+    pitch_classes: Sequence[int],
+    low: int,
+    high: int,
+    note_count: int,
+    fallback: Callable[[], Sequence[int]],
+) -> np.ndarray:
+    bucket = voicing_catalog(low, high, note_count).buckets.get(pitch_class_mask(pitch_classes))
+    if not bucket:
+        return np.asarray([fallback()], dtype=np.int16)
+    return np.frombuffer(bucket, dtype=np.uint8).reshape(-1, note_count).astype(np.int16)
+
+
+def transition_costs(previous: np.ndarray, candidates: np.ndarray) -> np.ndarray:
+    return np.abs(previous[:, None, :] - candidates[None, :, :]).sum(axis=2, dtype=np.int32)
+
+
+def optimize_voice_leading(
+    candidates: Sequence[np.ndarray],
+    start: Sequence[int],
+    beam_width: int | None = DEFAULT_BEAM_WIDTH,
+) -> list[np.ndarray]:
+    if not candidates:
+        return []
+    if beam_width is not None and beam_width < 1:
+        raise ValueError("Die Beam-Breite muss mindestens 1 sein.")
+
+    states = np.arange(len(candidates[0]))
+    costs = transition_costs(np.asarray([start], dtype=np.int16), candidates[0])[0].astype(np.int64)
+    backpointers: list[np.ndarray] = []
+    state_history: list[np.ndarray] = []
+
+    for step in range(1, len(candidates)):
+        states, costs = prune(states, costs, beam_width)
+        state_history.append(states)
+
+        step_costs = costs[:, None] + transition_costs(candidates[step - 1][states], candidates[step])
+        best_previous = step_costs.argmin(axis=0)
+        backpointers.append(best_previous)
+        costs = step_costs[best_previous, np.arange(step_costs.shape[1])]
+        states = np.arange(len(candidates[step]))
+
+    choice = int(states[costs.argmin()])
+    path = [choice]
+    for step in range(len(candidates) - 1, 0, -1):
+        choice = int(state_history[step - 1][backpointers[step - 1][choice]])
+        path.append(choice)
+    path.reverse()
+
+    return [candidates[step][index] for step, index in enumerate(path)]
+
+
+def prune(states: np.ndarray, costs: np.ndarray, beam_width: int | None) -> tuple[np.ndarray, np.ndarray]:
+    if beam_width is None or len(costs) <= beam_width:
+        return states, costs
+    keep = np.sort(np.argpartition(costs, beam_width - 1)[:beam_width])
+    return states[keep], costs[keep]
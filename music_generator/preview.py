@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+from array import array
+import struct
+import sys
+
+from .voicings import Arrangement
+
+PREVIEW_MEDIA_TYPE = "application/vnd.voicings.preview"
+PREVIEW_MAGIC = b"MVP1"
+
+# magic, seed, total_beats, tempo, style length, voicing count, event count
+HEADER = struct.Struct("<4sqdHHII")
+
+
+def preview_json(arrangement: Arrangement, seed: int, tempo: int) -> dict:
+    return {
+        "seed": seed,
+        "style": arrangement.style,
+        "tempo": tempo,
+        "events": [
+            {
+                "start_beat": start_beat,
+                "duration": duration,
+                "velocity": velocity,
+                "left_hand": voicing.left_hand,
+                "right_hand": voicing.right_hand,
+            }
+            for start_beat, duration, velocity, voicing in arrangement.hits()
+        ],
+        "total_beats": arrangement.total_beats,
+    }
+
+
+def preview_patch(arrangement: Arrangement, seed: int, tempo: int, event_indices: list[int], base: str) -> dict:
+    voicings = arrangement.voicings
+    return {
+        "seed": seed,
+        "style": arrangement.style,
+        "tempo": tempo,
+        "base": base,
+        "events": [
+            {
+                "index": index,
+                "start_beat": arrangement.starts[index],
+                "duration": arrangement.durations[index],
+                "velocity": arrangement.velocities[index],
+                "left_hand": voicings[arrangement.voicing_ids[index]].left_hand,
+                "right_hand": voicings[arrangement.voicing_ids[index]].right_hand,
+            }
+            for index in event_indices
+        ],
+        "total_beats": arrangement.total_beats,
+    }
+
+
+def encode_preview(arrangement: Arrangement, seed: int, tempo: int) -> bytes:
+    # Arrangement voicings are per chord; the table keeps one entry per distinct pair of hands.
+    table: dict[tuple[tuple[int, ...], tuple[int, ...]], int] = {}
+    table_ids = [
+        table.setdefault((tuple(voicing.left_hand), tuple(voicing.right_hand)), len(table))
+        for voicing in arrangement.voicings
+    ]
+    voicing_ids = array("I", [table_ids[voicing_id] for voicing_id in arrangement.voicing_ids])
+
+    style = arrangement.style.encode("utf-8")
+    data = bytearray(
+        HEADER.pack(
+            PREVIEW_MAGIC,
+            seed,
+            arrangement.total_beats,
+            tempo,
+            len(style),
+            len(table),
+            len(arrangement),
+        )
+    )
+    data += style
+    for left_hand, right_hand in table:
+        data.append(len(left_hand))
+        data.append(len(right_hand))
+        data += bytes(left_hand)
+        data += bytes(right_hand)
+    data += bytes(-len(data) % 8)
+
+    for column in (arrangement.starts, arrangement.durations, voicing_ids, arrangement.velocities):
+        if sys.byteorder == "big":
+            column = array(column.typecode, column)
+            column.byteswap()
+        data += column.tobytes()
+    return bytes(data)
+
+
+def decode_preview(data: bytes) -> dict:
+    magic, seed, total_beats, tempo, style_length, voicing_count, event_count = HEADER.unpack_from(data)
+    if magic != PREVIEW_MAGIC:
+        raise ValueError("Unbekanntes Preview-Format.")
+
+    offset = HEADER.size
+    style = data[offset:offset + style_length].decode("utf-8")
+    offset += style_length
+
+    voicings = []
+    for _ in range(voicing_count):
+        left_count, right_count = data[offset], data[offset + 1]
+        offset += 2
+        left_hand = list(data[offset:offset + left_count])
+        offset += left_count
+        voicings.append((left_hand, list(data[offset:offset + right_count])))
+        offset += right_count
+    offset += -offset % 8
+
+    columns = []
+    for typecode in ("d", "d", "I", "B"):
+        column = array(typecode)
+        end = offset + column.itemsize * event_count
+        column.frombytes(data[offset:end])
+        if sys.byteorder == "big":
+            column.byteswap()
+        columns.append(column)
+        offset = end
+    starts, durations, voicing_ids, velocities = columns
+
+    return {
+        "seed": seed,
+        "style": style,
+        "tempo": tempo,
+        "events": [
+            {
+                "start_beat": starts[i],
+                "duration": durations[i],
+                "velocity": velocities[i],
+                "left_hand": voicings[voicing_ids[i]][0],
+                "right_hand": voicings[voicing_ids[i]][1],
+            }
+            for i in range(event_count)
+        ],
+        "total_beats": total_beats,
+    }
@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+import argparse
+import cProfile
+from datetime import datetime
+import io
+import json
+import os
+from pathlib import Path
+import pstats
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Sequence
+
+PROFILE_MODES = ("cpu", "memory")
+TRACEMALLOC_FRAMES = 16
+
+_memory_lock = threading.Lock()
+
+
+def parse_profile_modes(value: str) -> tuple[str, ...]:
+    modes = tuple(dict.fromkeys(mode.strip().lower() for mode in value.split(",") if mode.strip()))
+    unknown = [mode for mode in modes if mode not in PROFILE_MODES]
+    if unknown:
+        raise ValueError(f"Unbekannter Profiling-Modus: {', '.join(unknown)}")
+    return modes
+
+
+def settings_record(settings: dict) -> dict:
+    return {
+        "progression": " ".join(chord.symbol for chord in settings["chords"]),
+        "style": settings["requested_style"],
+        "tempo": settings["tempo"],
+        "complexity": settings["complexity"],
+        "beats_per_chord": settings["beats_per_chord"],
+        "variations": settings["variations"],
+        "humanize": settings["humanize"],
+        "humanize_amount": settings["humanize_amount"],
+        "seed": settings["seed"],
+    }
+
+
+def settings_from_record(record: dict) -> dict:
+    from .theory import parse_progression
+
+    return {
+        "requested_style": record["style"],
+        "tempo": int(record["tempo"]),
+        "complexity": float(record["complexity"]),
+        "beats_per_chord": float(record["beats_per_chord"]),
+        "variations": int(record.get("variations", 1)),
+        "humanize": bool(record["humanize"]),
+        "humanize_amount": float(record["humanize_amount"]),
+        "seed": record.get("seed"),
+        "chords": parse_progression(record["progression"]),
+    }
+
+
+class ProfileSession:
+    def __init__(self, modes: Sequence[str], output_dir: str | os.PathLike, tag: str):
+        self.modes = tuple(modes)
+        self.output_dir = Path(output_dir)
+        safe_tag = re.sub(r"[^A-Za-z0-9_.-]+", "-", tag).strip("-") or "profile"
+        self.stem = f"{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}_{safe_tag}"
+        self.profiler: cProfile.Profile | None = None
+        self.tracing = False
+        self.started = 0.0
+
+    def start(self) -> bool:
+        if "memory" in self.modes:
+            if not _memory_lock.acquire(blocking=False):
+                return False
+            if tracemalloc.is_tracing():
+                _memory_lock.release()
+                return False
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            self.tracing = True
+        if "cpu" in self.modes:
+            self.profiler = cProfile.Profile()
+            try:
+                self.profiler.enable()
+            except ValueError:
+                self.profiler = None
+                self._stop_tracing()
+                return False
+        self.started = time.perf_counter()
+        return True
+
+    def _stop_tracing(self) -> None:
+        if self.tracing:
+            tracemalloc.stop()
+            _memory_lock.release()
+            self.tracing = False
+
+    def stop(self, settings: dict | None = None, **details) -> list[Path]:
+        seconds = time.perf_counter() - self.started
+        if self.profiler is not None:
+            self.profiler.disable()
+        snapshot = None
+        if self.tracing:
+            snapshot = tracemalloc.take_snapshot()
+            details["peak_memory_bytes"] = tracemalloc.get_traced_memory()[1]
+            self._stop_tracing()
+
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        written = []
+        if self.profiler is not None:
+            path = self.output_dir / f"{self.stem}.prof"
+            self.profiler.dump_stats(path)
+            written.append(path)
+        if snapshot is not None:
+            path = self.output_dir / f"{self.stem}.snapshot"
+            snapshot.dump(str(path))
+            written.append(path)
+
+        path = self.output_dir / f"{self.stem}.json"
+        record = dict(
+            details,
+            seconds=seconds,
+            modes=list(self.modes),
+            files=[item.name for item in written],
+            settings=settings_record(settings) if settings is not None else None,
+        )
+        path.write_text(json.dumps(record, indent=2), encoding="utf-8")
+        written.append(path)
+        return written
+
+
+def replay(record: dict, modes: Sequence[str], output_dir: str | os.PathLike, repeat: int = 1) -> list[Path]:
+    from .batch import job_arrangement, plan_variations
+    from .midi_export import arrangement_to_midi
+
+    settings = settings_from_record(record)
+    if settings["seed"] is None:
+        raise ValueError("Die Einstellungen enthalten keinen Seed; ohne Seed ist kein Replay möglich.")
+    jobs = plan_variations(settings, int(settings["seed"]))
+
+    session = ProfileSession(modes, output_dir, tag=f"replay_{settings['seed']}")
+    if not session.start():
+        raise RuntimeError("Es läuft bereits ein Profiler.")
+    try:
+        for _ in range(repeat):
+            for job in jobs:
+                arrangement_to_midi(job_arrangement(job), tempo=job.tempo)
+    finally:
+        written = session.stop(settings, source="replay", repeat=repeat)
+    return written
+
+
+def summarize(paths: Sequence[Path], top: int) -> str:
+    output = io.StringIO()
+    for path in paths:
+        if path.suffix == ".prof":
+            stats = pstats.Stats(str(path), stream=output)
+            stats.sort_stats("cumulative").print_stats(top)
+        elif path.suffix == ".snapshot":
+            output.write(f"Top {top} Allokationen ({path.name}):\n")
+            for statistic in tracemalloc.Snapshot.load(str(path)).statistics("lineno")[:top]:
+                output.write(f"  {statistic}\n")
+    return output.getvalue()
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Spielt gespeicherte Request-Einstellungen unter dem Profiler ab.")
+    parser.add_argument("settings", help="JSON-Datei aus dem Profiling-Verzeichnis oder mit einem 'settings'-Objekt")
+    parser.add_argument("--mode", default="cpu", help="cpu, memory oder cpu,memory (Standard: cpu)")
+    parser.add_argument("--output-dir", default="profiles", help="Zielverzeichnis für .prof/.snapshot")
+    parser.add_argument("--repeat", type=int, default=1, help="Wiederholungen des gesamten Replays")
+    parser.add_argument("--top", type=int, default=25, help="Anzahl Zeilen in der Zusammenfassung")
+    args = parser.parse_args(argv)
+
+    with open(args.settings, encoding="utf-8") as handle:
+        record = json.load(handle)
+    written = replay(record.get("settings", record), parse_profile_modes(args.mode), args.output_dir, args.repeat)
+
+    print(summarize(written, args.top))
+    for path in written:
+        print(path, file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
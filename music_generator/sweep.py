@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+import random
+from time import perf_counter
+from typing import Iterable, Sequence
+
+from .metrics import record_stage, timed
+from .theory import ChordSymbol, degree_to_semitone
+from .voicings import (
+    ALTERED_TENSIONS,
+    STYLES,
+    Arrangement,
+    StyleProfile,
+    Voicing,
+    add_chord_hits,
+    analyze_cadences,
+    base_pitch_class_palette,
+    can_alter,
+    chord_hits,
+    generate_arrangement,
+    humanize_arrangement,
+    merge_pitch_classes,
+    place_voice,
+    rank_pitch_classes,
+    required_pitch_classes,
+    split_voice_hands,
+    voice_note_count,
+)
+
+
+# Seed-independent analysis of one progression, shared by every seed of a sweep.
+class SweepPlan:
+    __slots__ = (
+        "chords",
+        "profile",
+        "complexity",
+        "note_count",
+        "roles",
+        "required",
+        "altered",
+        "shuffle",
+        "_bases",
+        "_ordered",
+        "_chosen",
+        "_voicings",
+        "palette_seconds",
+        "hands_seconds",
+    )
+
+    def __init__(self, chords: Sequence[ChordSymbol], profile: StyleProfile, complexity: float):
+        self.chords = list(chords)
+        self.profile = profile
+        self.complexity = complexity
+        self.note_count = voice_note_count(profile, complexity)
+        with timed("cadences"):
+            self.roles = analyze_cadences(self.chords)
+        self.required = [required_pitch_classes(chord) for chord in self.chords]
+        self.altered = [
+            tuple((chord.root_pc + degree_to_semitone(tension)) % 12 for tension in ALTERED_TENSIONS)
+            if can_alter(chord, complexity)
+            else None
+            for chord in self.chords
+        ]
+        self.shuffle = complexity > 0.75
+        self._bases: dict[tuple[int, str], frozenset[int]] = {}
+        self._ordered: dict[tuple[int, str, int | None], list[int]] = {}
+        self._chosen: dict[tuple[int, str, int | None], list[int]] = {}
+        self._voicings: dict[tuple, tuple[Voicing, tuple[int, ...]]] = {}
+        self.palette_seconds = 0.0
+        self.hands_seconds = 0.0
+
+    def ordered(self, index: int, mode_color: str, altered: int | None) -> list[int]:
+        key = (index, mode_color, altered)
+        ordered = self._ordered.get(key)
+        if ordered is None:
+            started = perf_counter()
+            base = self._bases.get(key[:2])
+            if base is None:
+                base = self._bases[key[:2]] = frozenset(
+                    base_pitch_class_palette(
+                        self.chords[index], self.profile, self.complexity, mode_color, self.roles[index]
+                    )
+                )
+            pcs = base if altered is None else base | {altered}
+            ordered = self._ordered[key] = rank_pitch_classes(self.chords[index], sorted(pcs), self.roles[index])
+            self.palette_seconds += perf_counter() - started
+        return ordered
+
+    def chosen(self, index: int, mode_color: str, altered: int | None, rng: random.Random) -> list[int]:
+        ordered = self.ordered(index, mode_color, altered)
+        if self.shuffle:
+            tail = ordered[2:]
+            rng.shuffle(tail)
+            return merge_pitch_classes(self.required[index], ordered[:2] + tail, self.note_count)
+
+        key = (index, mode_color, altered)
+        chosen = self._chosen.get(key)
+        if chosen is None:
+            chosen = self._chosen[key] = merge_pitch_classes(self.required[index], ordered, self.note_count)
+        return chosen
+
+    def voicing(
+        self, index: int, chosen: list[int], previous: tuple[int, ...] | None
+    ) -> tuple[Voicing, tuple[int, ...]]:
+        key = (index, tuple(chosen), previous)
+        found = self._voicings.get(key)
+        if found is None:
+            chord = self.chords[index]
+            voice = place_voice(
+                list(chosen),
+                list(previous) if previous else None,
+                self.profile,
+                self.complexity,
+                self.roles[index],
+            )
+            started = perf_counter()
+            left_hand, right_hand = split_voice_hands(chord, voice, self.complexity)
+            self.hands_seconds += perf_counter() - started
+            found = self._voicings[key] = (Voicing(chord, voice, left_hand, right_hand), tuple(voice))
+        return found
+
+    def voicings(self, seed: int) -> list[Voicing]:
+        rng = random.Random(seed)
+        modal_colors = self.profile.modal_colors
+        mode_colors = [rng.choice(modal_colors) for _ in self.chords]
+
+        voicings = []
+        previous: tuple[int, ...] | None = None
+        for index, mode_color in enumerate(mode_colors):
+            altered = None
+            candidates = self.altered[index]
+            if candidates is not None and rng.random() < 0.6:
+                altered = rng.choice(candidates)
+            chosen = self.chosen(index, mode_color, altered, rng)
+            voicing, previous = self.voicing(index, chosen, previous)
+            voicings.append(voicing)
+        return voicings
+
+
+def sweep_arrangements(
+    chords: list[ChordSymbol],
+    style: str,
+    complexity: float,
+    beats_per_chord: float,
+    tempo: int,
+    seeds: Iterable[int],
+    humanize: bool = False,
+    humanize_amount: float = 0.0,
+    voice_leading: str | None = None,
+    humanize_engine: str = "random",
+) -> list[Arrangement]:
+    if style not in STYLES:
+        raise ValueError(f"Style nicht gefunden: {style}")
+
+    seeds = list(seeds)
+    profile = STYLES[style]
+    if (voice_leading or profile.voice_leading) != "greedy":
+        return [
+            generate_arrangement(
+                chords,
+                style,
+                complexity,
+                beats_per_chord,
+                tempo,
+                seed=seed,
+                humanize=humanize,
+                humanize_amount=humanize_amount,
+                voice_leading=voice_leading,
+                humanize_engine=humanize_engine,
+            )
+            for seed in seeds
+        ]
+
+    complexity = min(max(complexity, 0.0), 1.0)
+    humanize_amount = min(max(humanize_amount, 0.0), 1.0)
+    plan = SweepPlan(chords, profile, complexity)
+    hits = chord_hits(profile, beats_per_chord)
+
+    arrangements = []
+    started = perf_counter()
+    for seed in seeds:
+        arrangement = Arrangement(style=style)
+        add_chord_hits(arrangement, plan.voicings(seed), hits, beats_per_chord)
+        arrangements.append(arrangement)
+    record_stage("palette", plan.palette_seconds)
+    record_stage("hands", plan.hands_seconds)
+    record_stage("voice", perf_counter() - started - plan.palette_seconds - plan.hands_seconds)
+
+    if humanize and humanize_amount > 0:
+        humanize_seeds = [seed + 7919 for seed in seeds]
+        if humanize_engine == "random":
+            for arrangement, humanize_seed in zip(arrangements, humanize_seeds):
+                humanize_arrangement(arrangement, humanize_amount, humanize_seed)
+        else:
+            from .humanize import humanize_arrangements
+
+            with timed("humanize"):
+                humanize_arrangements(arrangements, humanize_amount, humanize_seeds, engine=humanize_engine)
+
+    return arrangements
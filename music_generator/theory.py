@@ -1,8 +1,11 @@
 from __future__ import annotations
 
 from dataclasses import dataclass, field
+from functools import lru_cache
 import re
 
+from .metrics import timed
+
 NOTE_TO_PC = {
     "C": 0,
     "B#": 0,
@@ -53,6 +56,10 @@ BUILTIN_PROGRESSIONS = [
 ]
 
 CHORD_RE = re.compile(r"^\s*([A-Ga-g](?:#|b)?)([^\s/]*)(?:/([A-Ga-g](?:#|b)?))?\s*$")
+TOKEN_SPLIT_RE = re.compile(r"[|,;\n\t\r ]+")
+ALTERATION_RE = re.compile(r"(b9|#9|#11|b13|b5|#5)")
+
+CHORD_CACHE_SIZE = 4096
 
 
 @dataclass(frozen=True)
@@ -61,8 +68,8 @@ class ChordSymbol:
     root_name: str
     root_pc: int
     quality: str
-    extensions: set[str] = field(default_factory=set)
-    alterations: set[str] = field(default_factory=set)
+    extensions: frozenset[str] = field(default_factory=frozenset)
+    alterations: frozenset[str] = field(default_factory=frozenset)
     bass_pc: int | None = None
 
 
@@ -70,17 +77,23 @@ def parse_progression(text: str) -> list[ChordSymbol]:
     if not text or not text.strip():
         raise ValueError("Bitte gib mindestens einen Akkord ein.")
 
-    tokens = [
-        token.strip()
-        for token in re.split(r"[|,;\n\t\r ]+", text)
-        if token.strip()
-    ]
-    if not tokens:
-        raise ValueError("Es wurden keine gültigen Akkorde erkannt.")
+    with timed("parse"):
+        tokens = [
+            token.strip()
+            for token in TOKEN_SPLIT_RE.split(text)
+            if token.strip()
+        ]
+        if not tokens:
+            raise ValueError("Es wurden keine gültigen Akkorde erkannt.")
+
+        return [parse_chord(token) for token in tokens]
+
 
-    return [parse_chord(token) for token in tokens]
+def parse_progressions(texts: list[str]) -> list[list[ChordSymbol]]:
+    return [parse_progression(text) for text in texts]
 
 
+@lru_cache(maxsize=CHORD_CACHE_SIZE)
 def parse_chord(token: str) -> ChordSymbol:
     match = CHORD_RE.match(token)
     if not match:
@@ -92,8 +105,7 @@ def parse_chord(token: str) -> ChordSymbol:
     if root_name not in NOTE_TO_PC:
         raise ValueError(f"Unbekannter Grundton: {root_name}")
 
-    quality = classify_quality(descriptor)
-    extensions, alterations = parse_color_tones(descriptor)
+    quality, extensions, alterations = parse_descriptor(descriptor)
     bass_pc = NOTE_TO_PC[bass_name] if bass_name else None
 
     return ChordSymbol(
@@ -107,6 +119,12 @@ def parse_chord(token: str) -> ChordSymbol:
     )
 
 
+@lru_cache(maxsize=CHORD_CACHE_SIZE)
+def parse_descriptor(descriptor: str) -> tuple[str, frozenset[str], frozenset[str]]:
+    extensions, alterations = parse_color_tones(descriptor)
+    return classify_quality(descriptor), frozenset(extensions), frozenset(alterations)
+
+
 def normalize_note_name(note_name: str) -> str:
     if not note_name:
         raise ValueError("Leerer Notenname.")
@@ -153,7 +171,7 @@ def classify_quality(descriptor: str) -> str:
 def parse_color_tones(descriptor: str) -> tuple[set[str], set[str]]:
     d = descriptor.lower()
 
-    alterations = set(re.findall(r"(b9|#9|#11|b13|b5|#5)", d))
+    alterations = set(ALTERATION_RE.findall(d))
 
     extension_tokens = {
         "add9": "9",
@@ -1,8 +1,15 @@
 from __future__ import annotations
 
+from array import array
+from collections import deque
 from dataclasses import dataclass
+import heapq
 import random
+from time import perf_counter
+from typing import Iterable, Iterator, Sequence, overload
 
+from .catalog import voicing_catalog
+from .metrics import record_stage, timed
 from .theory import (
     ChordSymbol,
     chord_tone_intervals,
@@ -24,6 +31,8 @@ class StyleProfile:
     hit_pattern: list[tuple[float, float, float]]
     default_tensions: dict[str, tuple[str, ...]]
     modal_colors: tuple[str, ...]
+    voice_leading: str = "greedy"
+    beam_width: int | None = 32
 
 
 @dataclass(frozen=True)
@@ -39,11 +48,142 @@ class VoicedChord:
 
 
 @dataclass(frozen=True)
+class Voicing:
+    chord: ChordSymbol
+    notes: list[int]
+    left_hand: list[int]
+    right_hand: list[int]
+
+
 class Arrangement:
-    style: str
-    events: list[VoicedChord]
-    total_beats: float
+    __slots__ = ("style", "total_beats", "voicings", "starts", "durations", "velocities", "voicing_ids")
+
+    def __init__(self, style: str, events: Iterable[VoicedChord] = (), total_beats: float = 0.0):
+        self.style = style
+        self.total_beats = total_beats
+        self.voicings: list[Voicing] = []
+        self.starts = array("d")
+        self.durations = array("d")
+        self.velocities = array("B")
+        self.voicing_ids = array("I")
+
+        voicing_ids: dict[tuple[int, int, int, int], int] = {}
+        for event in events:
+            identity = (id(event.chord), id(event.notes), id(event.left_hand), id(event.right_hand))
+            voicing_id = voicing_ids.get(identity)
+            if voicing_id is None:
+                voicing_id = voicing_ids[identity] = self.add_voicing(
+                    Voicing(event.chord, event.notes, event.left_hand, event.right_hand)
+                )
+            self.add_hit(voicing_id, event.start_beat, event.duration, event.velocity)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Arrangement):
+            return NotImplemented
+        return (
+            self.style == other.style
+            and self.total_beats == other.total_beats
+            and self.starts == other.starts
+            and self.durations == other.durations
+            and self.velocities == other.velocities
+            and [self.voicings[i] for i in self.voicing_ids] == [other.voicings[i] for i in other.voicing_ids]
+        )
 
+    @property
+    def events(self) -> ArrangementEvents:
+        return ArrangementEvents(self)
+
+    def add_voicing(self, voicing: Voicing) -> int:
+        self.voicings.append(voicing)
+        return len(self.voicings) - 1
+
+    def add_hit(self, voicing_id: int, start_beat: float, duration: float, velocity: int) -> None:
+        self.starts.append(start_beat)
+        self.durations.append(duration)
+        self.velocities.append(velocity)
+        self.voicing_ids.append(voicing_id)
+
+    def hits(self) -> Iterator[tuple[float, float, int, Voicing]]:
+        voicings = self.voicings
+        for start_beat, duration, velocity, voicing_id in zip(
+            self.starts, self.durations, self.velocities, self.voicing_ids
+        ):
+            yield start_beat, duration, velocity, voicings[voicing_id]
+
+    def event(self, index: int) -> VoicedChord:
+        voicing = self.voicings[self.voicing_ids[index]]
+        return VoicedChord(
+            chord=voicing.chord,
+            style=self.style,
+            start_beat=self.starts[index],
+            duration=self.durations[index],
+            notes=voicing.notes,
+            left_hand=voicing.left_hand,
+            right_hand=voicing.right_hand,
+            velocity=self.velocities[index],
+        )
+
+    def sort_by_start(self) -> None:
+        starts = self.starts
+        if all(starts[i] <= starts[i + 1] for i in range(len(starts) - 1)):
+            return
+
+        order = sorted(range(len(starts)), key=starts.__getitem__)
+        for column in (self.starts, self.durations, self.velocities, self.voicing_ids):
+            column[:] = array(column.typecode, [column[i] for i in order])
+
+
+class ArrangementEvents(Sequence[VoicedChord]):
+    __slots__ = ("_arrangement",)
+
+    def __init__(self, arrangement: Arrangement):
+        self._arrangement = arrangement
+
+    def __len__(self) -> int:
+        return len(self._arrangement)
+
+    @overload
+    def __getitem__(self, index: int) -> VoicedChord: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[VoicedChord]: ...
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._arrangement.event(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("Event-Index außerhalb des Arrangements.")
+        return self._arrangement.event(index)
+
+    def __iter__(self) -> Iterator[VoicedChord]:
+        arrangement = self._arrangement
+        style = arrangement.style
+        for start_beat, duration, velocity, voicing in arrangement.hits():
+            yield VoicedChord(
+                chord=voicing.chord,
+                style=style,
+                start_beat=start_beat,
+                duration=duration,
+                notes=voicing.notes,
+                left_hand=voicing.left_hand,
+                right_hand=voicing.right_hand,
+                velocity=velocity,
+            )
+
+
+VOICE_LEADING_MODES = ("greedy", "optimal")
+ALTERED_TENSIONS = ("b9", "#9", "#11", "b13")
+ROLE_WEIGHTS = {
+    "ii": {2: 0, 5: 1, 9: 2},
+    "V": {10: 0, 1: 1, 6: 2, 8: 3},
+    "I": {4: 0, 11: 1, 2: 2, 9: 3},
+    "neutral": {4: 0, 7: 1, 2: 2},
+}
 
 STYLES: dict[str, StyleProfile] = {
     "jazz": StyleProfile(
@@ -133,6 +273,8 @@ def generate_arrangement(
     seed: int | None = None,
     humanize: bool = False,
     humanize_amount: float = 0.0,
+    voice_leading: str | None = None,
+    humanize_engine: str = "random",
 ) -> Arrangement:
     if style not in STYLES:
         raise ValueError(f"Style nicht gefunden: {style}")
@@ -142,75 +284,263 @@ def generate_arrangement(
     humanize_amount = min(max(humanize_amount, 0.0), 1.0)
     rng = random.Random(seed)
 
-    cadence_roles = analyze_cadences(chords)
-    mode_track = [rng.choice(profile.modal_colors) for _ in chords]
+    arrangement = Arrangement(style=style)
+    add_chord_hits(
+        arrangement,
+        iter_voicings(chords, profile, complexity, rng, voice_leading),
+        chord_hits(profile, beats_per_chord),
+        beats_per_chord,
+    )
+
+    if humanize and humanize_amount > 0:
+        humanize_seed = (seed if seed is not None else rng.randint(1, 1_000_000_000)) + 7919
+        humanize_arrangement(arrangement, humanize_amount, humanize_seed, humanize_engine)
+
+    return arrangement
+
+
+def add_chord_hits(
+    arrangement: Arrangement,
+    voicings: Iterable[Voicing],
+    hits: list[tuple[float, float, int]],
+    beats_per_chord: float,
+) -> None:
+    current_beat = arrangement.total_beats
+    for voicing in voicings:
+        voicing_id = arrangement.add_voicing(voicing)
+        for offset, duration, velocity in hits:
+            arrangement.add_hit(voicing_id, current_beat + offset, duration, velocity)
+        current_beat += beats_per_chord
+    arrangement.total_beats = current_beat
+
+
+def humanize_arrangement(arrangement: Arrangement, amount: float, humanize_seed: int, engine: str = "random") -> None:
+    with timed("humanize"):
+        if engine == "random":
+            apply_humanize(arrangement, amount=amount, rng=random.Random(humanize_seed))
+        else:
+            from .humanize import humanize_arrangements
+
+            humanize_arrangements([arrangement], amount, [humanize_seed], engine=engine)
+
+
+def iter_arrangement(
+    chords: Sequence[ChordSymbol],
+    style: str,
+    complexity: float,
+    beats_per_chord: float,
+    tempo: int,
+    seed: int | None = None,
+    humanize: bool = False,
+    humanize_amount: float = 0.0,
+    voice_leading: str | None = None,
+) -> Iterator[VoicedChord]:
+    if style not in STYLES:
+        raise ValueError(f"Style nicht gefunden: {style}")
 
-    events: list[VoicedChord] = []
+    profile = STYLES[style]
+    complexity = min(max(complexity, 0.0), 1.0)
+    humanize_amount = min(max(humanize_amount, 0.0), 1.0)
+    if seed is None:
+        seed = random.randint(1, 1_000_000_000)
+    rng = random.Random(seed)
+
+    total_beats = 0.0
+    for _ in chords:
+        total_beats += beats_per_chord
+
+    humanize_rng = random.Random(seed + 7919) if humanize and humanize_amount > 0 else None
+    limits = humanize_limits(humanize_amount)
+    pending: list[tuple[float, int, VoicedChord]] = []
+    sequence = 0
+
+    hits = chord_hits(profile, beats_per_chord)
     current_beat = 0.0
-    previous_voice: list[int] | None = None
 
-    for idx, chord in enumerate(chords):
-        role = cadence_roles[idx]
-        pitch_classes = build_pitch_class_palette(chord, profile, complexity, mode_track[idx], role, rng)
-        voice = build_voice(chord, pitch_classes, previous_voice, profile, complexity, role, rng)
-        previous_voice = voice
-        left_hand, right_hand = split_voice_hands(chord, voice, complexity)
-
-        for offset, duration, velocity_scale in profile.hit_pattern:
-            if offset >= beats_per_chord:
-                continue
-            clipped_duration = min(duration, beats_per_chord - offset)
-            velocity = int(profile.base_velocity * velocity_scale)
-            events.append(
-                VoicedChord(
-                    chord=chord,
-                    style=style,
-                    start_beat=current_beat + offset,
-                    duration=max(0.1, clipped_duration),
-                    notes=voice,
-                    left_hand=left_hand,
-                    right_hand=right_hand,
-                    velocity=max(45, min(118, velocity)),
+    for voicing in iter_voicings(chords, profile, complexity, rng, voice_leading):
+        for offset, duration, velocity in hits:
+            start_beat = current_beat + offset
+            if humanize_rng is not None:
+                start_beat, duration, velocity = humanize_hit(
+                    start_beat, duration, velocity, total_beats, limits, humanize_rng
                 )
+            event = VoicedChord(
+                chord=voicing.chord,
+                style=style,
+                start_beat=start_beat,
+                duration=duration,
+                notes=voicing.notes,
+                left_hand=voicing.left_hand,
+                right_hand=voicing.right_hand,
+                velocity=velocity,
             )
+            if humanize_rng is None:
+                yield event
+            else:
+                heapq.heappush(pending, (start_beat, sequence, event))
+                sequence += 1
 
         current_beat += beats_per_chord
+        earliest_next = current_beat - limits[0]
+        while pending and pending[0][0] <= earliest_next:
+            yield heapq.heappop(pending)[2]
 
-    if humanize and humanize_amount > 0:
-        humanize_seed = (seed if seed is not None else rng.randint(1, 1_000_000_000)) + 7919
-        events = apply_humanize(
-            events=events,
-            total_beats=current_beat,
-            amount=humanize_amount,
-            rng=random.Random(humanize_seed),
+    while pending:
+        yield heapq.heappop(pending)[2]
+
+
+def chord_hits(profile: StyleProfile, beats_per_chord: float) -> list[tuple[float, float, int]]:
+    hits = []
+    for offset, duration, velocity_scale in profile.hit_pattern:
+        if offset >= beats_per_chord:
+            continue
+        clipped_duration = min(duration, beats_per_chord - offset)
+        velocity = int(profile.base_velocity * velocity_scale)
+        hits.append((offset, max(0.1, clipped_duration), max(45, min(118, velocity))))
+    return hits
+
+
+def iter_voicings(
+    chords: Sequence[ChordSymbol],
+    profile: StyleProfile,
+    complexity: float,
+    rng: random.Random,
+    voice_leading: str | None = None,
+) -> Iterator[Voicing]:
+    voice_leading = voice_leading or profile.voice_leading
+    if voice_leading not in VOICE_LEADING_MODES:
+        raise ValueError(f"Unbekannter Voice-Leading-Modus: {voice_leading}")
+
+    mode_rng = random.Random()
+    mode_rng.setstate(rng.getstate())
+    for _ in chords:
+        rng.choice(profile.modal_colors)
+
+    if voice_leading == "optimal":
+        yield from optimal_voicings(chords, profile, complexity, rng, mode_rng)
+        return
+
+    previous_voice: list[int] | None = None
+    roles = iter_cadence_roles(chords)
+    stage_times = [0.0, 0.0, 0.0, 0.0]
+    try:
+        for chord in chords:
+            started = perf_counter()
+            role = next(roles)
+            cadences_done = perf_counter()
+            mode_color = mode_rng.choice(profile.modal_colors)
+            pitch_classes = build_pitch_class_palette(chord, profile, complexity, mode_color, role, rng)
+            palette_done = perf_counter()
+            voice = build_voice(chord, pitch_classes, previous_voice, profile, complexity, role, rng)
+            previous_voice = voice
+            voice_done = perf_counter()
+            left_hand, right_hand = split_voice_hands(chord, voice, complexity)
+            hands_done = perf_counter()
+            stage_times[0] += cadences_done - started
+            stage_times[1] += palette_done - cadences_done
+            stage_times[2] += voice_done - palette_done
+            stage_times[3] += hands_done - voice_done
+            yield Voicing(chord, voice, left_hand, right_hand)
+    finally:
+        record_voicing_stages(stage_times)
+
+
+def record_voicing_stages(stage_times: list[float]) -> None:
+    for stage, seconds in zip(("cadences", "palette", "voice", "hands"), stage_times):
+        record_stage(stage, seconds)
+
+
+def optimal_voicings(
+    chords: Sequence[ChordSymbol],
+    profile: StyleProfile,
+    complexity: float,
+    rng: random.Random,
+    mode_rng: random.Random,
+) -> Iterator[Voicing]:
+    from .optimizer import candidate_matrix, optimize_voice_leading
+
+    note_count = voice_note_count(profile, complexity)
+    planned: list[tuple[ChordSymbol, str]] = []
+    candidates = []
+    stage_times = [0.0, 0.0, 0.0, 0.0]
+
+    started = perf_counter()
+    roles = analyze_cadences(chords)
+    stage_times[0] = perf_counter() - started
+
+    started = perf_counter()
+    for chord, role in zip(chords, roles):
+        mode_color = mode_rng.choice(profile.modal_colors)
+        pitch_classes = build_pitch_class_palette(chord, profile, complexity, mode_color, role, rng)
+        chosen = choose_pitch_classes(chord, pitch_classes, note_count, role, complexity, rng)
+        planned.append((chord, role))
+        candidates.append(
+            candidate_matrix(
+                chosen,
+                profile.register_low,
+                profile.register_high,
+                note_count,
+                fallback=lambda chosen=chosen: spread_voice(chosen, None, profile),
+            )
         )
+    stage_times[1] = perf_counter() - started
+
+    started = perf_counter()
+    voices = optimize_voice_leading(candidates, home_voice(profile, note_count), beam_width=profile.beam_width)
+    stage_times[2] = perf_counter() - started
 
-    return Arrangement(style=style, events=events, total_beats=current_beat)
+    try:
+        for (chord, role), notes in zip(planned, voices):
+            started = perf_counter()
+            voice = finish_voice(notes.tolist(), profile, complexity, role)
+            voice_done = perf_counter()
+            left_hand, right_hand = split_voice_hands(chord, voice, complexity)
+            stage_times[2] += voice_done - started
+            stage_times[3] += perf_counter() - voice_done
+            yield Voicing(chord, voice, left_hand, right_hand)
+    finally:
+        record_voicing_stages(stage_times)
 
 
 def analyze_cadences(chords: list[ChordSymbol]) -> list[str]:
-    roles = ["neutral" for _ in chords]
+    return list(iter_cadence_roles(chords))
+
+
+def iter_cadence_roles(chords: Iterable[ChordSymbol]) -> Iterator[str]:
+    window: deque[list] = deque()
+    tonic_pending = False
+
+    def settle() -> str:
+        nonlocal tonic_pending
+        chord, role = window.popleft()
+        resolved_to_tonic = tonic_pending
+        tonic_pending = False
+        if role != "neutral":
+            return role
+        if resolved_to_tonic:
+            return "I"
+        if window and is_dominant_quality(chord.quality) and (window[0][0].root_pc - chord.root_pc) % 12 == 5:
+            tonic_pending = True
+            return "V"
+        return role
+
+    for chord in chords:
+        window.append([chord, "neutral"])
+        if len(window) < 3:
+            continue
 
-    for i in range(len(chords) - 2):
-        c1, c2, c3 = chords[i], chords[i + 1], chords[i + 2]
+        c1, c2, c3 = window[0][0], window[1][0], window[2][0]
         ii_to_v = (c2.root_pc - c1.root_pc) % 12 == 5
         v_to_i = (c3.root_pc - c2.root_pc) % 12 == 5
-
         if ii_to_v and v_to_i and is_minor_quality(c1.quality) and is_dominant_quality(c2.quality):
-            roles[i] = "ii"
-            roles[i + 1] = "V"
-            roles[i + 2] = "I"
+            window[0][1] = "ii"
+            window[1][1] = "V"
+            window[2][1] = "I"
 
-    for i in range(len(chords) - 1):
-        if roles[i] != "neutral":
-            continue
-        c1, c2 = chords[i], chords[i + 1]
-        if is_dominant_quality(c1.quality) and (c2.root_pc - c1.root_pc) % 12 == 5:
-            roles[i] = "V"
-            if roles[i + 1] == "neutral":
-                roles[i + 1] = "I"
+        yield settle()
 
-    return roles
+    while window:
+        yield settle()
 
 
 def build_pitch_class_palette(
@@ -221,6 +551,25 @@ def build_pitch_class_palette(
     role: str,
     rng: random.Random,
 ) -> list[int]:
+    pcs = base_pitch_class_palette(chord, profile, complexity, mode_color, role)
+    if can_alter(chord, complexity) and rng.random() < 0.6:
+        altered = rng.choice(ALTERED_TENSIONS)
+        pcs.add((chord.root_pc + degree_to_semitone(altered)) % 12)
+
+    return sorted(pcs)
+
+
+def can_alter(chord: ChordSymbol, complexity: float) -> bool:
+    return complexity > 0.65 and quality_bucket(chord.quality) == "dominant"
+
+
+def base_pitch_class_palette(
+    chord: ChordSymbol,
+    profile: StyleProfile,
+    complexity: float,
+    mode_color: str,
+    role: str,
+) -> set[int]:
     root = chord.root_pc
     pcs = {(root + interval) % 12 for interval in chord_tone_intervals(chord.quality)}
     bucket = quality_bucket(chord.quality)
@@ -253,12 +602,7 @@ def build_pitch_class_palette(
             pcs.add((root + degree_to_semitone(tension)) % 12)
         except ValueError:
             continue
-
-    if complexity > 0.65 and bucket == "dominant" and rng.random() < 0.6:
-        altered = rng.choice(["b9", "#9", "#11", "b13"])
-        pcs.add((root + degree_to_semitone(altered)) % 12)
-
-    return sorted(pcs)
+    return pcs
 
 
 def build_voice(
@@ -270,12 +614,47 @@ def build_voice(
     role: str,
     rng: random.Random,
 ) -> list[int]:
+    note_count = voice_note_count(profile, complexity)
+    chosen = choose_pitch_classes(chord, pitch_classes, note_count, role, complexity, rng)
+    return place_voice(chosen, previous_voice, profile, complexity, role)
+
+
+def place_voice(
+    chosen: list[int],
+    previous_voice: list[int] | None,
+    profile: StyleProfile,
+    complexity: float,
+    role: str,
+) -> list[int]:
+    note_count = len(chosen)
+    anchor = previous_voice if previous_voice else home_voice(profile, note_count)
+    catalog = voicing_catalog(profile.register_low, profile.register_high, note_count)
+    notes = catalog.nearest(chosen, anchor)
+    if notes is None:
+        notes = spread_voice(chosen, previous_voice, profile)
+
+    return finish_voice(notes, profile, complexity, role)
+
+
+def voice_note_count(profile: StyleProfile, complexity: float) -> int:
     note_count = int(round(profile.note_count_min + (profile.note_count_max - profile.note_count_min) * complexity))
-    note_count = max(profile.note_count_min, min(profile.note_count_max, note_count))
+    return max(profile.note_count_min, min(profile.note_count_max, note_count))
+
 
+def choose_pitch_classes(
+    chord: ChordSymbol,
+    pitch_classes: list[int],
+    note_count: int,
+    role: str,
+    complexity: float,
+    rng: random.Random,
+) -> list[int]:
     required = required_pitch_classes(chord)
     preferred = prioritize_pitch_classes(chord, pitch_classes, role, complexity, rng)
+    return merge_pitch_classes(required, preferred, note_count)
 
+
+def merge_pitch_classes(required: list[int], preferred: list[int], note_count: int) -> list[int]:
     chosen: list[int] = []
     for pc in required + preferred:
         if pc in chosen:
@@ -286,7 +665,24 @@ def build_voice(
 
     while len(chosen) < note_count:
         chosen.append(chosen[-1])
+    return chosen
+
+
+def finish_voice(notes: list[int], profile: StyleProfile, complexity: float, role: str) -> list[int]:
+    if role == "V" and complexity > 0.5:
+        notes[-1] = min(profile.register_high, notes[-1] + 1)
+    if role == "I" and complexity > 0.5:
+        notes[-1] = max(profile.register_low, notes[-1] - 1)
+
+    return sorted(set(notes)) if complexity < 0.2 else notes
 
+
+def home_voice(profile: StyleProfile, note_count: int) -> list[int]:
+    base = profile.register_low + 6
+    return [base + (i * 5) for i in range(note_count)]
+
+
+def spread_voice(chosen: list[int], previous_voice: list[int] | None, profile: StyleProfile) -> list[int]:
     if previous_voice:
         notes = [
             nearest_note_for_pc(
@@ -298,8 +694,10 @@ def build_voice(
             for i, pc in enumerate(chosen)
         ]
     else:
-        base = profile.register_low + 6
-        notes = [fit_note_to_range(base + (i * 5), profile.register_low, profile.register_high, pc) for i, pc in enumerate(chosen)]
+        notes = [
+            fit_note_to_range(note, profile.register_low, profile.register_high, pc)
+            for note, pc in zip(home_voice(profile, len(chosen)), chosen)
+        ]
 
     notes.sort()
 
@@ -311,12 +709,7 @@ def build_voice(
         notes[i] = min(notes[i], profile.register_high)
         notes[i] = max(notes[i], profile.register_low)
 
-    if role == "V" and complexity > 0.5:
-        notes[-1] = min(profile.register_high, notes[-1] + 1)
-    if role == "I" and complexity > 0.5:
-        notes[-1] = max(profile.register_low, notes[-1] - 1)
-
-    return sorted(set(notes)) if complexity < 0.2 else notes
+    return notes
 
 
 def required_pitch_classes(chord: ChordSymbol) -> list[int]:
@@ -338,20 +731,7 @@ def prioritize_pitch_classes(
     complexity: float,
     rng: random.Random,
 ) -> list[int]:
-    root = chord.root_pc
-
-    def ranking(pc: int) -> tuple[int, int]:
-        distance = (pc - root) % 12
-        role_weight = {
-            "ii": {2: 0, 5: 1, 9: 2},
-            "V": {10: 0, 1: 1, 6: 2, 8: 3},
-            "I": {4: 0, 11: 1, 2: 2, 9: 3},
-            "neutral": {4: 0, 7: 1, 2: 2},
-        }
-        priority = role_weight.get(role, role_weight["neutral"]).get(distance, 10)
-        return priority, distance
-
-    ordered = sorted(pitch_classes, key=ranking)
+    ordered = rank_pitch_classes(chord, pitch_classes, role)
     if complexity > 0.75:
         tail = ordered[2:]
         rng.shuffle(tail)
@@ -359,6 +739,17 @@ def prioritize_pitch_classes(
     return ordered
 
 
+def rank_pitch_classes(chord: ChordSymbol, pitch_classes: Iterable[int], role: str) -> list[int]:
+    root = chord.root_pc
+    weights = ROLE_WEIGHTS.get(role, ROLE_WEIGHTS["neutral"])
+
+    def ranking(pc: int) -> tuple[int, int]:
+        distance = (pc - root) % 12
+        return weights.get(distance, 10), distance
+
+    return sorted(pitch_classes, key=ranking)
+
+
 def nearest_note_for_pc(pc: int, anchor: int, low: int, high: int) -> int:
     candidates = []
     for octave in range(-3, 4):
@@ -439,42 +830,47 @@ def split_voice_hands(chord: ChordSymbol, voice: list[int], complexity: float) -
     return sorted(set(adjusted_left)), right
 
 
-def apply_humanize(
-    events: list[VoicedChord],
-    total_beats: float,
-    amount: float,
-    rng: random.Random,
-) -> list[VoicedChord]:
+def apply_humanize(arrangement: Arrangement, amount: float, rng: random.Random) -> None:
+    limits = humanize_limits(amount)
+    total_beats = arrangement.total_beats
+    starts = arrangement.starts
+    durations = arrangement.durations
+    velocities = arrangement.velocities
+
+    for i in range(len(arrangement)):
+        starts[i], durations[i], velocities[i] = humanize_hit(
+            starts[i], durations[i], velocities[i], total_beats, limits, rng
+        )
+
+    arrangement.sort_by_start()
+
+
+def humanize_limits(amount: float) -> tuple[float, float, int]:
     max_timing_shift = 0.01 + (0.05 * amount)
     max_duration_shift = max_timing_shift * 0.7
     max_velocity_shift = int(round(2 + (12 * amount)))
+    return max_timing_shift, max_duration_shift, max_velocity_shift
 
-    humanized: list[VoicedChord] = []
-    for event in events:
-        start_shift = rng.uniform(-max_timing_shift, max_timing_shift)
-        duration_shift = rng.uniform(-max_duration_shift, max_duration_shift)
-        velocity_shift = rng.randint(-max_velocity_shift, max_velocity_shift)
-
-        new_start = event.start_beat + start_shift
-        new_start = max(0.0, min(max(0.0, total_beats - 0.1), new_start))
-
-        new_duration = max(0.12, event.duration + duration_shift)
-        max_duration = max(0.12, total_beats - new_start)
-        new_duration = min(max_duration, new_duration)
-
-        new_velocity = max(38, min(120, event.velocity + velocity_shift))
-
-        humanized.append(
-            VoicedChord(
-                chord=event.chord,
-                style=event.style,
-                start_beat=new_start,
-                duration=new_duration,
-                notes=event.notes,
-                left_hand=event.left_hand,
-                right_hand=event.right_hand,
-                velocity=new_velocity,
-            )
-        )
 
-    return sorted(humanized, key=lambda event: event.start_beat)
+def humanize_hit(
+    start_beat: float,
+    duration: float,
+    velocity: int,
+    total_beats: float,
+    limits: tuple[float, float, int],
+    rng: random.Random,
+) -> tuple[float, float, int]:
+    max_timing_shift, max_duration_shift, max_velocity_shift = limits
+    start_shift = rng.uniform(-max_timing_shift, max_timing_shift)
+    duration_shift = rng.uniform(-max_duration_shift, max_duration_shift)
+    velocity_shift = rng.randint(-max_velocity_shift, max_velocity_shift)
+
+    new_start = start_beat + start_shift
+    new_start = max(0.0, min(max(0.0, total_beats - 0.1), new_start))
+
+    new_duration = max(0.12, duration + duration_shift)
+    max_duration = max(0.12, total_beats - new_start)
+    new_duration = min(max_duration, new_duration)
+
+    new_velocity = max(38, min(120, velocity + velocity_shift))
+    return new_start, new_duration, new_velocity
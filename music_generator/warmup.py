@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+from importlib import import_module
+from time import perf_counter
+
+SERVER_MODULES = (
+    "theory",
+    "catalog",
+    "voicings",
+    "midi_export",
+    "archive",
+    "cache",
+    "batch",
+    "jobs",
+    "preview",
+    "metrics",
+    "incremental",
+    "admission",
+)
+NUMPY_MODULES = ("optimizer", "humanize", "dataset", "audio")
+
+
+def warm_up(catalogs: bool = True, numpy: bool = False) -> dict:
+    started = perf_counter()
+    modules = SERVER_MODULES + (NUMPY_MODULES if numpy else ())
+    for module in modules:
+        import_module(f".{module}", __package__)
+
+    from .catalog import voicing_catalog
+    from .theory import BUILTIN_PROGRESSIONS, parse_progressions
+    from .voicings import STYLES
+
+    parse_progressions(BUILTIN_PROGRESSIONS)
+    built = set()
+    if catalogs:
+        for profile in STYLES.values():
+            for note_count in range(profile.note_count_min, profile.note_count_max + 1):
+                key = (profile.register_low, profile.register_high, note_count)
+                if key not in built:
+                    voicing_catalog(*key)
+                    built.add(key)
+
+    return {"modules": len(modules), "catalogs": len(built), "seconds": perf_counter() - started}
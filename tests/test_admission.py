@@ -0,0 +1,76 @@
+import time
+import unittest
+
+from music_generator.admission import AdmissionController, Rejected, estimate_cost
+from music_generator.batch import plan_variations
+from music_generator.theory import parse_progression
+
+
+def jobs_for(style: str, variations: int, progression: str = "Dm7 G7 Cmaj7 A7", beats_per_chord: float = 4.0):
+    settings = {
+        "chords": parse_progression(progression),
+        "requested_style": style,
+        "complexity": 0.65,
+        "beats_per_chord": beats_per_chord,
+        "tempo": 100,
+        "humanize": True,
+        "humanize_amount": 0.3,
+        "variations": variations,
+    }
+    return plan_variations(settings, 1)
+
+
+class CostEstimateTests(unittest.TestCase):
+    def test_cost_scales_with_chords_hits_and_variations(self):
+        pop, soul = estimate_cost(jobs_for("pop", 1), "midi"), estimate_cost(jobs_for("soul", 1), "midi")
+        self.assertEqual(pop, 4 * 1 * 2.0)
+        self.assertEqual(soul, 4 * 3 * 2.0)
+        self.assertEqual(estimate_cost(jobs_for("soul", 12), "midi"), 12 * soul)
+        self.assertEqual(estimate_cost(jobs_for("soul", 1, beats_per_chord=2.0), "midi"), 4 * 1 * 2.0)
+        self.assertGreater(estimate_cost(jobs_for("soul", 1), "midi", "deflated"), soul)
+        self.assertGreater(estimate_cost(jobs_for("soul", 1), "audio"), 50 * soul)
+        with self.assertRaises(ValueError):
+            estimate_cost(jobs_for("soul", 1), "flac")
+
+
+class AdmissionControllerTests(unittest.TestCase):
+    def test_budgets_are_separate_and_reject_when_full(self):
+        controller = AdmissionController({"preview": 10.0, "bulk": 100.0})
+        first = controller.admit("preview", 6.0)
+        controller.admit("bulk", 100.0)
+        with self.assertRaises(Rejected) as rejected:
+            controller.admit("preview", 6.0)
+        self.assertEqual((rejected.exception.status, rejected.exception.budget), (429, "preview"))
+        self.assertGreaterEqual(rejected.exception.retry_after, 1)
+        with self.assertRaises(Rejected) as rejected:
+            controller.admit("bulk", 1.0)
+        self.assertEqual(rejected.exception.status, 503)
+
+        controller.release(first)
+        controller.admit("preview", 6.0)
+        self.assertEqual(controller.stats()["budgets"]["preview"]["rejected"], 1)
+
+    def test_oversized_request_only_runs_when_idle(self):
+        controller = AdmissionController({"preview": 10.0, "bulk": 0.0})
+        big = controller.admit("preview", 500.0)
+        with self.assertRaises(Rejected):
+            controller.admit("preview", 1.0)
+        controller.release(big)
+        self.assertEqual(controller.in_use["preview"], 0.0)
+        for _ in range(3):
+            controller.admit("bulk", 1e9)
+
+    def test_retry_after_and_calibration_follow_measured_time(self):
+        controller = AdmissionController({"bulk": 1000.0}, seconds_per_unit=0.01)
+        ticket = controller.admit("bulk", 1000.0)
+        with self.assertRaises(Rejected) as rejected:
+            controller.admit("bulk", 1.0)
+        self.assertEqual(rejected.exception.retry_after, 10)
+
+        time.sleep(0.01)
+        controller.release(ticket)
+        self.assertLess(controller.seconds_per_unit, 0.01)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,21 @@
+import io
+import json
+import os
+from pathlib import Path
+import runpy
+import sys
+import tempfile
+import time
 import unittest
+from unittest import mock
+import wave
+import zipfile
 
+import app as app_module
 from app import app
+from music_generator.batch import pool_context
+from music_generator.corpus import CorpusReader
+from music_generator.preview import PREVIEW_MEDIA_TYPE, decode_preview
 
 
 class AppPreviewTests(unittest.TestCase):
@@ -30,6 +45,448 @@ class AppPreviewTests(unittest.TestCase):
         self.assertIn("left_hand", payload["events"][0])
         self.assertIn("right_hand", payload["events"][0])
 
+    def test_preview_binary_format_matches_json(self):
+        payload = {"progression": "Dm7 G7 Cmaj7 A7", "style": "soul", "seed": "77", "humanize": "on"}
+        expected = self.client.post("/preview", data=payload).get_json()
+
+        by_query = self.client.post("/preview?format=binary", data=payload)
+        by_header = self.client.post("/preview", data=payload, headers={"Accept": PREVIEW_MEDIA_TYPE})
+        for response in (by_query, by_header):
+            self.assertEqual(response.mimetype, PREVIEW_MEDIA_TYPE)
+            self.assertEqual(decode_preview(response.data), expected)
+
+    def test_out_of_range_seed_is_rejected(self):
+        payload = {"progression": "Dm7 G7 Cmaj7", "style": "jazz", "seed": str(2**70)}
+        for url in ("/preview", "/preview?format=binary"):
+            with self.subTest(url=url):
+                response = self.client.post(url, data=payload)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("Seed", response.get_json()["error"])
+        last = dict(payload, seed=str(2**63 - 1))
+        self.assertEqual(self.client.post("/preview?format=binary", data=last).status_code, 200)
+        overflow = {"jobs": [dict(payload, seed=2**63 - 1, variations=2)]}
+        self.assertEqual(self.client.post("/api/batch", json=overflow).status_code, 400)
+
+    def test_preview_wildcard_accept_keeps_json(self):
+        payload = {"progression": "Dm7 G7 Cmaj7", "style": "jazz", "seed": "7"}
+        browser = "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8"
+        for accept in ("*/*", browser, "application/json, */*;q=0.5"):
+            with self.subTest(accept=accept):
+                response = self.client.post("/preview", data=payload, headers={"Accept": accept})
+                self.assertEqual(response.mimetype, "application/json")
+        preferred = f"{PREVIEW_MEDIA_TYPE}, application/json;q=0.5"
+        response = self.client.post("/preview", data=payload, headers={"Accept": preferred})
+        self.assertEqual(response.mimetype, PREVIEW_MEDIA_TYPE)
+
+    def test_stateful_preview_returns_only_changed_events(self):
+        payload = {"progression": "Dm7 G7 Cmaj7 A7 Dm7 G7 Cmaj7 Cmaj7", "style": "jazz", "seed": "5", "state": ""}
+        first = self.client.post("/preview", data=payload)
+        token = first.headers["X-Preview-State"]
+        full = first.get_json()
+        self.assertNotIn("base", full)
+
+        edited = dict(payload, progression="Dm7 G7 Cmaj7 A7 Dm7 G7 Cmaj7 Fmaj7", state=token)
+        patch = self.client.post("/preview", data=edited).get_json()
+        self.assertEqual(patch["base"], token)
+
+        expected = self.client.post("/preview", data=dict(edited, state="")).get_json()["events"]
+        events = full["events"]
+        differing = [index for index, event in enumerate(events) if event != expected[index]]
+        self.assertEqual([event["index"] for event in patch["events"]], differing)
+        self.assertLess(len(differing), len(events) // 2)
+        for event in patch["events"]:
+            events[event.pop("index")] = event
+        self.assertEqual(events, expected)
+
+        reseeded = self.client.post("/preview", data=dict(edited, seed="6"))
+        self.assertNotIn("base", reseeded.get_json())
+
+    def test_json_patch_applies_to_binary_stateful_preview(self):
+        payload = {"progression": "Dm7 G7 Cmaj7 A7 Em7 A7 Dm7 G7", "style": "soul", "seed": "9", "state": ""}
+        first = self.client.post("/preview", data=payload, headers={"Accept": PREVIEW_MEDIA_TYPE})
+        self.assertEqual(first.mimetype, PREVIEW_MEDIA_TYPE)
+        events = decode_preview(first.data)["events"]
+
+        edited = dict(payload, progression="Dm7 G7 Cmaj7 A7 Em7 A7 Dm7 Db7", state=first.headers["X-Preview-State"])
+        patch = self.client.post("/preview", data=edited, headers={"Accept": PREVIEW_MEDIA_TYPE})
+        self.assertEqual(patch.mimetype, "application/json")
+        for event in patch.get_json()["events"]:
+            events[event.pop("index")] = event
+
+        expected = self.client.post("/preview", data=dict(edited, state=""), headers={"Accept": PREVIEW_MEDIA_TYPE})
+        self.assertEqual(events, decode_preview(expected.data)["events"])
+
+    def test_preview_then_download_reuses_cached_arrangement(self):
+        payload = {
+            "progression": "Em7 A7 Dmaj7 Bm7",
+            "style": "random",
+            "tempo": "90",
+            "complexity": "55",
+            "variations": "1",
+            "seed": "987654",
+        }
+        before = self.client.get("/cache/stats").get_json()["arrangements"]
+        self.assertEqual(self.client.post("/preview", data=payload).status_code, 200)
+        self.assertEqual(self.client.post("/generate", data=payload).status_code, 200)
+        after = self.client.get("/cache/stats").get_json()["arrangements"]
+
+        self.assertEqual(after["misses"] - before["misses"], 1)
+        self.assertEqual(after["hits"] - before["hits"], 1)
+
+    def test_audio_streams_wav_and_caches_it(self):
+        query = {"progression": "Dm7 G7 Cmaj7", "style": "pop", "tempo": "120", "seed": "31", "sample_rate": "22050"}
+        before = self.client.get("/cache/stats").get_json()["audio"]
+        first = self.client.get("/audio", query_string=query)
+        self.assertEqual(first.mimetype, "audio/wav")
+        self.assertEqual(int(first.headers["Content-Length"]), len(first.data))
+        with wave.open(io.BytesIO(first.data)) as reader:
+            self.assertEqual(reader.getframerate(), 22050)
+            self.assertGreater(reader.getnframes() / 22050, 6.0)
+
+        second = self.client.post("/audio", data=query)
+        self.assertEqual(second.data, first.data)
+        after = self.client.get("/cache/stats").get_json()["audio"]
+        self.assertEqual((after["misses"] - before["misses"], after["hits"] - before["hits"]), (1, 1))
+
+        rejected = self.client.get("/audio", query_string=dict(query, sample_rate="12345"))
+        self.assertEqual(rejected.status_code, 400)
+
+
+class AppFactoryTests(unittest.TestCase):
+    def test_apps_have_separate_config_and_caches(self):
+        first = app_module.create_app({"SECRET_KEY": "test", "RENDER_CACHE_ENTRIES": 0})
+        second = app_module.create_app()
+        self.assertEqual(first.secret_key, "test")
+        self.assertNotEqual(second.secret_key, first.secret_key)
+        self.assertIsNot(first.extensions[app_module.EXTENSION], second.extensions[app_module.EXTENSION])
+
+        payload = {"progression": "Dm7 G7 Cmaj7", "style": "jazz", "seed": "3"}
+        for client in (first.test_client(), second.test_client()):
+            self.assertEqual(client.post("/preview", data=payload).status_code, 200)
+        self.assertEqual(first.test_client().get("/cache/stats").get_json()["arrangements"]["entries"], 0)
+        self.assertEqual(second.test_client().get("/cache/stats").get_json()["arrangements"]["entries"], 1)
+
+    def test_warm_up_renders_every_style(self):
+        report = app_module.warm_up_app(app_module.create_app())
+        self.assertGreater(report["catalogs"], 0)
+        self.assertIn("music_generator.jobs", sys.modules)
+
+    def test_gunicorn_config_preloads_warm_app(self):
+        path = Path(app_module.__file__).with_name("gunicorn.conf.py")
+        with mock.patch.dict("os.environ", {"WEB_CONCURRENCY": "3", "GUNICORN_THREADS": "4"}, clear=True):
+            config = runpy.run_path(str(path))
+            self.assertEqual(os.environ["WARM_UP"], "1")
+        self.assertEqual((config["workers"], config["threads"], config["worker_class"]), (3, 4, "gthread"))
+        self.assertTrue(config["preload_app"])
+        self.assertEqual(config["wsgi_app"], "app:app")
+
+        self.assertEqual(config["worker_count"]({}, cpus=1), 2)
+        self.assertEqual(config["worker_count"]({}, cpus=8), 8)
+        self.assertEqual(config["thread_count"]({"GUNICORN_THREADS": "1"}), 1)
+
+
+class AppGenerateTests(unittest.TestCase):
+    payload = {
+        "progression": "Dm7 G7 Cmaj7 A7",
+        "style": "random",
+        "tempo": "100",
+        "complexity": "70",
+        "beats_per_chord": "4",
+        "variations": "5",
+        "humanize": "on",
+        "humanize_amount": "30",
+        "seed": "4321",
+    }
+
+    def setUp(self):
+        self.client = app.test_client()
+        self.pool_config = (app.config["VARIATION_POOL_SIZE"], app.config["VARIATION_POOL_MIN_JOBS"])
+
+    def tearDown(self):
+        app.config["VARIATION_POOL_SIZE"], app.config["VARIATION_POOL_MIN_JOBS"] = self.pool_config
+
+    def generate_archive(self):
+        response = self.client.post("/generate", data=self.payload)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, "application/zip")
+        with zipfile.ZipFile(io.BytesIO(response.data)) as archive:
+            return [(name, archive.read(name)) for name in archive.namelist()]
+
+    def test_generate_batch_keeps_entry_order(self):
+        app.config["VARIATION_POOL_SIZE"] = 0
+        entries = self.generate_archive()
+        self.assertEqual(len(entries), 5)
+        self.assertEqual([name[-6:] for name, _ in entries], [f"{i:02d}.mid" for i in range(1, 6)])
+
+    def test_generate_corpus_container_indexes_every_variation(self):
+        app.config["VARIATION_POOL_SIZE"] = 0
+        entries = dict(self.generate_archive())
+        response = self.client.post("/generate", data=dict(self.payload, container="corpus", compression="stored"))
+        self.assertEqual(response.status_code, 200)
+
+        with tempfile.TemporaryDirectory() as directory, zipfile.ZipFile(io.BytesIO(response.data)) as archive:
+            archive.extractall(directory)
+            names = sorted(archive.namelist())
+            self.assertEqual([Path(name).suffix for name in names], [".dat", ".idx"])
+            with CorpusReader(Path(directory) / Path(names[0]).stem) as reader:
+                payloads = [bytes(view) for view in reader]
+                styles = [reader.entry(index).style for index in range(len(reader))]
+        self.assertEqual(payloads, list(entries.values()))
+        self.assertEqual(styles, [name.split("_")[1] for name in entries])
+
+    def test_generate_streams_stored_archive_beyond_old_limit(self):
+        payload = dict(self.payload, variations="40", compression="stored", style="pop")
+        response = self.client.post("/generate", data=payload)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_streamed)
+        with zipfile.ZipFile(io.BytesIO(response.data)) as archive:
+            infos = archive.infolist()
+        self.assertEqual(len(infos), 40)
+        self.assertTrue(all(info.compress_type == zipfile.ZIP_STORED for info in infos))
+
+    def test_generate_rejects_unknown_compression(self):
+        response = self.client.post("/generate", data=dict(self.payload, compression="bzip9"))
+        self.assertEqual(response.status_code, 302)
+
+    def test_process_pool_matches_in_process_output(self):
+        app.config["VARIATION_POOL_SIZE"] = 0
+        serial = self.generate_archive()
+        app.config["VARIATION_POOL_SIZE"] = 2
+        app.config["VARIATION_POOL_MIN_JOBS"] = 2
+        pooled = self.generate_archive()
+        self.assertEqual(pooled, serial)
+        self.assertNotEqual(pool_context().get_start_method(), "fork")
+
+
+class AppBatchApiTests(unittest.TestCase):
+    jobs = [
+        {"progression": "Dm7 G7 Cmaj7", "style": "jazz", "tempo": 96, "complexity": 70, "seed": 11},
+        {"progression": "Dm7 G7 Cmaj7", "style": "soul", "seed": 12, "humanize": True, "humanize_amount": 40},
+        {"progression": "Am7 D7 Gmaj7", "style": "random", "seed": 0, "variations": 2},
+    ]
+
+    def setUp(self):
+        self.client = app.test_client()
+
+    def test_json_results_match_preview(self):
+        response = self.client.post("/api/batch", json={"jobs": self.jobs, "format": "json"})
+        self.assertEqual(response.status_code, 200)
+        results = response.get_json()["results"]
+        self.assertEqual([result["job"] for result in results], [1, 2, 3, 3])
+        self.assertEqual([result["seed"] for result in results], [11, 12, 0, 1])
+
+        form = {key: "on" if value is True else str(value) for key, value in self.jobs[1].items()}
+        preview = self.client.post("/preview", data=form).get_json()
+        self.assertEqual(dict(results[1], job=None), dict(preview, job=None))
+
+    def test_zip_contains_every_job_in_order(self):
+        response = self.client.post("/api/batch", json={"jobs": self.jobs, "compression": "stored"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, "application/zip")
+        with zipfile.ZipFile(io.BytesIO(response.data)) as archive:
+            names = archive.namelist()
+        self.assertEqual(len(names), 4)
+        self.assertEqual([name.split("/")[0] for name in names], ["job_001", "job_002", "job_003", "job_003"])
+        self.assertTrue(names[0].endswith("voicings_jazz_01.mid"))
+
+    def test_validates_all_jobs_before_rendering(self):
+        jobs = self.jobs + [{"progression": "Dm7 Xyz7"}]
+        response = self.client.post("/api/batch", json={"jobs": jobs})
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(response.get_json()["error"].startswith("Job 4:"))
+
+        malformed = (
+            {"jobs": [{"progression": 5}]},
+            {"jobs": [dict(self.jobs[0], style=["jazz"])]},
+            {"jobs": [dict(self.jobs[0], seed=[1])]},
+            {"jobs": self.jobs, "compression": ["x"]},
+            {"jobs": self.jobs, "format": {"zip": 1}},
+        )
+        for payload in ({"jobs": []}, {"jobs": self.jobs, "format": "xml"}, [1, 2], *malformed):
+            with self.subTest(payload=payload):
+                self.assertEqual(self.client.post("/api/batch", json=payload).status_code, 400)
+
+
+class AppJobTests(unittest.TestCase):
+    payload = dict(AppGenerateTests.payload, variations="3", compression="stored")
+
+    def setUp(self):
+        self.client = app.test_client()
+        self.spool = tempfile.TemporaryDirectory()
+        self.state = app.extensions[app_module.EXTENSION]
+        self.previous = (app.config["JOB_SPOOL_DIR"], self.state.job_queue)
+        app.config["JOB_SPOOL_DIR"] = self.spool.name
+        self.state.job_queue = None
+
+    def tearDown(self):
+        if self.state.job_queue is not None:
+            self.state.job_queue.shutdown()
+        app.config["JOB_SPOOL_DIR"], self.state.job_queue = self.previous
+        self.spool.cleanup()
+
+    def test_submit_poll_and_download(self):
+        for container in ("midi", "corpus"):
+            with self.subTest(container=container):
+                self.assert_job_matches_generate(dict(self.payload, container=container))
+
+    def assert_job_matches_generate(self, payload):
+        response = self.client.post("/jobs", data=payload)
+        self.assertEqual(response.status_code, 202)
+        job = response.get_json()
+
+        deadline = time.monotonic() + 20
+        while True:
+            status = self.client.get(job["status_url"]).get_json()
+            if status["state"] == "done" or time.monotonic() > deadline:
+                break
+            time.sleep(0.01)
+        self.assertEqual(status["state"], "done")
+        self.assertEqual(status["done"], 3)
+
+        download = self.client.get(job["download_url"])
+        self.assertEqual(download.status_code, 200)
+        direct = self.client.post("/generate", data=payload)
+        with zipfile.ZipFile(io.BytesIO(download.data)) as queued, zipfile.ZipFile(io.BytesIO(direct.data)) as streamed:
+            self.assertEqual(
+                [queued.read(name) for name in queued.namelist()],
+                [streamed.read(name) for name in streamed.namelist()],
+            )
+
+    def test_unknown_job_is_404(self):
+        self.assertEqual(self.client.get("/jobs/" + "0" * 32).status_code, 404)
+        self.assertEqual(self.client.get("/jobs/unknown/download").status_code, 404)
+
+
+class AppMetricsTests(unittest.TestCase):
+    def setUp(self):
+        self.client = app.test_client()
+        self.threshold = app.config["SLOW_REQUEST_SECONDS"]
+
+    def tearDown(self):
+        app.config["SLOW_REQUEST_SECONDS"] = self.threshold
+
+    def test_metrics_expose_stages_and_request_counts(self):
+        payload = dict(AppGenerateTests.payload, style="soul", variations="3")
+        self.assertEqual(self.client.post("/generate", data=payload).status_code, 200)
+
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith("text/plain"))
+        text = response.get_data(as_text=True)
+        for stage in ("parse", "voice", "midi", "zip"):
+            self.assertIn(f'voicing_stage_seconds_count{{stage="{stage}"}}', text)
+        self.assertIn('voicing_request_seconds_count{endpoint="generate"}', text)
+        self.assertIn('voicing_requests_total{endpoint="generate",style="soul",variations="2-10"}', text)
+
+    def test_generate_records_every_generation_stage(self):
+        app.config["SLOW_REQUEST_SECONDS"] = 1e-9
+        payload = dict(AppGenerateTests.payload, style="jazz", variations="3", seed="424242")
+        with self.assertLogs("music_generator.slow_requests", level="WARNING") as logs:
+            self.assertEqual(self.client.post("/generate", data=payload).status_code, 200)
+        stages = json.loads(logs.output[0].split("Langsamer Request ", 1)[1])["stages"]
+        for stage in ("parse", "cadences", "palette", "voice", "hands", "humanize", "midi", "zip"):
+            self.assertIn(stage, stages)
+
+    def test_slow_requests_are_logged_with_stage_breakdown(self):
+        app.config["SLOW_REQUEST_SECONDS"] = 1e-9
+        with self.assertLogs("music_generator.slow_requests", level="WARNING") as logs:
+            self.client.post("/preview", data={"progression": "Dm7 G7 Cmaj7", "seed": "5"})
+        self.assertIn('"endpoint": "preview"', logs.output[0])
+        self.assertIn('"seed": 5', logs.output[0])
+        self.assertIn('"voice":', logs.output[0])
+
+
+class AppAdmissionTests(unittest.TestCase):
+    payload = {"progression": "Dm7 G7 Cmaj7 A7 Dm7 G7 Cmaj7", "style": "jazz", "seed": "8", "variations": "4"}
+
+    def setUp(self):
+        self.client = app.test_client()
+        self.admission = app.extensions[app_module.EXTENSION].admission
+        self.capacities = dict(self.admission.capacities)
+        self.admission.capacities.update(preview=100.0, bulk=1000.0)
+        self.held = []
+
+    def tearDown(self):
+        for ticket in self.held:
+            self.admission.release(ticket)
+        self.admission.capacities = self.capacities
+
+    def hold(self, budget: str, cost: float):
+        self.held.append(self.admission.admit(budget, cost))
+
+    def test_full_budget_rejects_fast_with_retry_after(self):
+        self.hold("preview", 90.0)
+        response = self.client.post("/preview", data=self.payload)
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response.headers["Retry-After"]), 1)
+        self.assertEqual(response.get_json()["budget"], "preview")
+
+        self.assertEqual(self.client.post("/generate", data=self.payload).status_code, 200)
+
+        self.hold("bulk", 990.0)
+        self.assertEqual(self.client.post("/generate", data=self.payload).status_code, 503)
+        self.assertEqual(self.client.post("/api/batch", json={"jobs": [self.payload]}).status_code, 503)
+
+        text = self.client.get("/metrics").get_data(as_text=True)
+        self.assertIn('voicing_admission_rejected_total{budget="preview"}', text)
+        self.assertIn('voicing_admission_rejected_total{budget="bulk"}', text)
+
+    def test_oversized_request_runs_alone_and_reports_cost(self):
+        payload = dict(self.payload, variations="40")
+        response = self.client.post("/generate", data=payload)
+        self.assertEqual(response.status_code, 200)
+        response.get_data()
+        response.close()
+
+        stats = self.client.get("/admission/stats").get_json()["budgets"]["bulk"]
+        self.assertEqual((stats["active"], stats["in_use"]), (0, 0.0))
+        text = self.client.get("/metrics").get_data(as_text=True)
+        self.assertIn('voicing_request_cost_units_count{endpoint="generate"}', text)
+        self.assertIn('voicing_request_cost_seconds_count{endpoint="generate",kind="actual"}', text)
+        self.assertIn('voicing_request_cost_seconds_count{endpoint="generate",kind="estimated"}', text)
+
+
+class AppProfilingTests(unittest.TestCase):
+    payload = {"progression": "Dm7 G7 Cmaj7 A7", "style": "jazz", "seed": "31", "variations": "2"}
+
+    def setUp(self):
+        self.client = app.test_client()
+        self.output = tempfile.TemporaryDirectory()
+        self.config = {key: app.config[key] for key in ("PROFILE_REQUESTS", "PROFILE_HEADER_ENABLED", "PROFILE_DIR")}
+        app.config["PROFILE_DIR"] = self.output.name
+
+    def tearDown(self):
+        app.config.update(self.config)
+        self.output.cleanup()
+
+    def test_disabled_by_default(self):
+        response = self.client.post("/generate", data=self.payload, headers={"X-Profile": "cpu"})
+        self.assertNotIn("X-Profile-Id", response.headers)
+        self.assertEqual(list(Path(self.output.name).iterdir()), [])
+
+    def test_header_profiles_single_request(self):
+        app.config["PROFILE_HEADER_ENABLED"] = True
+        response = self.client.post("/generate", data=self.payload, headers={"X-Profile": "cpu,memory"})
+        response.get_data()
+        stem = response.headers["X-Profile-Id"]
+
+        suffixes = sorted(path.suffix for path in Path(self.output.name).glob(f"{stem}.*"))
+        self.assertEqual(suffixes, [".json", ".prof", ".snapshot"])
+        record = json.loads((Path(self.output.name) / f"{stem}.json").read_text(encoding="utf-8"))
+        self.assertEqual(record["endpoint"], "generate")
+        self.assertEqual(record["settings"]["seed"], 31)
+        self.assertEqual(record["settings"]["variations"], 2)
+
+        bad = self.client.post("/preview", data=self.payload, headers={"X-Profile": "gpu"})
+        self.assertEqual(bad.status_code, 400)
+
+    def test_config_profiles_every_preview(self):
+        app.config["PROFILE_REQUESTS"] = "cpu"
+        response = self.client.post("/preview", data=dict(self.payload, seed=""))
+        record = json.loads((Path(self.output.name) / f"{response.headers['X-Profile-Id']}.json").read_text())
+        self.assertEqual(record["settings"]["seed"], response.get_json()["seed"])
+        self.assertEqual(record["settings"]["variations"], 1)
+
 
 if __name__ == "__main__":
     unittest.main()
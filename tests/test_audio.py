@@ -0,0 +1,68 @@
+import io
+import time
+import tracemalloc
+import unittest
+import wave
+
+import numpy as np
+
+from music_generator.audio import ATTACK, LEAD_IN, iter_pcm, iter_wav, note_events, render_wav, wavetable
+from music_generator.theory import parse_progression
+from music_generator.voicings import generate_arrangement
+
+
+class AudioRenderTests(unittest.TestCase):
+    def setUp(self):
+        chords = parse_progression("Dm7 G7 Cmaj7 A7 Fm7 Bb7 Ebmaj7 C7")
+        self.chords = chords
+        self.arrangement = generate_arrangement(chords, "jazz", 0.8, 4, 100, seed=3, humanize=True, humanize_amount=0.5)
+
+    def test_wav_header_matches_streamed_samples(self):
+        data = render_wav(self.arrangement, 100, 22050)
+        with wave.open(io.BytesIO(data)) as reader:
+            self.assertEqual((reader.getnchannels(), reader.getsampwidth(), reader.getframerate()), (1, 2, 22050))
+            frames = reader.readframes(reader.getnframes())
+        self.assertEqual(len(frames), len(data) - 44)
+
+        events = note_events(self.arrangement, 100)
+        self.assertAlmostEqual(reader.getnframes() / 22050, (events["start"] + events["duration"]).max() + 0.06, 3)
+        pcm = np.frombuffer(frames, dtype="<i2")
+        self.assertGreater(np.abs(pcm).max(), 3000)
+        self.assertEqual(np.abs(pcm[: int(LEAD_IN * 22050) - 1]).max(), 0)
+
+    def test_chunk_size_does_not_change_output(self):
+        whole = np.concatenate(list(iter_pcm(self.arrangement, 100, 22050, chunk_seconds=60.0)))
+        chunked = np.concatenate(list(iter_pcm(self.arrangement, 100, 22050, chunk_seconds=0.1)))
+        np.testing.assert_allclose(chunked, whole, atol=1e-6)
+
+    def test_memory_stays_bounded_at_slow_tempo(self):
+        arrangement = generate_arrangement(self.chords, "jazz", 0.8, 4, 40, seed=3)
+        tracemalloc.start()
+        self.addCleanup(tracemalloc.stop)
+        for _ in iter_pcm(arrangement, 40, 48000):
+            pass
+        _, peak = tracemalloc.get_traced_memory()
+        self.assertLess(peak, 16 * 2**20)
+
+    def test_single_note_follows_browser_envelope(self):
+        table = wavetable("sawtooth", 60, 44100)
+        self.assertAlmostEqual(float(np.abs(table).max()), 1.0, delta=0.2)
+
+        chords = parse_progression("C")
+        arrangement = generate_arrangement(chords, "pop", 0.0, 4, 120, seed=1)
+        pcm = np.concatenate(list(iter_pcm(arrangement, 120)))
+        start = round(LEAD_IN * 44100)
+        attack = np.abs(pcm[start:start + int(ATTACK * 44100) // 4]).max()
+        sustain = np.abs(pcm[start + 22050:start + 24000]).max()
+        self.assertLess(attack, sustain)
+
+    def test_renders_faster_than_real_time(self):
+        started = time.perf_counter()
+        chunks = list(iter_wav(self.arrangement, 100))
+        elapsed = time.perf_counter() - started
+        seconds = (sum(map(len, chunks)) - 44) / 2 / 44100
+        self.assertGreater(seconds / elapsed, 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
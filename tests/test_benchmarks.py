@@ -0,0 +1,40 @@
+import unittest
+
+from benchmarks.imports import BUDGETS, check_budgets
+from benchmarks.startup import check_first_request
+from benchmarks.run import build_cases, compare_results, run_suite
+
+
+class BenchmarkSuiteTests(unittest.TestCase):
+    def test_suite_reports_every_case(self):
+        report = run_suite(build_cases((4,), include_http=False), min_time=0.0, max_runs=3, selected="[4]")
+        self.assertIn("parse_progression[4]", report["results"])
+        self.assertIn("arrangement_to_midi[4]", report["results"])
+        self.assertTrue(all(result["best"] > 0 for result in report["results"].values()))
+
+    def test_compare_flags_only_regressions_above_threshold(self):
+        baseline = {"results": {"a": {"best": 1.0}, "b": {"best": 1.0}, "c": {"best": 1.0}}}
+        current = {"results": {"a": {"best": 1.1}, "b": {"best": 1.5}, "new": {"best": 9.0}}}
+
+        regressions = compare_results(current, baseline, threshold=0.15)
+        self.assertEqual([regression["name"] for regression in regressions], ["b"])
+        self.assertAlmostEqual(regressions[0]["ratio"], 1.5)
+
+
+class ImportBudgetTests(unittest.TestCase):
+    def test_package_modules_do_not_load_heavy_dependencies(self):
+        budgets = tuple(budget for budget in BUDGETS if budget.module.startswith("music_generator"))
+        results = check_budgets(budgets, runs=1, scale=100.0)
+        self.assertEqual([result["module"] for result in results], [budget.module for budget in budgets])
+        self.assertEqual({result["module"]: result["leaked"] for result in results}, {b.module: [] for b in budgets})
+
+
+class FirstRequestTests(unittest.TestCase):
+    def test_warmed_worker_serves_first_preview_hot(self):
+        result = check_first_request(scale=50.0)
+        self.assertEqual(result["catalog_misses"], 0)
+        self.assertFalse(result["over_budget"], result)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+
+from music_generator.cache import LRUCache
+
+
+class LRUCacheTests(unittest.TestCase):
+    def test_evicts_least_recently_used_entry(self):
+        cache = LRUCache(max_entries=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        self.assertEqual(cache.get("a"), 1)
+        cache.put("c", 3)
+
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.get("c"), 3)
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_weight_limit_bounds_total_size(self):
+        cache = LRUCache(max_entries=10, max_weight=10, weigh=len)
+        cache.put("a", b"x" * 4)
+        cache.put("b", b"x" * 4)
+        cache.put("c", b"x" * 4)
+        cache.put("huge", b"x" * 11)
+
+        self.assertLessEqual(cache.weight, 10)
+        self.assertIsNone(cache.get("a"))
+        self.assertIsNone(cache.get("huge"))
+        self.assertEqual(len(cache), 2)
+
+    def test_get_or_create_counts_hits_and_misses(self):
+        cache = LRUCache(max_entries=4)
+        calls = []
+
+        def factory():
+            calls.append(1)
+            return "value"
+
+        self.assertEqual(cache.get_or_create("key", factory), "value")
+        self.assertEqual(cache.get_or_create("key", factory), "value")
+        stats = cache.stats()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+        self.assertEqual(stats["hit_rate"], 0.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import io
+import tempfile
+import unittest
+from contextlib import redirect_stderr
+from pathlib import Path
+from unittest import mock
+
+from music_generator.cli import main, parse_seeds, plan_files, read_progressions, run_tasks, task_settings_hash
+from music_generator.corpus import CorpusReader
+from music_generator.midi_export import arrangement_to_midi
+from music_generator.theory import parse_progression
+from music_generator.voicings import generate_arrangement
+
+
+class BatchCliTests(unittest.TestCase):
+    def setUp(self):
+        self.output = tempfile.TemporaryDirectory()
+        self.addCleanup(self.output.cleanup)
+        self.root = Path(self.output.name)
+
+    def test_parse_inputs(self):
+        self.assertEqual(parse_seeds("1-3, 7,10-11"), [1, 2, 3, 7, 10, 11])
+        self.assertEqual(parse_seeds("-4"), [-4])
+        source = io.StringIO("Dm7 G7 Cmaj7\n\n# Kommentar\n  Am7 D7 Gmaj7  \n")
+        self.assertEqual(read_progressions(source), ["Dm7 G7 Cmaj7", "Am7 D7 Gmaj7"])
+
+    def test_grid_writes_reference_files_and_resumes(self):
+        tasks = list(plan_files(["Dm7 G7 Cmaj7", "Fm7 Bb7 Ebmaj7"], ["jazz", "pop"], [0.3, 0.9], [5, 6], self.root,
+                                humanize_amount=0.4))
+        self.assertEqual(len(tasks), 16)
+        self.assertEqual(len({task.path for task in tasks}), 16)
+
+        summary = run_tasks(tasks, workers=2, chunk_size=3)
+        self.assertEqual((summary["written"], summary["skipped"]), (16, 0))
+
+        expected = arrangement_to_midi(
+            generate_arrangement(parse_progression("Fm7 Bb7 Ebmaj7"), "pop", 0.9, 4.0, 98, seed=6, humanize=True,
+                                 humanize_amount=0.4),
+            tempo=98,
+        )
+        self.assertEqual((self.root / "0002" / "pop" / "c090" / "seed_6.mid").read_bytes(), expected)
+
+        (self.root / "0001" / "jazz" / "c030" / "seed_5.mid").unlink()
+        summary = run_tasks(tasks)
+        self.assertEqual((summary["written"], summary["skipped"]), (1, 15))
+        self.assertEqual(run_tasks(tasks, resume=False)["written"], 16)
+
+    def test_corpus_output_matches_files_and_resumes(self):
+        tasks = list(plan_files(["Dm7 G7 Cmaj7"], ["jazz", "soul"], [0.5], [1, 2, 3], self.root))
+        corpus = self.root / "corpus"
+        summary = run_tasks(tasks[:4], corpus=corpus)
+        self.assertEqual((summary["written"], summary["skipped"]), (4, 0))
+        summary = run_tasks(tasks, workers=2, corpus=corpus)
+        self.assertEqual((summary["written"], summary["skipped"]), (2, 4))
+        self.assertEqual(list(self.root.rglob("*.mid")), [])
+
+        run_tasks(tasks)
+        with CorpusReader(corpus) as reader:
+            self.assertEqual(len(reader), 6)
+            for task in tasks:
+                view = reader.get(task_settings_hash(task), task.style, task.seed)
+                self.assertEqual(bytes(view), Path(task.path).read_bytes())
+                del view
+
+    def test_main_reads_stdin(self):
+        stderr = io.StringIO()
+        with mock.patch("sys.stdin", io.StringIO("Dm7 G7 Cmaj7 A7\n")), redirect_stderr(stderr):
+            exit_code = main(["-", "-o", str(self.root), "--styles", "soul,jazz", "--seeds", "1-2", "-j", "0", "-q"])
+        self.assertEqual(exit_code, 0)
+        self.assertEqual(len(list(self.root.rglob("*.mid"))), 4)
+        self.assertIn("Dateien/s", stderr.getvalue())
+
+    def test_main_rejects_unknown_style(self):
+        stderr = io.StringIO()
+        with mock.patch("sys.stdin", io.StringIO("Dm7 G7\n")), redirect_stderr(stderr), self.assertRaises(SystemExit):
+            main(["-", "-o", str(self.root), "--styles", "polka"])
+        self.assertIn("polka", stderr.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
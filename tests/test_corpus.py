@@ -0,0 +1,112 @@
+import io
+import tempfile
+import unittest
+import zipfile
+from pathlib import Path
+
+from music_generator.archive import iter_zip
+from music_generator.batch import plan_variations, render_variations
+from music_generator.corpus import (
+    CorpusReader,
+    CorpusWriter,
+    corpus_archive_entries,
+    corpus_paths,
+    job_settings_hash,
+    settings_hash,
+)
+from music_generator.theory import parse_progression
+
+
+class CorpusTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = Path(self.directory.name) / "corpus"
+        settings = {
+            "chords": parse_progression("Dm7 G7 Cmaj7 A7"),
+            "requested_style": "random",
+            "complexity": 0.7,
+            "beats_per_chord": 4.0,
+            "tempo": 100,
+            "humanize": True,
+            "humanize_amount": 0.3,
+            "variations": 6,
+        }
+        self.jobs = plan_variations(settings, 42)
+        self.outputs = [midi_bytes for _, midi_bytes in render_variations(self.jobs)]
+
+    def test_round_trip_by_index_and_settings(self):
+        with CorpusWriter.open(self.path) as writer:
+            for job, midi_bytes in zip(self.jobs, self.outputs):
+                writer.append_job(job, midi_bytes)
+
+        with CorpusReader(self.path) as reader:
+            self.assertEqual(len(reader), 6)
+            self.assertEqual([bytes(view) for view in reader], self.outputs)
+
+            job = self.jobs[4]
+            view = reader.get(job_settings_hash(job), job.style, job.seed)
+            self.assertIsInstance(view, memoryview)
+            self.assertEqual(bytes(view), self.outputs[4])
+            self.assertEqual(reader.entry(4).style, job.style)
+            self.assertEqual(reader.entry(-1).seed, self.jobs[-1].seed)
+            self.assertIsNone(reader.find(job_settings_hash(job), job.style, 999))
+            del view
+
+    def test_archive_streams_data_before_all_variations_are_rendered(self):
+        rendered = []
+
+        def outputs():
+            for job, midi_bytes in zip(self.jobs, self.outputs):
+                rendered.append(job)
+                yield job.filename, midi_bytes
+
+        chunks = iter_zip(corpus_archive_entries(self.jobs, outputs(), "corpus"), compression=zipfile.ZIP_STORED)
+        archive = bytearray()
+        while len(rendered) < 2:
+            archive += next(chunks)
+        self.assertIn(self.outputs[0], bytes(archive))
+        archive += b"".join(chunks)
+
+        with zipfile.ZipFile(io.BytesIO(bytes(archive))) as bundle:
+            self.assertEqual(bundle.namelist(), ["corpus.dat", "corpus.idx"])
+            data_path, index_path = corpus_paths(self.path)
+            data_path.write_bytes(bundle.read("corpus.dat"))
+            index_path.write_bytes(bundle.read("corpus.idx"))
+        with CorpusReader(self.path) as reader:
+            self.assertEqual([bytes(view) for view in reader], self.outputs)
+
+    def test_append_after_interrupted_write(self):
+        digest = settings_hash("Dm7 G7", 0.5, 4.0, 98, 0.0)
+        with CorpusWriter.open(self.path) as writer:
+            writer.append(b"first", digest, "jazz", 1)
+
+        data_path, index_path = corpus_paths(self.path)
+        with open(index_path, "ab") as handle:
+            handle.write(b"partial")
+        with open(data_path, "ab") as handle:
+            handle.write(b"orphan")
+
+        with CorpusWriter.open(self.path) as writer:
+            self.assertEqual(writer.count, 1)
+            writer.append(b"second", digest, "alternative-rock", 2)
+
+        with CorpusReader(self.path) as reader:
+            self.assertEqual([bytes(view) for view in reader], [b"first", b"second"])
+            self.assertEqual(reader.entry(1).offset, len(b"firstorphan"))
+
+    def test_rejects_foreign_files_and_long_styles(self):
+        data_path, index_path = corpus_paths(self.path)
+        index_path.write_bytes(b"PK\x03\x04not a corpus")
+        data_path.write_bytes(b"")
+        with self.assertRaises(ValueError):
+            CorpusReader(self.path)
+        with self.assertRaises(ValueError):
+            CorpusWriter.open(self.path)
+
+        with CorpusWriter.open(Path(self.directory.name) / "other") as writer, self.assertRaises(ValueError):
+            writer.append(b"x", bytes(16), "a-very-long-style-name", 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
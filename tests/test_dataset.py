@@ -0,0 +1,84 @@
+import io
+import tempfile
+import unittest
+from contextlib import redirect_stderr
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+from music_generator.dataset import (
+    VOCAB_SIZE,
+    DatasetReader,
+    event_tokens,
+    export_dataset,
+    main,
+    note_table,
+    piano_roll,
+    tokens_to_notes,
+)
+from music_generator.theory import parse_progression
+from music_generator.voicings import generate_arrangement
+
+
+class DatasetExportTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        chords = parse_progression("Dm7 G7 Cmaj7 A7 Fm7 Bb7 Ebmaj7 C7")
+        self.arrangements = [
+            generate_arrangement(chords, style, 0.8, 4, 100, seed=seed, humanize=True, humanize_amount=0.6)
+            for seed, style in enumerate(["jazz", "soul", "pop", "indie", "alternative-rock"])
+        ]
+
+    def test_note_table_matches_per_note_reference(self):
+        arrangement = self.arrangements[0]
+        expected = []
+        for start, duration, velocity, voicing in arrangement.hits():
+            step = round(start * 4)
+            length = max(step + 1, round((start + duration) * 4)) - step
+            for hand, notes in ((0, voicing.left_hand), (1, voicing.right_hand)):
+                expected += [(step, hand, pitch, length, velocity) for pitch in notes]
+        self.assertEqual(note_table(arrangement).tolist(), [list(row) for row in sorted(expected)])
+
+        roll = piano_roll(arrangement)
+        self.assertEqual(roll.shape, (2, 128, 128))
+        step, hand, pitch, _, velocity = expected[0]
+        self.assertEqual(roll[hand, step, pitch], max(row[4] for row in expected if row[:3] == expected[0][:3]))
+
+    def test_tokens_round_trip_with_quantized_velocity(self):
+        table = note_table(self.arrangements[1])
+        tokens = event_tokens(self.arrangements[1])
+        self.assertEqual((tokens[0], tokens[-1]), (1, 2))
+        self.assertLess(tokens.max(), VOCAB_SIZE)
+
+        decoded = tokens_to_notes(tokens)
+        np.testing.assert_array_equal(decoded[:, :4], table[:, :4])
+        np.testing.assert_array_equal(decoded[:, 4], table[:, 4] // 4 * 4)
+
+    def test_sharded_export_is_memory_mapped(self):
+        manifest = export_dataset(self.arrangements, self.directory.name, seeds=range(10, 15), shard_size=2)
+        self.assertEqual([shard["count"] for shard in manifest["shards"]], [2, 2, 1])
+
+        reader = DatasetReader(self.directory.name)
+        self.assertEqual(len(reader), 5)
+        self.assertIsInstance(reader.shards[0]["roll"], np.memmap)
+        for index, arrangement in enumerate(self.arrangements):
+            np.testing.assert_array_equal(reader.piano_roll(index), piano_roll(arrangement))
+            np.testing.assert_array_equal(reader.tokens(index), event_tokens(arrangement))
+            np.testing.assert_array_equal(reader.notes(index), note_table(arrangement))
+        self.assertEqual(reader.meta(-1), {"style": "alternative-rock", "seed": 14, "total_beats": 32.0})
+
+    def test_cli_exports_grid(self):
+        output = Path(self.directory.name) / "out"
+        with mock.patch("sys.stdin", io.StringIO("Dm7 G7 Cmaj7\n")), redirect_stderr(io.StringIO()):
+            main(["-", "-o", str(output), "--styles", "jazz,pop", "--seeds", "1-3", "--shard-size", "4"])
+
+        reader = DatasetReader(output)
+        self.assertEqual(len(reader), 6)
+        expected = generate_arrangement(parse_progression("Dm7 G7 Cmaj7"), "pop", 0.65, 4.0, 98, seed=2)
+        np.testing.assert_array_equal(reader.tokens(4), event_tokens(expected))
+
+
+if __name__ == "__main__":
+    unittest.main()
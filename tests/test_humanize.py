@@ -0,0 +1,59 @@
+import unittest
+
+from music_generator.humanize import humanize_arrangements
+from music_generator.theory import parse_progression
+from music_generator.voicings import Arrangement, generate_arrangement
+
+
+class BatchHumanizeTests(unittest.TestCase):
+    def setUp(self):
+        self.chords = parse_progression("Dm7 G7 Cmaj7 A7 Fm7 Bb7 Ebmaj7 C7")
+        self.settings = dict(complexity=0.7, beats_per_chord=4, tempo=100, humanize_amount=0.8)
+
+    def plain(self, style, seed):
+        return generate_arrangement(self.chords, style, seed=seed, humanize=False, **self.settings)
+
+    def test_random_engine_matches_scalar_humanize_exactly(self):
+        styles = ["jazz", "soul", "pop", "indie", "alternative-rock"]
+        batch = [self.plain(style, seed) for seed, style in enumerate(styles, start=10)]
+        humanize_arrangements(batch, 0.8, [seed + 7919 for seed in range(10, 15)], engine="random")
+
+        for seed, (style, arrangement) in enumerate(zip(styles, batch), start=10):
+            expected = generate_arrangement(self.chords, style, seed=seed, humanize=True, **self.settings)
+            self.assertEqual(arrangement, expected)
+
+    def test_numpy_engine_is_seeded_and_bounded(self):
+        first = [self.plain("soul", 1), self.plain("jazz", 2)]
+        second = [self.plain("soul", 1), self.plain("jazz", 2)]
+        humanize_arrangements(first, 0.5, [5, 6])
+        humanize_arrangements(second, 0.5, [5, 6])
+        self.assertEqual(first, second)
+
+        original = self.plain("soul", 1)
+        humanized = first[0]
+        self.assertNotEqual(humanized, original)
+        starts = list(humanized.starts)
+        self.assertEqual(starts, sorted(starts))
+        self.assertTrue(all(38 <= velocity <= 120 for velocity in humanized.velocities))
+        self.assertTrue(all(duration >= 0.12 or duration == humanized.total_beats - start
+                            for start, duration in zip(humanized.starts, humanized.durations)))
+
+    def test_empty_arrangements_in_batch_are_left_empty(self):
+        for engine in ("random", "numpy"):
+            with self.subTest(engine=engine):
+                batch = [Arrangement("jazz"), self.plain("soul", 1), Arrangement("pop")]
+                humanize_arrangements(batch, 0.5, [1, 2, 3], engine=engine)
+                self.assertEqual((len(batch[0]), len(batch[2])), (0, 0))
+                self.assertEqual(len(batch[1]), len(self.plain("soul", 1)))
+
+    def test_generate_arrangement_can_use_numpy_engine(self):
+        arrangement = generate_arrangement(
+            self.chords, "pop", seed=3, humanize=True, humanize_engine="numpy", **self.settings
+        )
+        self.assertEqual(len(arrangement), len(self.chords))
+        with self.assertRaises(ValueError):
+            humanize_arrangements([arrangement], 0.5, [1], engine="quantum")
+
+
+if __name__ == "__main__":
+    unittest.main()
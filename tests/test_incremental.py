@@ -0,0 +1,72 @@
+import random
+import unittest
+
+from music_generator.incremental import StateSettings, build_state, update_state
+from music_generator.theory import parse_progression
+from music_generator.voicings import STYLES, generate_arrangement
+
+
+class IncrementalStateTests(unittest.TestCase):
+    def setUp(self):
+        self.pool = parse_progression("Dm7 G7 Cmaj7 A7 Fm7 Bb7 Ebmaj7 C7 F#m7b5 B7b9 Em7 E7#9 Am7 D7 G7alt Ab6")
+        self.rng = random.Random(11)
+
+    def expected(self, chords, settings):
+        return generate_arrangement(
+            chords,
+            settings.style,
+            settings.complexity,
+            settings.beats_per_chord,
+            100,
+            seed=settings.seed,
+            humanize=settings.humanize,
+            humanize_amount=settings.humanize_amount,
+            humanize_engine=settings.humanize_engine,
+        )
+
+    def test_edits_match_full_regeneration(self):
+        for style in STYLES:
+            for complexity, humanize in ((0.3, False), (0.65, True), (0.7, False), (0.9, True)):
+                with self.subTest(style=style, complexity=complexity):
+                    chords = [self.rng.choice(self.pool) for _ in range(40)]
+                    settings = StateSettings(style, complexity, 4.0, self.rng.randint(0, 9999), humanize, 0.5)
+                    state = build_state(chords, settings)
+                    self.assertEqual(state.arrangement, self.expected(chords, settings))
+
+                    for _ in range(6):
+                        edited = list(state.chords)
+                        edited[self.rng.randrange(len(edited))] = self.rng.choice(self.pool)
+                        previous = state.arrangement
+                        state, changed = update_state(state, edited)
+                        expected = self.expected(edited, settings)
+                        self.assertEqual(state.arrangement, expected)
+                        self.assertEqual(
+                            changed,
+                            [i for i, voicing in enumerate(expected.voicings) if voicing != previous.voicings[i]],
+                        )
+
+    def test_unchanged_and_resized_progressions(self):
+        chords = parse_progression("Dm7 G7 Cmaj7 A7")
+        settings = StateSettings("soul", 0.8, 2.0, 3)
+        state = build_state(chords, settings)
+        self.assertEqual(update_state(state, chords), (state, []))
+
+        longer = chords + parse_progression("Dm7 G7")
+        resized, changed = update_state(state, longer)
+        self.assertEqual(changed, list(range(6)))
+        self.assertEqual(resized.arrangement, self.expected(longer, settings))
+
+    def test_local_edit_stops_at_converged_voice(self):
+        chords = parse_progression(" ".join(["Cmaj7 Am7 Dm7 G7"] * 50))
+        state = build_state(chords, StateSettings("pop", 0.5, 4.0, 8))
+        edited = list(chords)
+        edited[101] = parse_progression("Ab7")[0]
+
+        updated, changed = update_state(state, edited)
+        self.assertIn(101, changed)
+        self.assertLess(max(changed), 110)
+        self.assertEqual(updated.event_indices([101]), state.chord_events[101])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+import io
+import json
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+import zipfile
+
+from music_generator.batch import plan_variations, render_variations
+from music_generator.jobs import MANIFEST_NAME, ExportJobQueue, job_from_dict, job_to_dict
+from music_generator.theory import parse_progression
+
+
+def wait_for(queue, job_id, timeout=20.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = queue.status(job_id)
+        if status["state"] in ("done", "failed"):
+            return status
+        time.sleep(0.01)
+    raise AssertionError(f"Job {job_id} wurde nicht fertig")
+
+
+class ExportJobQueueTests(unittest.TestCase):
+    def setUp(self):
+        self.spool = tempfile.TemporaryDirectory()
+        settings = {
+            "requested_style": "random",
+            "chords": parse_progression("Dm7 G7 Cmaj7 A7"),
+            "complexity": 0.6,
+            "beats_per_chord": 4.0,
+            "tempo": 100,
+            "humanize": True,
+            "humanize_amount": 0.3,
+            "variations": 4,
+        }
+        self.jobs = plan_variations(settings, 321)
+
+    def tearDown(self):
+        self.spool.cleanup()
+
+    def test_job_round_trips_through_json(self):
+        for job in self.jobs:
+            self.assertEqual(job_from_dict(json.loads(json.dumps(job_to_dict(job)))), job)
+
+    def test_finished_archive_matches_direct_render(self):
+        queue = ExportJobQueue(self.spool.name, workers=1)
+        self.addCleanup(queue.shutdown)
+        job_id = queue.submit(self.jobs, "stored")
+
+        status = wait_for(queue, job_id)
+        self.assertEqual(status["state"], "done")
+        self.assertEqual((status["done"], status["total"]), (4, 4))
+        self.assertGreaterEqual(status["elapsed"], 0.0)
+        with zipfile.ZipFile(io.BytesIO(queue.artifact_path(job_id).read_bytes())) as archive:
+            entries = [(name, archive.read(name)) for name in archive.namelist()]
+        self.assertEqual(entries, list(render_variations(self.jobs)))
+
+    def test_corpus_container_writes_corpus_archive(self):
+        queue = ExportJobQueue(self.spool.name, workers=1)
+        self.addCleanup(queue.shutdown)
+        job_id = queue.submit(self.jobs, "stored", container="corpus")
+
+        status = wait_for(queue, job_id)
+        self.assertEqual(status["container"], "corpus")
+        with zipfile.ZipFile(queue.artifact_path(job_id)) as archive:
+            self.assertEqual([name.rsplit(".", 1)[1] for name in archive.namelist()], ["dat", "idx"])
+            data = archive.read(archive.namelist()[0])
+        self.assertEqual(data, b"".join(midi_bytes for _, midi_bytes in render_variations(self.jobs)))
+        with self.assertRaises(ValueError):
+            queue.submit(self.jobs, container="flac")
+
+    def test_restart_resumes_interrupted_jobs(self):
+        queue = ExportJobQueue(self.spool.name, workers=1)
+        job_id = queue.submit(self.jobs[:1])
+        wait_for(queue, job_id)
+        queue.shutdown()
+
+        manifest = queue.job_dir(job_id) / MANIFEST_NAME
+        record = json.loads(manifest.read_text(encoding="utf-8"))
+        manifest.write_text(json.dumps(dict(record, state="running", done=0)), encoding="utf-8")
+        queue.artifact_path(job_id).unlink()
+
+        restarted = ExportJobQueue(self.spool.name, workers=1)
+        self.addCleanup(restarted.shutdown)
+        self.assertEqual(wait_for(restarted, job_id)["state"], "done")
+        self.assertEqual(restarted.artifact_path(job_id).read_bytes(), next(render_variations(self.jobs[:1]))[1])
+
+    def test_sibling_process_reads_status_without_running_the_job(self):
+        release = threading.Event()
+
+        def slow_render(*args, **kwargs):
+            release.wait(10)
+            yield from render_variations(*args, **kwargs)
+
+        with mock.patch("music_generator.jobs.render_variations", side_effect=slow_render) as render:
+            owner = ExportJobQueue(self.spool.name, workers=1)
+            self.addCleanup(owner.shutdown)
+            job_id = owner.submit(self.jobs, "stored")
+
+            sibling = ExportJobQueue(self.spool.name, workers=1)
+            self.addCleanup(sibling.shutdown)
+            self.assertEqual(sibling.reload(), [])
+            self.assertIn(sibling.status(job_id)["state"], ("queued", "running"))
+            self.assertIsNone(sibling.artifact_path(job_id))
+
+            release.set()
+            self.assertEqual(wait_for(sibling, job_id)["state"], "done")
+            self.assertEqual(sibling.artifact_path(job_id), owner.artifact_path(job_id))
+            self.assertEqual(render.call_count, 1)
+
+    def test_cleanup_removes_expired_jobs(self):
+        queue = ExportJobQueue(self.spool.name, workers=1, ttl=60)
+        self.addCleanup(queue.shutdown)
+        job_id = queue.submit(self.jobs[:1])
+        wait_for(queue, job_id)
+
+        self.assertEqual(queue.cleanup(now=time.time()), 0)
+        self.assertEqual(queue.cleanup(now=time.time() + 61), 1)
+        self.assertIsNone(queue.status(job_id))
+        self.assertFalse(queue.job_dir(job_id).exists())
+        self.assertIsNone(queue.status("../etc"))
+
+    def test_cleanup_removes_expired_jobs_of_other_processes(self):
+        queue = ExportJobQueue(self.spool.name, workers=1, ttl=60)
+        self.addCleanup(queue.shutdown)
+        other = ExportJobQueue(self.spool.name, workers=1, ttl=60)
+        job_id = other.submit(self.jobs[:1])
+        wait_for(other, job_id)
+        other.shutdown()
+
+        self.assertEqual(queue.cleanup(now=time.time()), 0)
+        self.assertEqual(queue.cleanup(now=time.time() + 61), 1)
+        self.assertFalse(queue.job_dir(job_id).exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+import unittest
+
+from music_generator.metrics import MetricsRegistry, RequestTrace, current_trace, record_stage, registry, variation_bucket
+from music_generator.theory import parse_progression
+from music_generator.voicings import generate_arrangement
+
+
+class MetricsRegistryTests(unittest.TestCase):
+    def test_histogram_buckets_are_cumulative(self):
+        metrics = MetricsRegistry(buckets=(0.01, 0.1))
+        for seconds in (0.005, 0.05, 0.5):
+            metrics.observe_stage("midi", seconds)
+        metrics.count_request("generate", 'we"ird', 12)
+
+        text = metrics.render()
+        self.assertIn('voicing_stage_seconds_bucket{stage="midi",le="0.01"} 1', text)
+        self.assertIn('voicing_stage_seconds_bucket{stage="midi",le="0.1"} 2', text)
+        self.assertIn('voicing_stage_seconds_bucket{stage="midi",le="+Inf"} 3', text)
+        self.assertIn('voicing_stage_seconds_count{stage="midi"} 3', text)
+        self.assertIn('voicing_requests_total{endpoint="generate",style="we\\"ird",variations="11-100"} 1', text)
+
+    def test_variation_buckets(self):
+        self.assertEqual([variation_bucket(n) for n in (1, 2, 10, 500, 5000)], ["1", "2-10", "2-10", "101-1000", ">1000"])
+
+    def test_generation_records_stages_in_active_trace(self):
+        trace = RequestTrace("test")
+        token = current_trace.set(trace)
+        try:
+            chords = parse_progression("Dm7 G7 Cmaj7 A7")
+            for voice_leading in ("greedy", "optimal"):
+                generate_arrangement(chords, "jazz", 0.6, 4, 100, seed=2, humanize=True, humanize_amount=0.4,
+                                     voice_leading=voice_leading)
+            record_stage("zip", 0.25)
+        finally:
+            current_trace.reset(token)
+
+        self.assertEqual(set(trace.stages), {"parse", "cadences", "palette", "voice", "hands", "humanize", "zip"})
+        self.assertGreaterEqual(trace.stages["zip"], 0.25)
+        self.assertIn("voice", registry.stages)
+
+
+if __name__ == "__main__":
+    unittest.main()
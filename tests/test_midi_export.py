@@ -0,0 +1,145 @@
+import io
+import unittest
+from unittest import mock
+
+import mido
+
+from music_generator.midi_export import arrangement_to_midi, encode_variable_int, write_midi_stream
+from music_generator.theory import parse_progression
+from music_generator.voicings import STYLES, generate_arrangement, iter_arrangement
+
+
+def reference_midi(arrangement, tempo):
+    midi = mido.MidiFile(type=1, ticks_per_beat=480)
+
+    meta_track = mido.MidiTrack()
+    midi.tracks.append(meta_track)
+    meta_track.append(mido.MetaMessage("set_tempo", tempo=mido.bpm2tempo(tempo), time=0))
+    meta_track.append(mido.MetaMessage("time_signature", numerator=4, denominator=4, time=0))
+    meta_track.append(mido.MetaMessage("track_name", name=f"Voicings ({arrangement.style})", time=0))
+
+    for name, hand in (("Piano LH", "left"), ("Piano RH", "right")):
+        track = mido.MidiTrack()
+        midi.tracks.append(track)
+        track.append(mido.MetaMessage("track_name", name=name, time=0))
+
+        timeline = []
+        for event in arrangement.events:
+            start_tick = int(round(event.start_beat * 480))
+            end_tick = int(round((event.start_beat + event.duration) * 480))
+            if hand == "left":
+                notes, velocity = event.left_hand, max(40, event.velocity - 8)
+            else:
+                notes, velocity = (event.right_hand or event.notes), event.velocity
+            for note in notes:
+                timeline.append((start_tick, 1, mido.Message("note_on", note=note, velocity=velocity)))
+                timeline.append((end_tick, 0, mido.Message("note_off", note=note, velocity=0)))
+
+        timeline.sort(key=lambda item: (item[0], item[1]))
+        previous_tick = 0
+        for tick, _, message in timeline:
+            message.time = tick - previous_tick
+            track.append(message)
+            previous_tick = tick
+        track.append(mido.MetaMessage("end_of_track", time=1))
+
+    buffer = io.BytesIO()
+    midi.save(file=buffer)
+    return buffer.getvalue()
+
+
+def note_events(midi, channel=None):
+    events = []
+    for track in midi.tracks:
+        tick = 0
+        for message in track:
+            tick += message.time
+            if message.type in ("note_on", "note_off") and (channel is None or message.channel == channel):
+                is_on = message.type == "note_on" and message.velocity > 0
+                events.append((tick, is_on, message.note, message.velocity if is_on else 0))
+    return sorted(events)
+
+
+class MidiEncoderTests(unittest.TestCase):
+    def setUp(self):
+        self.chords = parse_progression("Dm7 G7 Cmaj7 A7 | Fm7 Bb7 Ebmaj7 C7sus4 | F#m7b5 B7b9 Em7 A13")
+
+    def test_matches_mido_reference_bytes(self):
+        for style in STYLES:
+            for humanize in (False, True):
+                arrangement = generate_arrangement(
+                    chords=self.chords,
+                    style=style,
+                    complexity=0.8,
+                    beats_per_chord=4,
+                    tempo=101,
+                    seed=42,
+                    humanize=humanize,
+                    humanize_amount=0.9,
+                )
+                with self.subTest(style=style, humanize=humanize):
+                    self.assertEqual(arrangement_to_midi(arrangement, tempo=101), reference_midi(arrangement, 101))
+
+    def test_compact_and_type_zero_keep_note_content(self):
+        arrangement = generate_arrangement(
+            chords=self.chords,
+            style="soul",
+            complexity=0.7,
+            beats_per_chord=2,
+            tempo=88,
+            seed=9,
+            humanize=True,
+            humanize_amount=0.5,
+        )
+        reference = mido.MidiFile(file=io.BytesIO(arrangement_to_midi(arrangement, tempo=88)))
+
+        compact_bytes = arrangement_to_midi(arrangement, tempo=88, compact=True)
+        compact = mido.MidiFile(file=io.BytesIO(compact_bytes))
+        self.assertLess(len(compact_bytes), len(arrangement_to_midi(arrangement, tempo=88)))
+        self.assertEqual(note_events(compact), note_events(reference))
+
+        single = mido.MidiFile(file=io.BytesIO(arrangement_to_midi(arrangement, tempo=88, midi_type=0)))
+        self.assertEqual(single.type, 0)
+        self.assertEqual(len(single.tracks), 1)
+        self.assertEqual(note_events(single, channel=0), note_events(mido.MidiFile(tracks=[reference.tracks[1]])))
+        self.assertEqual(note_events(single, channel=1), note_events(mido.MidiFile(tracks=[reference.tracks[2]])))
+
+    def test_variable_length_encoding(self):
+        self.assertEqual(encode_variable_int(0), b"\x00")
+        self.assertEqual(encode_variable_int(0x7F), b"\x7f")
+        self.assertEqual(encode_variable_int(0x80), b"\x81\x00")
+        self.assertEqual(encode_variable_int(0x0FFFFFFF), b"\xff\xff\xff\x7f")
+
+    def test_rejects_unknown_type(self):
+        arrangement = generate_arrangement(self.chords, "pop", 0.5, 4, 100, seed=1)
+        with self.assertRaises(ValueError):
+            arrangement_to_midi(arrangement, tempo=100, midi_type=2)
+
+
+class UnseekableBuffer:
+    def __init__(self):
+        self.buffer = io.BytesIO()
+
+    def write(self, data):
+        return self.buffer.write(data)
+
+
+class MidiStreamWriterTests(unittest.TestCase):
+    def test_stream_writer_matches_in_memory_export(self):
+        chords = parse_progression("Dm7 G7 Cmaj7 A7 Bbmaj7 Eb7 Abmaj7 Db7 " * 6)
+        settings = dict(style="soul", complexity=0.8, beats_per_chord=4, tempo=97, seed=5, humanize=True, humanize_amount=0.8)
+        arrangement = generate_arrangement(chords, **settings)
+
+        for midi_type in (0, 1):
+            expected = arrangement_to_midi(arrangement, tempo=97, midi_type=midi_type)
+            for output in (io.BytesIO(), UnseekableBuffer()):
+                with self.subTest(midi_type=midi_type, seekable=isinstance(output, io.BytesIO)), mock.patch(
+                    "music_generator.midi_export.STREAM_FLUSH_BYTES", 64
+                ):
+                    write_midi_stream(iter_arrangement(chords, **settings), output, "soul", 97, midi_type=midi_type)
+                    buffer = output if isinstance(output, io.BytesIO) else output.buffer
+                    self.assertEqual(buffer.getvalue(), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
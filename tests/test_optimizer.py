@@ -0,0 +1,60 @@
+import itertools
+import unittest
+
+import numpy as np
+
+from music_generator.optimizer import optimize_voice_leading, transition_costs
+from music_generator.theory import parse_progression
+from music_generator.voicings import generate_arrangement
+
+
+def path_cost(path, start):
+    voices = [np.asarray(start)] + [np.asarray(voice) for voice in path]
+    return int(sum(np.abs(a - b).sum() for a, b in zip(voices, voices[1:])))
+
+
+def total_movement(arrangement):
+    voices = [voicing.notes for voicing in arrangement.voicings]
+    return sum(sum(abs(a - b) for a, b in zip(x, y)) for x, y in zip(voices, voices[1:]))
+
+
+class VoiceLeadingOptimizerTests(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        self.start = [48, 55, 60]
+        self.candidates = [np.sort(rng.integers(40, 80, size=(6, 3)), axis=1).astype(np.int16) for _ in range(5)]
+
+    def test_exact_search_finds_global_minimum(self):
+        best = min(
+            path_cost([candidates[i] for candidates, i in zip(self.candidates, choice)], self.start)
+            for choice in itertools.product(range(6), repeat=5)
+        )
+        path = optimize_voice_leading(self.candidates, self.start, beam_width=None)
+        self.assertEqual(path_cost(path, self.start), best)
+
+    def test_narrow_beam_is_never_better_than_exact(self):
+        exact = path_cost(optimize_voice_leading(self.candidates, self.start, beam_width=None), self.start)
+        beam = path_cost(optimize_voice_leading(self.candidates, self.start, beam_width=2), self.start)
+        self.assertGreaterEqual(beam, exact)
+        with self.assertRaises(ValueError):
+            optimize_voice_leading(self.candidates, self.start, beam_width=0)
+
+    def test_transition_costs_are_pairwise_l1_distances(self):
+        costs = transition_costs(self.candidates[0], self.candidates[1])
+        self.assertEqual(costs.shape, (6, 6))
+        self.assertEqual(costs[2, 3], np.abs(self.candidates[0][2] - self.candidates[1][3]).sum())
+
+    def test_optimal_mode_reduces_total_voice_movement(self):
+        chords = parse_progression("Dm7 G7 Cmaj7 A7 Fm7 Bb7 Ebmaj7 C7 F#m7b5 B7b9 Em7 A13 " * 4)
+        settings = dict(style="jazz", complexity=0.9, beats_per_chord=4, tempo=100, seed=3)
+        greedy = generate_arrangement(chords, **settings)
+        optimal = generate_arrangement(chords, voice_leading="optimal", **settings)
+
+        self.assertEqual(len(optimal), len(greedy))
+        self.assertLessEqual(total_movement(optimal), total_movement(greedy))
+        with self.assertRaises(ValueError):
+            generate_arrangement(chords, voice_leading="telepathic", **settings)
+
+
+if __name__ == "__main__":
+    unittest.main()
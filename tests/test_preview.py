@@ -0,0 +1,34 @@
+import json
+import unittest
+
+from music_generator.preview import HEADER, decode_preview, encode_preview, preview_json
+from music_generator.theory import parse_progression
+from music_generator.voicings import generate_arrangement
+
+
+class PreviewEncodingTests(unittest.TestCase):
+    def test_binary_round_trip_matches_json(self):
+        chords = parse_progression("Dm7 G7 Cmaj7 A7 | Fm7 Bb7 Ebmaj7 C7sus4 " * 8)
+        for style in ("jazz", "pop"):
+            arrangement = generate_arrangement(chords, style, 0.7, 4, 100, seed=3, humanize=True, humanize_amount=0.5)
+            expected = json.loads(json.dumps(preview_json(arrangement, 2**40, 100)))
+            payload = encode_preview(arrangement, 2**40, 100)
+            with self.subTest(style=style):
+                self.assertEqual(decode_preview(payload), expected)
+                self.assertLess(len(payload) * 3, len(json.dumps(expected)))
+
+    def test_voicing_table_stores_each_pair_of_hands_once(self):
+        arrangement = generate_arrangement(parse_progression("Cmaj7 " * 16), "jazz", 0.7, 4, 100, seed=3)
+        payload = encode_preview(arrangement, 3, 100)
+        distinct = {(tuple(voicing.left_hand), tuple(voicing.right_hand)) for voicing in arrangement.voicings}
+        self.assertLess(len(distinct), len(arrangement.voicings))
+        self.assertEqual(HEADER.unpack_from(payload)[5], len(distinct))
+        self.assertEqual(decode_preview(payload), json.loads(json.dumps(preview_json(arrangement, 3, 100))))
+
+    def test_rejects_unknown_payload(self):
+        with self.assertRaises(ValueError):
+            decode_preview(bytes(64))
+
+
+if __name__ == "__main__":
+    unittest.main()
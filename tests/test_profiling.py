@@ -0,0 +1,58 @@
+import io
+import json
+import tempfile
+import unittest
+from contextlib import redirect_stderr, redirect_stdout
+from pathlib import Path
+
+from music_generator.profiling import main, parse_profile_modes, replay
+
+
+class ProfilingTests(unittest.TestCase):
+    def setUp(self):
+        self.output = tempfile.TemporaryDirectory()
+        self.addCleanup(self.output.cleanup)
+        self.record = {
+            "progression": "Dm7 G7 Cmaj7 A7",
+            "style": "random",
+            "tempo": 100,
+            "complexity": 0.7,
+            "beats_per_chord": 4.0,
+            "variations": 2,
+            "humanize": True,
+            "humanize_amount": 0.3,
+            "seed": 42,
+        }
+
+    def test_parse_profile_modes(self):
+        self.assertEqual(parse_profile_modes("cpu, Memory,cpu"), ("cpu", "memory"))
+        with self.assertRaises(ValueError):
+            parse_profile_modes("gpu")
+
+    def test_replay_writes_stats_snapshot_and_settings(self):
+        written = replay(self.record, ("cpu", "memory"), self.output.name)
+        self.assertEqual(sorted(path.suffix for path in written), [".json", ".prof", ".snapshot"])
+
+        record = json.loads(next(path for path in written if path.suffix == ".json").read_text(encoding="utf-8"))
+        self.assertEqual(record["settings"], self.record)
+        self.assertEqual(record["source"], "replay")
+        self.assertGreater(record["peak_memory_bytes"], 0)
+
+    def test_cli_replays_saved_profile_record(self):
+        settings_file = Path(self.output.name) / "saved.json"
+        settings_file.write_text(json.dumps({"settings": self.record}), encoding="utf-8")
+
+        stdout, stderr = io.StringIO(), io.StringIO()
+        with redirect_stdout(stdout), redirect_stderr(stderr):
+            exit_code = main([str(settings_file), "--output-dir", self.output.name, "--top", "1000"])
+        self.assertEqual(exit_code, 0)
+        self.assertIn("generate_arrangement", stdout.getvalue())
+        self.assertIn(".prof", stderr.getvalue())
+
+    def test_replay_requires_seed(self):
+        with self.assertRaises(ValueError):
+            replay(dict(self.record, seed=None), ("cpu",), self.output.name)
+
+
+if __name__ == "__main__":
+    unittest.main()
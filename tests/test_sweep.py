@@ -0,0 +1,59 @@
+import unittest
+
+from music_generator.batch import plan_variations, render_variation, render_variations
+from music_generator.cache import RenderCache
+from music_generator.sweep import sweep_arrangements
+from music_generator.theory import parse_progression
+from music_generator.voicings import STYLES, generate_arrangement
+
+
+class SeedSweepTests(unittest.TestCase):
+    def setUp(self):
+        self.chords = parse_progression("Dm7 G7 Cmaj7 A7alt Fm7 Bb7 Ebmaj7 C7 F#m7b5 B7b9 Em7 E7#9")
+        self.seeds = list(range(25)) + [987654321]
+
+    def separate(self, style, complexity, **options):
+        return [
+            generate_arrangement(self.chords, style, complexity, 4, 100, seed=seed, **options) for seed in self.seeds
+        ]
+
+    def test_sweep_matches_separate_calls(self):
+        for style in STYLES:
+            for complexity in (0.0, 0.5, 0.7, 0.9):
+                with self.subTest(style=style, complexity=complexity):
+                    swept = sweep_arrangements(self.chords, style, complexity, 4, 100, self.seeds)
+                    self.assertEqual(swept, self.separate(style, complexity))
+
+    def test_sweep_matches_humanized_and_optimal_calls(self):
+        for engine in ("random", "numpy"):
+            options = dict(humanize=True, humanize_amount=0.6, humanize_engine=engine)
+            swept = sweep_arrangements(self.chords, "jazz", 0.8, 4, 100, self.seeds, **options)
+            self.assertEqual(swept, self.separate("jazz", 0.8, **options))
+
+        swept = sweep_arrangements(self.chords, "soul", 0.6, 4, 100, self.seeds[:4], voice_leading="optimal")
+        self.assertEqual(swept, self.separate("soul", 0.6, voice_leading="optimal")[:4])
+
+    def test_unknown_style_is_rejected(self):
+        with self.assertRaises(ValueError):
+            sweep_arrangements(self.chords, "polka", 0.5, 4, 100, [1])
+
+    def test_serial_render_uses_sweep_with_identical_bytes(self):
+        settings = {
+            "chords": self.chords,
+            "requested_style": "random",
+            "complexity": 0.75,
+            "beats_per_chord": 2.0,
+            "tempo": 110,
+            "humanize": True,
+            "humanize_amount": 0.4,
+            "variations": 70,
+        }
+        jobs = plan_variations(settings, 31)
+        cache = RenderCache()
+        self.assertEqual(list(render_variations(jobs, cache=cache)), [render_variation(job) for job in jobs])
+        self.assertEqual(list(render_variations(jobs[:5], cache=cache)), [render_variation(job) for job in jobs[:5]])
+        self.assertGreaterEqual(cache.midi.hits, 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
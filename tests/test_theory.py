@@ -1,6 +1,6 @@
 import unittest
 
-from music_generator.theory import parse_chord, parse_progression
+from music_generator.theory import parse_chord, parse_progression, parse_progressions
 from music_generator.voicings import analyze_cadences
 
 
@@ -26,6 +26,20 @@ class TheoryTests(unittest.TestCase):
         self.assertEqual(chord.quality, "maj")
         self.assertIn("9", chord.extensions)
 
+    def test_repeated_symbols_are_interned(self):
+        first, second = parse_progression("Dm7 G7 Dm7 G7")[:2], parse_progression("Dm7 | G7")
+        self.assertIs(first[0], second[0])
+        self.assertIs(first[1], second[1])
+        self.assertIsInstance(first[1].extensions, frozenset)
+        self.assertEqual(len({first[0], first[1], second[0]}), 2)
+
+    def test_parse_progressions_bulk(self):
+        progressions = parse_progressions(["Dm7 G7 Cmaj7", "Am7 D7"])
+        self.assertEqual([len(chords) for chords in progressions], [3, 2])
+        self.assertIs(progressions[0][0], parse_chord("Dm7"))
+        with self.assertRaises(ValueError):
+            parse_progressions(["Dm7", "H7"])
+
     def test_detect_ii_v_i(self):
         progression = parse_progression("Dm7 G7 Cmaj7")
         roles = analyze_cadences(progression)
@@ -1,11 +1,13 @@
 import io
+import random
 import unittest
 
 import mido
 
+from music_generator.catalog import pitch_class_mask, voicing_catalog
 from music_generator.midi_export import arrangement_to_midi
 from music_generator.theory import parse_progression
-from music_generator.voicings import generate_arrangement
+from music_generator.voicings import STYLES, Arrangement, analyze_cadences, generate_arrangement, iter_arrangement
 
 
 class VoicingIntegrationTests(unittest.TestCase):
@@ -83,6 +85,103 @@ class VoicingIntegrationTests(unittest.TestCase):
         )
         self.assertTrue(timing_different or velocity_different)
 
+    def test_columnar_arrangement_shares_voicings_between_hits(self):
+        chords = parse_progression("Dm7 G7 Cmaj7 A7")
+        arrangement = generate_arrangement(chords, "soul", 0.65, 4, 92, seed=77, humanize=True, humanize_amount=0.5)
+
+        self.assertEqual(len(arrangement.voicings), len(chords))
+        self.assertEqual(len(arrangement), len(chords) * 3)
+        self.assertIs(arrangement.events[0].notes, arrangement.events[1].notes)
+        self.assertEqual(arrangement.events[-1], list(arrangement.events)[-1])
+        starts = [event.start_beat for event in arrangement.events]
+        self.assertEqual(starts, sorted(starts))
+
+        rebuilt = Arrangement(arrangement.style, arrangement.events, arrangement.total_beats)
+        self.assertEqual(rebuilt, arrangement)
+        self.assertEqual(len(rebuilt.voicings), len(arrangement.voicings))
+        self.assertEqual(arrangement_to_midi(rebuilt, tempo=92), arrangement_to_midi(arrangement, tempo=92))
+
+
+class StreamingGenerationTests(unittest.TestCase):
+    def test_iter_arrangement_matches_generate_arrangement(self):
+        chords = parse_progression("Dm7 G7 Cmaj7 A7 Fm7 Bb7 Ebmaj7 C7 F#m7b5 B7b9 Em7 Esus4")
+        for style in STYLES:
+            for humanize in (False, True):
+                settings = dict(
+                    style=style,
+                    complexity=0.85,
+                    beats_per_chord=2,
+                    tempo=100,
+                    seed=31,
+                    humanize=humanize,
+                    humanize_amount=1.0,
+                )
+                with self.subTest(style=style, humanize=humanize):
+                    self.assertEqual(
+                        list(iter_arrangement(chords, **settings)),
+                        list(generate_arrangement(chords, **settings).events),
+                    )
+
+    def test_streaming_cadence_roles_match_batch_analysis(self):
+        vocabulary = parse_progression("Dm7 G7 C Cmaj7 Gsus4 Fm7 Bb7 Em7b5 A7 D7 Am E7")
+        rng = random.Random(3)
+        for _ in range(300):
+            chords = [rng.choice(vocabulary) for _ in range(rng.randint(0, 12))]
+            self.assertEqual(analyze_cadences(chords), reference_cadences(chords))
+
+
+def reference_cadences(chords):
+    roles = ["neutral" for _ in chords]
+    for i in range(len(chords) - 2):
+        c1, c2, c3 = chords[i], chords[i + 1], chords[i + 2]
+        if (
+            (c2.root_pc - c1.root_pc) % 12 == 5
+            and (c3.root_pc - c2.root_pc) % 12 == 5
+            and c1.quality in {"min", "min7", "half_dim"}
+            and c2.quality in {"dom7", "sus2", "sus4"}
+        ):
+            roles[i:i + 3] = ["ii", "V", "I"]
+    for i in range(len(chords) - 1):
+        if roles[i] != "neutral":
+            continue
+        if chords[i].quality in {"dom7", "sus2", "sus4"} and (chords[i + 1].root_pc - chords[i].root_pc) % 12 == 5:
+            roles[i] = "V"
+            if roles[i + 1] == "neutral":
+                roles[i + 1] = "I"
+    return roles
+
+
+class VoicingCatalogTests(unittest.TestCase):
+    def test_catalog_voicings_respect_register_and_spacing(self):
+        catalog = voicing_catalog(47, 82, 4)
+        mask = pitch_class_mask([0, 4, 7, 11])
+        voicings = catalog.voicings(mask)
+
+        self.assertGreater(len(voicings), 0)
+        for voicing in voicings:
+            self.assertEqual({note % 12 for note in voicing}, {0, 4, 7, 11})
+            self.assertTrue(all(47 <= note <= 82 for note in voicing))
+            self.assertTrue(all(b - a >= 3 for a, b in zip(voicing, voicing[1:])))
+
+    def test_nearest_minimizes_movement_from_anchor(self):
+        catalog = voicing_catalog(47, 82, 4)
+        anchor = [53, 57, 60, 64]
+        nearest = catalog.nearest([7, 11, 2, 5], anchor)
+
+        best = min(
+            sum(abs(a - b) for a, b in zip(voicing, anchor))
+            for voicing in catalog.voicings(pitch_class_mask([7, 11, 2, 5]))
+        )
+        self.assertEqual(sum(abs(a - b) for a, b in zip(nearest, anchor)), best)
+        self.assertIs(voicing_catalog(47, 82, 4), catalog)
+
+    def test_generated_voices_stay_in_register(self):
+        chords = parse_progression("Dm7 G7 Cmaj7 A7 Fmaj7 E7 Am7 D7")
+        for style, profile in STYLES.items():
+            arrangement = generate_arrangement(chords, style, 0.9, 4, 100, seed=5)
+            for event in arrangement.events:
+                self.assertTrue(all(profile.register_low <= note <= profile.register_high for note in event.notes))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,30 @@
+import sys
+import unittest
+
+import music_generator
+from music_generator.catalog import voicing_catalog
+from music_generator.voicings import STYLES
+
+
+class PackageSurfaceTests(unittest.TestCase):
+    def test_lazy_exports_resolve(self):
+        for name in music_generator.__all__:
+            with self.subTest(name=name):
+                self.assertIsNotNone(getattr(music_generator, name))
+        self.assertIn("arrangement_to_midi", dir(music_generator))
+        with self.assertRaises(AttributeError):
+            music_generator.does_not_exist
+
+    def test_warm_up_preloads_modules_and_catalogs(self):
+        report = music_generator.warm_up()
+        self.assertIn("music_generator.batch", sys.modules)
+        self.assertGreater(report["catalogs"], 0)
+
+        profile = next(iter(STYLES.values()))
+        before = voicing_catalog.cache_info().hits
+        voicing_catalog(profile.register_low, profile.register_high, profile.note_count_min)
+        self.assertEqual(voicing_catalog.cache_info().hits, before + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()